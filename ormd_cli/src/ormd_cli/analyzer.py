@@ -0,0 +1,183 @@
+"""Analysis of an ORMD document body.
+
+:func:`analyze_body` returns everything the updater and validator derive
+from the body: the prose word count, the ``[[id]]`` link references, the
+local asset references and the fenced code ranges.
+
+The results match the original step-by-step implementation, which stripped
+fenced code, inline code, HTML tags, link/image syntax, heading markers and
+emphasis characters in turn before splitting on whitespace, and extracted
+references with separate ``findall`` calls over the raw body. The passes
+are still separate: the word count strips each kind of syntax in turn, and
+each kind of reference has its own scan of the raw body. What changed is
+that each regex pass is replaced by a scanner built on ``str.find`` that
+finds the same matches, and that a word-count pass whose opening character
+never occurs is skipped without copying the text. A scanner that fails at
+one opener skips every later opener that would fail the same way (they all
+reach the same closing character), so no pass is quadratic, even on a ``<``
+or ``[`` that is never closed.
+"""
+
+import re
+from typing import Iterator, List, NamedTuple, Tuple
+
+# Link targets with these extensions count as assets
+ASSET_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.pdf', '.doc', '.docx',
+                    '.mp4', '.mp3', '.wav', '.zip', '.tar', '.gz')
+
+# An ``[[id]]`` link reference; the parser, validator and renderer use it too
+LINK_REF = re.compile(r'\[\[([^\]]+)\]\]')
+
+_HTML_IMG_START = re.compile(r'<img', re.IGNORECASE)
+_HTML_IMG_SRC = re.compile(r'src=["\']', re.IGNORECASE)
+_HEADING_MARKER = re.compile(r'^#+\s*', re.MULTILINE)
+
+
+class BodyAnalysis(NamedTuple):
+    """Everything derived from a document body."""
+    word_count: int
+    link_ids: List[str]
+    asset_ids: List[str]
+    code_ranges: List[Tuple[int, int]]
+
+
+def _spans(text: str, opener: str, closer: str, min_inner: int) -> Iterator[Tuple[int, int]]:
+    """Matches of ``opener``, at least ``min_inner`` characters, then ``closer``.
+
+    The characters in between may be anything but (the first character of)
+    ``closer``, or anything at all for a multi-character ``closer``, which
+    ends at its first occurrence, like ``.*?``. Yields ``(start, end)`` as
+    ``re.finditer`` would.
+    """
+    pos = text.find(opener)
+    while pos != -1:
+        inner = pos + len(opener)
+        close = text.find(closer, inner)
+        if close == -1:
+            return  # Later openers cannot be closed either
+        if close - inner >= min_inner:
+            end = close + len(closer)
+            yield pos, end
+            pos = text.find(opener, end)
+        else:
+            pos = text.find(opener, pos + 1)
+
+
+def _bracket_links(text: str, opener: str, min_label: int) -> Iterator[Tuple[int, int, int]]:
+    """Matches of ``opener [^\\]]{min_label,} \\] \\( [^)]+ \\)``, as ``re.finditer`` finds them.
+
+    Yields ``(start, close, end)``, where ``close`` is the index of the ``]``.
+    """
+    pos = text.find(opener)
+    while pos != -1:
+        label = pos + len(opener)
+        close = text.find(']', label)
+        if close == -1:
+            return
+        if close - label >= min_label and text.startswith('(', close + 1):
+            end = text.find(')', close + 2)
+            if end == -1:
+                return
+            if end > close + 2:
+                yield pos, close, end + 1
+                pos = text.find(opener, end + 1)
+                continue
+        # Every opener before `close` reaches the same "]" and fails the same way
+        pos = text.find(opener, close + 1)
+
+
+def _link_refs(body: str) -> Iterator[str]:
+    """``LINK_REF.findall(body)``."""
+    pos = body.find('[[')
+    while pos != -1:
+        close = body.find(']', pos + 2)
+        if close == -1:
+            return
+        if close > pos + 2 and body.startswith(']', close + 1):
+            yield body[pos + 2:close]
+            pos = body.find('[[', close + 2)
+        else:
+            pos = body.find('[[', close + 1)
+
+
+def _html_img_sources(body: str) -> Iterator[str]:
+    """``re.findall(r'<img[^>]+src=["\\']([^"\\']+)["\\'][^>]*>', body, re.IGNORECASE)``."""
+    candidate = _HTML_IMG_START.search(body)
+    while candidate is not None:
+        pos = candidate.end()
+        tag_end = body.find('>', pos)  # Where "[^>]+" stops
+        if tag_end == -1:
+            return
+        # The greedy "[^>]+" settles on the last "src=" that leads to a match
+        for src in reversed(list(_HTML_IMG_SRC.finditer(body, pos + 1, tag_end))):
+            value = src.end()
+            quotes = [q for q in (body.find('"', value), body.find("'", value)) if q != -1]
+            close = min(quotes) if quotes else -1
+            end = body.find('>', close + 1) if close > value else -1
+            if end != -1:
+                yield body[value:close]
+                candidate = _HTML_IMG_START.search(body, end + 1)
+                break
+        else:
+            # Every "<img" before the ">" fails the same way
+            candidate = _HTML_IMG_START.search(body, tag_end + 1)
+
+
+def _remove(text: str, spans: Iterator[Tuple[int, ...]]) -> str:
+    pieces = []
+    pos = 0
+    for span in spans:
+        pieces.append(text[pos:span[0]])
+        pos = span[-1]
+    if not pieces:
+        return text
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def _count_words(text: str, fences: List[Tuple[int, int]]) -> int:
+    text = _remove(text, iter(fences))
+    if '`' in text:
+        text = _remove(text, _spans(text, '`', '`', 1))
+    if '<' in text:
+        text = _remove(text, _spans(text, '<', '>', 1))
+    if '](' in text:
+        # "[text](url)" reads as "text"
+        pieces = []
+        pos = 0
+        for start, close, end in _bracket_links(text, '[', 1):
+            pieces.append(text[pos:start])
+            pieces.append(text[start + 1:close])
+            pos = end
+        pieces.append(text[pos:])
+        text = ''.join(pieces)
+        if '![' in text:
+            text = _remove(text, _bracket_links(text, '![', 0))
+    if '#' in text:
+        text = _HEADING_MARKER.sub('', text)
+    # Emphasis characters go; words made only of them go with them
+    return len(text.replace('*', '').replace('_', '').replace('`', '').split())
+
+
+def _unique(items: List[str]) -> List[str]:
+    return list(dict.fromkeys(items))
+
+
+def analyze_body(body: str) -> BodyAnalysis:
+    """Analyze ``body``; see the module docstring.
+
+    The fenced code ranges are found once and reused by the word count.
+    """
+    code_ranges = list(_spans(body, '```', '```', 0))
+    word_count = _count_words(body, code_ranges)
+
+    images = [body[close + 2:end - 1] for _, close, end in _bracket_links(body, '![', 0)]
+    links = [body[close + 2:end - 1] for _, close, end in _bracket_links(body, '[', 0)]
+    asset_links = [path for path in links if path.lower().endswith(ASSET_EXTENSIONS)]
+    asset_ids = [
+        asset for asset in images + list(_html_img_sources(body)) + asset_links
+        # Local assets only: skip URLs and absolute paths
+        if not asset.startswith(('http://', 'https://', 'ftp://', '//', '/'))
+    ]
+
+    return BodyAnalysis(word_count, _unique(list(_link_refs(body))), _unique(asset_ids), code_ranges)
@@ -0,0 +1,111 @@
+"""Helpers for running ORMD commands over many documents at once.
+
+Paths given on the command line may be files, directories (searched
+recursively for ``*.ormd``) or glob patterns. Work is spread across a
+process pool and results are always returned in the sorted input order so
+output is stable regardless of which worker finishes first.
+"""
+
+import glob
+import os
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from .validator import ORMDValidator
+
+if TYPE_CHECKING:
+    from .cache import ValidationCache
+
+T = TypeVar('T')
+
+_GLOB_CHARS = ('*', '?', '[')
+
+
+def collect_ormd_files(paths: Iterable[str]) -> List[str]:
+    """Expand files, directories and glob patterns into a sorted file list.
+
+    Directories contribute every ``*.ormd`` file below them. Explicitly named
+    files are kept even if they do not exist so the caller can report them.
+    """
+    found = set()
+    for path in paths:
+        if any(char in path for char in _GLOB_CHARS) and not Path(path).exists():
+            found.update(match for match in glob.glob(path, recursive=True) if Path(match).is_file())
+        elif Path(path).is_dir():
+            found.update(str(match) for match in Path(path).rglob('*.ormd') if match.is_file())
+        else:
+            found.add(path)
+    return sorted(found)
+
+
+def resolve_jobs(jobs: Optional[int], task_count: int) -> int:
+    """Number of worker processes to use (``None``/0 means one per CPU)."""
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    return max(1, min(jobs, task_count))
+
+
+def run_parallel(func: Callable[[str], T], items: List[str], jobs: Optional[int]) -> List[T]:
+    """Apply ``func`` to every item, in a process pool when it pays off.
+
+    ``func`` must be a picklable module-level function (or a
+    ``functools.partial`` of one). Results keep the order of ``items``.
+    """
+    workers = resolve_jobs(jobs, len(items))
+    if workers == 1:
+        return [func(item) for item in items]
+
+    from concurrent.futures import ProcessPoolExecutor  # Only paid for when a pool is used
+
+    # Hand out work in chunks so tens of thousands of small documents do not
+    # pay one inter-process round trip each.
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
+
+
+def _validate_one(file_path: str) -> Tuple[str, bool, ORMDValidator]:
+    validator = ORMDValidator()
+    is_valid = validator.validate_file(file_path)
+    return file_path, is_valid, validator
+
+
+def validate_files(files: List[str], jobs: Optional[int] = None,
+                   cache: Optional['ValidationCache'] = None) -> List[Tuple[str, bool, ORMDValidator]]:
+    """Validate ``files`` and return ``(file_path, is_valid, validator)`` tuples.
+
+    With a ``cache``, unchanged documents reuse their stored result and only
+    the remaining files are sent to the worker pool.
+    """
+    if cache is None:
+        return run_parallel(_validate_one, files, jobs)
+
+    results: List[Optional[Tuple[str, bool, ORMDValidator]]] = [cache.get(f) for f in files]
+    misses = [i for i, result in enumerate(results) if result is None]
+    fresh = run_parallel(_validate_one, [files[i] for i in misses], jobs)
+    for i, result in zip(misses, fresh):
+        results[i] = result
+        cache.put(*result)
+    return results
+
+
+def _update_one(file_path: str, dry_run: bool, force_update: bool) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    from .updater import ORMDUpdater
+
+    try:
+        result = ORMDUpdater().update_file(file_path, dry_run=dry_run, force_update=force_update)
+    except Exception as e:
+        return file_path, None, str(e)
+    return file_path, result, None
+
+
+def update_files(files: List[str], jobs: Optional[int] = None, dry_run: bool = False,
+                 force_update: bool = False) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """Update ``files`` and return ``(file_path, result, error)`` tuples.
+
+    ``result`` is the :meth:`ORMDUpdater.update_file` dict, or ``None`` with
+    ``error`` set when the file could not be updated. Each worker writes its
+    own files, so one failure does not stop the rest of the batch.
+    """
+    return run_parallel(partial(_update_one, dry_run=dry_run, force_update=force_update), files, jobs)
@@ -0,0 +1,183 @@
+"""Persistent cache of validation results.
+
+Results are stored in a small SQLite database (``.ormd-cache/validation.sqlite``
+by default, or under ``$ORMD_CACHE_DIR``) keyed on the document's content
+digest, a fingerprint of the validator code and the document's directory
+(asset checks resolve relative to it). Each entry also records which assets
+existed when it was stored, so adding or removing an asset invalidates it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .validator import ORMDValidator
+
+CACHE_DIR_ENV = 'ORMD_CACHE_DIR'
+DEFAULT_CACHE_DIR = '.ormd-cache'
+CACHE_FORMAT = 1
+
+# Modules whose code determines validation results
+_VALIDATOR_MODULES = ('validator.py', 'schema.py', 'parser.py', 'analyzer.py', 'links.py')
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR))
+
+
+def validator_fingerprint() -> str:
+    """Digest of the validator sources, so code changes invalidate old entries."""
+    digest = hashlib.blake2b(str(CACHE_FORMAT).encode(), digest_size=16)
+    package_dir = Path(__file__).parent
+    for name in _VALIDATOR_MODULES:
+        digest.update((package_dir / name).read_bytes())
+    return digest.hexdigest()
+
+
+def file_digest(file_path: Path) -> str:
+    """Content digest of ``file_path``, read in chunks."""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_size(size: str) -> int:
+    """Parse a size such as ``'500K'``, ``'64MB'`` or ``'1G'`` into bytes."""
+    units = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = size.strip().upper().rstrip('B')
+    unit = text[-1:] if text[-1:] in units else ''
+    number = text[:-1] if unit else text
+    try:
+        return int(float(number) * units[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {size!r} (expected e.g. 500K, 64MB, 1G)")
+
+
+class ValidationCache:
+    """SQLite-backed store of ``ORMDValidator`` results."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.fingerprint = validator_fingerprint()
+        self._conn = sqlite3.connect(str(self.cache_dir / 'validation.sqlite'), timeout=30)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   digest TEXT NOT NULL,
+                   fingerprint TEXT NOT NULL,
+                   base_dir TEXT NOT NULL,
+                   valid INTEGER NOT NULL,
+                   errors TEXT NOT NULL,
+                   warnings TEXT NOT NULL,
+                   assets TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (digest, fingerprint, base_dir)
+               )"""
+        )
+        self._digests: Dict[str, Tuple[str, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self) -> 'ValidationCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _key(self, file_path: str) -> Optional[Tuple[str, str]]:
+        if file_path not in self._digests:
+            path = Path(file_path)
+            try:
+                self._digests[file_path] = (file_digest(path), str(path.resolve().parent))
+            except OSError:
+                return None
+        return self._digests[file_path]
+
+    def get(self, file_path: str) -> Optional[Tuple[str, bool, ORMDValidator]]:
+        """Return a cached ``(file_path, is_valid, validator)`` result, if still current."""
+        key = self._key(file_path)
+        if key is None:
+            return None
+        digest, base_dir = key
+        row = self._conn.execute(
+            "SELECT valid, errors, warnings, assets FROM results "
+            "WHERE digest = ? AND fingerprint = ? AND base_dir = ?",
+            (digest, self.fingerprint, base_dir),
+        ).fetchone()
+        if row is None or not self._assets_unchanged(Path(base_dir), json.loads(row[3])):
+            self.misses += 1
+            return None
+
+        self._conn.execute(
+            "UPDATE results SET last_used = ? WHERE digest = ? AND fingerprint = ? AND base_dir = ?",
+            (time.time(), digest, self.fingerprint, base_dir),
+        )
+        self.hits += 1
+        validator = ORMDValidator()
+        validator.errors = json.loads(row[1])
+        validator.warnings = json.loads(row[2])
+        return file_path, bool(row[0]), validator
+
+    def put(self, file_path: str, is_valid: bool, validator: ORMDValidator) -> None:
+        """Store the result of validating ``file_path``."""
+        key = self._key(file_path)
+        if key is None:
+            return
+        digest, base_dir = key
+        assets = [[asset, (Path(base_dir) / asset).exists()] for asset in validator.checked_assets]
+        errors = json.dumps(validator.errors)
+        warnings = json.dumps(validator.warnings)
+        assets_json = json.dumps(assets)
+        size = len(digest) + len(base_dir) + len(errors) + len(warnings) + len(assets_json)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, self.fingerprint, base_dir, int(is_valid), errors, warnings,
+             assets_json, size, time.time()),
+        )
+
+    @staticmethod
+    def _assets_unchanged(base_dir: Path, assets: List[List]) -> bool:
+        return all((base_dir / asset).exists() == existed for asset, existed in assets)
+
+    def prune(self, max_bytes: int) -> Tuple[int, int]:
+        """Evict entries until the cache holds at most ``max_bytes`` of results.
+
+        Entries written by other validator versions go first, then the least
+        recently used. Returns ``(entries_removed, bytes_remaining)``.
+        """
+        removed = self._conn.execute(
+            "DELETE FROM results WHERE fingerprint != ?", (self.fingerprint,)
+        ).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total > max_bytes:
+            evict = []
+            for rowid, size in self._conn.execute("SELECT rowid, size FROM results ORDER BY last_used"):
+                if total <= max_bytes:
+                    break
+                evict.append((rowid,))
+                total -= size
+            self._conn.executemany("DELETE FROM results WHERE rowid = ?", evict)
+            removed += len(evict)
+        self._conn.commit()
+        self._conn.execute("VACUUM")
+        return removed, total
+
+
+def open_cache(cache_dir: Optional[Path] = None) -> Optional[ValidationCache]:
+    """Open the validation cache, or return ``None`` if it is unavailable."""
+    try:
+        return ValidationCache(cache_dir)
+    except (OSError, sqlite3.Error):
+        return None
@@ -4,12 +4,6 @@ from datetime import datetime, timezone, timedelta
 import re
 from typing import Optional
 
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams, LTTextBoxHorizontal
-from pdfminer.pdfparser import PDFParser, PDFSyntaxError
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.psparser import PSKeyword, PSLiteral
-from pdfminer.utils import decode_text
 import yaml # Though not directly used in convert, it's a common format, good to have.
 
 from .utils import SYMBOLS
@@ -225,6 +219,13 @@ def convert_cmd(ctx, input_file_path: str, output_ormd_path: str, input_format:
         elif effective_input_format == 'pdf':
             logger.info(f"Converting from {effective_input_format.upper()} to ORMD...") # Standardized this message
             logger.debug(f"  PDF conversion selected for '{input_p.name}'.") # More specific debug
+            # pdfminer is large; load it only when a PDF is actually converted
+            from pdfminer.high_level import extract_pages
+            from pdfminer.layout import LAParams, LTTextBoxHorizontal
+            from pdfminer.pdfparser import PDFParser, PDFSyntaxError
+            from pdfminer.pdfdocument import PDFDocument
+            from pdfminer.psparser import PSKeyword, PSLiteral
+            from pdfminer.utils import decode_text
 
             # --- Metadata Extraction ---
             pdf_meta = {}
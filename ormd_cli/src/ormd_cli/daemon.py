@@ -0,0 +1,310 @@
+"""Long-running ORMD daemon and its client.
+
+``ormd daemon`` keeps the validator, updater and HTML renderer imported in
+one process and serves requests over a Unix domain socket. The protocol is
+JSON lines: each request is one JSON object per line, for example::
+
+    {"command": "validate", "paths": ["/abs/doc.ormd"]}
+    {"command": "update", "path": "/abs/doc.ormd", "dry_run": true}
+    {"command": "render", "input_file": "/abs/doc.ormd", "out": "/abs/doc.html"}
+    {"command": "ping"}
+
+and each response is one JSON object per line with ``"ok": true`` plus the
+command's result, or ``"ok": false`` and an ``"error"`` message. A
+connection may carry any number of requests.
+
+Requests from ``ormd --daemon`` also carry the client's settings (see
+:func:`client_settings`): its working directory, ``--template-dir``
+directories and the ``ORMD_*`` variables that ``--no-guess-lang`` and
+``--highlight-cache-dir`` set, so the daemon renders and validates exactly
+as the command would in-process. Relative paths among them, and the
+default ``.ormd-cache``, are resolved against the client's directory.
+
+The client half (:func:`request`) only needs the standard library so that
+``ormd --daemon ...`` stays cheap; it returns ``None`` when no daemon is
+listening and callers then run the command in-process.
+"""
+
+import json
+import os
+import socket
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+SOCKET_ENV = 'ORMD_DAEMON_SOCKET'
+_CONNECT_TIMEOUT = 0.5
+
+# Environment the template cache, the highlighter and the validation cache
+# read their settings from; the path-valued ones are relative to the client
+SETTINGS_ENV = ('ORMD_TEMPLATE_PATH', 'ORMD_GUESS_LANG', 'ORMD_HIGHLIGHT_CACHE_DIR', 'ORMD_CACHE_DIR')
+_PATH_SETTINGS = ('ORMD_TEMPLATE_PATH', 'ORMD_HIGHLIGHT_CACHE_DIR', 'ORMD_CACHE_DIR')
+
+
+def default_socket_path() -> Path:
+    """Socket location: ``$ORMD_DAEMON_SOCKET``, else a per-user runtime dir."""
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return Path(runtime_dir) / 'ormd' / 'daemon.sock'
+    user = os.getuid() if hasattr(os, 'getuid') else os.environ.get('USERNAME', 'user')
+    return Path(tempfile.gettempdir()) / f'ormd-{user}' / 'daemon.sock'
+
+
+def _check_private(directory: Path) -> None:
+    """Raise ``OSError`` unless ``directory`` is ours and no one else can write to it.
+
+    In a shared temporary directory anyone can create ``ormd-<uid>`` first
+    and put their own socket in it.
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise OSError(f"{directory} must be a directory owned by the current user that others cannot write to; "
+                      f"remove it or set {SOCKET_ENV}")
+
+
+def request(payload: Dict[str, Any], socket_path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Send one request to the daemon and return its response.
+
+    Returns ``None`` if no daemon is reachable (or Unix sockets are not
+    supported on this platform).
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    if socket_path is None:
+        socket_path = default_socket_path()
+        if not os.environ.get(SOCKET_ENV):
+            try:
+                _check_private(socket_path.parent)
+            except OSError:
+                return None  # Missing, or someone else's: do not send them our paths
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(str(socket_path))
+        # Rendering a large document can take a while; only connecting is bounded
+        sock.settimeout(None)
+        sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def client_settings(template_dirs: Iterable[Path] = ()) -> Dict[str, Any]:
+    """Settings of this process for a request's ``"settings"`` field."""
+    return {
+        'cwd': os.getcwd(),
+        'template_dirs': [str(d) for d in template_dirs],
+        'env': {name: os.environ[name] for name in SETTINGS_ENV if name in os.environ},
+    }
+
+
+def _resolve_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Make the paths in ``settings`` absolute, against the client's directory."""
+    cwd = Path(settings['cwd'])
+    env = dict(settings.get('env') or {})
+    for name in _PATH_SETTINGS:
+        if env.get(name):
+            env[name] = os.pathsep.join(str(cwd / path) for path in env[name].split(os.pathsep) if path)
+    return {
+        'cwd': str(cwd),
+        'template_dirs': [str(cwd / d) for d in settings.get('template_dirs') or ()],
+        'env': env,
+    }
+
+
+class _SettingsGate:
+    """Runs each request with its client's settings.
+
+    Template directories, the environment and the highlight cache are
+    process-wide, so requests run concurrently only while their settings
+    agree; a request with other settings waits for those in flight, then
+    switches the process over.
+    """
+
+    def __init__(self):
+        self._current: Optional[Dict[str, Any]] = None
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def applied(self, settings: Optional[Dict[str, Any]]) -> Iterator[None]:
+        if settings is None:
+            # Requests without settings (ping, older clients) run as the daemon is
+            yield
+            return
+        key = {'template_dirs': settings['template_dirs'], 'env': settings['env']}
+        with self._idle:
+            while self._active and key != self._current:
+                self._idle.wait()
+            if key != self._current:
+                self._apply(key)
+                self._current = key
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def _apply(self, key: Dict[str, Any]) -> None:
+        from .highlight import HIGHLIGHT_CACHE_DIR_ENV, reset_highlight_cache
+        from .template_cache import set_template_dirs
+
+        old_highlight_dir = os.environ.get(HIGHLIGHT_CACHE_DIR_ENV)
+        for name in SETTINGS_ENV:
+            if name in key['env']:
+                os.environ[name] = key['env'][name]
+            else:
+                os.environ.pop(name, None)
+        set_template_dirs(key['template_dirs'])
+        if os.environ.get(HIGHLIGHT_CACHE_DIR_ENV) != old_highlight_dir:
+            reset_highlight_cache()
+
+
+_gate = _SettingsGate()
+
+
+def _validate(params: Dict[str, Any]) -> Dict[str, Any]:
+    from .batch import validate_files
+    from .cache import default_cache_dir, open_cache
+
+    cache_dir = None
+    if params.get('settings') is not None:
+        # The default cache directory is the client's, not the daemon's
+        cache_dir = Path(params['settings']['cwd']) / default_cache_dir()
+    cache = None if params.get('no_cache') else open_cache(cache_dir)
+    try:
+        results = validate_files(params['paths'], params.get('jobs') or 1, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    return {
+        'results': [
+            {'file': file_path, 'valid': is_valid, 'errors': validator.errors, 'warnings': validator.warnings}
+            for file_path, is_valid, validator in results
+        ]
+    }
+
+
+def _update(params: Dict[str, Any]) -> Dict[str, Any]:
+    from .updater import ORMDUpdater
+
+    result = ORMDUpdater().update_file(
+        params['path'],
+        dry_run=params.get('dry_run', False),
+        force_update=params.get('force_update', False),
+        verbose=params.get('verbose', False),
+    )
+    return {'result': result}
+
+
+def _render(params: Dict[str, Any]) -> Dict[str, Any]:
+    from .html_generator import write_render_file
+
+    out_path = Path(params['out'])
+    if out_path.exists() and not params.get('overwrite', False):
+        return {'written': False, 'output': str(out_path)}
+    write_render_file(params['input_file'], out_path, params.get('raw_source', 'inline'))
+    return {'written': True, 'output': str(out_path)}
+
+
+_COMMANDS = {
+    'ping': lambda params: {'pid': os.getpid()},
+    'validate': _validate,
+    'update': _update,
+    'render': _render,
+}
+
+
+def handle_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one decoded request and build its response object."""
+    handler = _COMMANDS.get(payload.get('command'))
+    if handler is None:
+        return {'ok': False, 'error': f"Unknown command: {payload.get('command')!r}"}
+    try:
+        settings = payload.get('settings')
+        with _gate.applied(_resolve_settings(settings) if settings is not None else None):
+            response = handler(payload)
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    response['ok'] = True
+    return response
+
+
+def serve(socket_path: Optional[Path] = None) -> None:
+    """Serve requests on ``socket_path`` until interrupted."""
+    import signal
+    import socketserver
+
+    # Import the heavy modules once, up front, so requests find them warm
+    from . import batch, cache, html_generator, updater  # noqa: F401
+    from .logger import logger
+    from .utils import SYMBOLS
+
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        raise OSError("Unix domain sockets are not supported on this platform")
+
+    chosen = socket_path is not None or bool(os.environ.get(SOCKET_ENV))
+    socket_path = Path(socket_path or default_socket_path())
+    socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    if not chosen:
+        _check_private(socket_path.parent)
+    if socket_path.exists():
+        if request({'command': 'ping'}, socket_path) is not None:
+            raise OSError(f"A daemon is already listening on {socket_path}")
+        socket_path.unlink()  # Stale socket from a daemon that did not exit cleanly
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    response = handle_request(json.loads(line))
+                except ValueError as e:
+                    response = {'ok': False, 'error': f"Invalid JSON request: {e}"}
+                # Front-matter values may be dates; fall back to their string form
+                self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Create the socket as 0600 rather than chmod it after bind, which
+    # would leave a moment in which others could connect
+    umask = os.umask(0o177)
+    try:
+        server = Server(str(socket_path), RequestHandler)
+    finally:
+        os.umask(umask)
+
+    with server:
+        if threading.current_thread() is threading.main_thread():
+            # Remove the socket on `kill` as well as on Ctrl+C
+            signal.signal(signal.SIGTERM, _stop)
+        logger.info(f"{SYMBOLS['success']} ORMD daemon listening on {socket_path}")
+        logger.info(f"{SYMBOLS['info']} Press Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info(f"\n{SYMBOLS['info']} Stopping daemon...")
+        finally:
+            try:
+                socket_path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,209 @@
+"""Saving ``ormd edit`` changes through its local server.
+
+The editor sends only the lines that changed: a PATCH of ``/_ormd/source``
+with ``{"base": version, "edits": [{"start": s, "end": e, "lines": [...]}]}``,
+each edit replacing lines ``[s, e)`` (0-based) of the version the page last
+saved. A PUT sends the whole text instead. :class:`SourceFile` applies the
+change and writes the file atomically, refreshes the fields ``ormd update``
+derives from the body on the new text before writing it (so the file is
+written once), and validates just the lines the edits touched.
+
+A version is the source's ETag. A save based on another version than the
+file's current one (it changed on disk since) is refused, not merged.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .utils import atomic_open
+
+
+class EditConflict(Exception):
+    """The file is no longer at the version an edit was based on."""
+
+    def __init__(self, version: str):
+        super().__init__("The file changed on disk since it was last loaded or saved.")
+        self.version = version
+
+
+class LineEdit(NamedTuple):
+    """Replace lines ``[start, end)`` with ``lines``."""
+    start: int
+    end: int
+    lines: List[str]
+
+    @classmethod
+    def from_json(cls, data: Any) -> 'LineEdit':
+        try:
+            start, end, lines = data['start'], data['end'], data['lines']
+        except (TypeError, KeyError):
+            raise ValueError(f"An edit needs 'start', 'end' and 'lines': {data!r}")
+        if not (isinstance(start, int) and isinstance(end, int) and 0 <= start <= end):
+            raise ValueError(f"Invalid line range in edit: {start!r}-{end!r}")
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise ValueError("An edit's 'lines' must be a list of strings")
+        return cls(start, end, lines)
+
+    def as_json(self) -> Dict[str, Any]:
+        return {'start': self.start, 'end': self.end, 'lines': self.lines}
+
+
+def source_version(text: str) -> str:
+    """Version (ETag) of the source ``text``."""
+    return '"%s"' % hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def apply_line_edits(lines: List[str], edits: Sequence[LineEdit]) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Apply ``edits``, which must not overlap, to ``lines``.
+
+    Returns the new lines and the range each edit's lines take in them.
+    """
+    result: List[str] = []
+    regions: List[Tuple[int, int]] = []
+    pos = 0
+    for edit in sorted(edits, key=lambda edit: (edit.start, edit.end)):
+        if edit.start < pos:
+            raise ValueError(f"Edits overlap at line {edit.start}")
+        if edit.end > len(lines):
+            raise ValueError(f"Edit of lines {edit.start}-{edit.end} is past the end ({len(lines)} lines)")
+        result.extend(lines[pos:edit.start])
+        regions.append((len(result), len(result) + len(edit.lines)))
+        result.extend(edit.lines)
+        pos = edit.end
+    result.extend(lines[pos:])
+    return result, regions
+
+
+def diff_lines(old: List[str], new: List[str]) -> Optional[LineEdit]:
+    """The single edit turning ``old`` into ``new`` (all lines between the first and last change)."""
+    start = 0
+    while start < len(old) and start < len(new) and old[start] == new[start]:
+        start += 1
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    if start == old_end == new_end:
+        return None
+    return LineEdit(start, old_end, new[start:new_end])
+
+
+def _normalize_newlines(text: str) -> str:
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class SourceFile:
+    """A plain ``.ormd`` file that ``ormd edit`` saves to; see the module docstring."""
+
+    def __init__(self, path, refresh_metadata: bool = True):
+        self.path = Path(path)
+        self.refresh_metadata = refresh_metadata
+        self._lock = threading.Lock()
+        self._state: Optional[Tuple[int, int]] = None
+        self._text = ''
+        # Newlines are '\n' in memory; CRLF files are written back with CRLF
+        self._newline = '\n'
+
+    def _read(self) -> str:
+        """The current text, read again only if the file changed on disk."""
+        stat = self.path.stat()
+        state = (stat.st_mtime_ns, stat.st_size)
+        if state != self._state:
+            with open(self.path, 'r', encoding='utf-8', newline='') as f:
+                raw = f.read()
+            self._newline = '\r\n' if '\r\n' in raw else '\n'
+            self._text = _normalize_newlines(raw)
+            self._state = state
+        return self._text
+
+    def read(self) -> Tuple[str, str]:
+        """``(text, version)`` of the file."""
+        with self._lock:
+            text = self._read()
+            return text, source_version(text)
+
+    def _check_base(self, text: str, base: Optional[str]) -> None:
+        version = source_version(text)
+        if base != version:
+            raise EditConflict(version)
+
+    def patch(self, base: Optional[str], edits: Sequence[LineEdit]) -> Dict[str, Any]:
+        """Apply line ``edits`` to version ``base`` of the file and save it; see :meth:`_save`."""
+        with self._lock:
+            text = self._read()
+            self._check_base(text, base)
+            lines, regions = apply_line_edits(text.split('\n'), edits)
+            return self._save('\n'.join(lines), regions)
+
+    def replace(self, text: str, base: Optional[str] = None) -> Dict[str, Any]:
+        """Save ``text`` as the file's content; with ``base``, only if the file is still at that version."""
+        text = _normalize_newlines(text)
+        with self._lock:
+            current = self._read()
+            if base is not None:
+                self._check_base(current, base)
+            edit = diff_lines(current.split('\n'), text.split('\n'))
+            regions = [(edit.start, edit.start + len(edit.lines))] if edit else []
+            return self._save(text, regions)
+
+    def _save(self, text: str, regions: List[Tuple[int, int]]) -> Dict[str, Any]:
+        """Refresh derived fields, write ``text`` and validate ``regions`` (line ranges in ``text``).
+
+        Returns the new ``version``, the ``edits`` the refresh made to the
+        saved text, the ``updated`` fields and the ``validation`` results.
+        """
+        from .updater import ORMDUpdater
+
+        changes: Dict[str, Any] = {}
+        refresh_edits: List[LineEdit] = []
+        if self.refresh_metadata:
+            try:
+                refreshed, changes = ORMDUpdater().update_text(text)
+            except ValueError:
+                refreshed = None  # Parse errors, which the validation reports
+            if refreshed is not None:
+                edit = diff_lines(text.split('\n'), refreshed.split('\n'))
+                if edit is not None:
+                    refresh_edits.append(edit)
+                    regions = [_shift_region(region, edit) for region in regions]
+                text = refreshed
+
+        with atomic_open(self.path, newline=self._newline) as f:
+            f.write(text)
+        stat = self.path.stat()
+        self._state = (stat.st_mtime_ns, stat.st_size)
+        self._text = text
+
+        return {
+            'version': source_version(text),
+            'edits': [edit.as_json() for edit in refresh_edits],
+            'updated': changes,
+            'validation': self._validate(text, regions),
+        }
+
+    def _validate(self, text: str, regions: List[Tuple[int, int]]) -> Dict[str, Any]:
+        from .parser import parse_document_lazy
+        from .validator import ORMDValidator
+
+        validator = ORMDValidator()
+        document = parse_document_lazy(text)
+        for start, end in sorted(regions):
+            validator.validate_region(document, self.path.parent, start, end)
+        errors = list(dict.fromkeys(validator.errors))
+        return {
+            'valid': not errors,
+            'lines': [min(start for start, _ in regions), max(end for _, end in regions)] if regions else None,
+            'errors': errors,
+            'warnings': list(dict.fromkeys(validator.warnings)),
+        }
+
+
+def _shift_region(region: Tuple[int, int], edit: LineEdit) -> Tuple[int, int]:
+    """Where ``region`` is after ``edit``; a region that overlaps it grows to cover it."""
+    start, end = region
+    delta = len(edit.lines) - (edit.end - edit.start)
+    if start >= edit.end:
+        return start + delta, end + delta
+    return min(start, edit.start), max(end + delta if end > edit.end else end, edit.start + len(edit.lines))
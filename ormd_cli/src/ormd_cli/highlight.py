@@ -0,0 +1,178 @@
+"""Cached Pygments highlighting for code blocks.
+
+Python-Markdown's ``codehilite`` and ``fenced_code`` extensions run Pygments
+on every code block of every render, and when a block has no language,
+``guess_lang`` tries every lexer on it. :class:`CachedCodeHilite` keeps the
+highlighted HTML keyed on a digest of the code, its language and all lexer
+and formatter options, so a snippet that recurs across documents or renders
+is highlighted once. The cache is an in-memory LRU, backed by a directory of
+HTML files when ``$ORMD_HIGHLIGHT_CACHE_DIR`` is set (``ormd
+--highlight-cache-dir``) so separate processes and runs share it.
+
+``$ORMD_GUESS_LANG=0`` (``ormd --no-guess-lang``) turns off lexer guessing:
+blocks without a known fence language are rendered as plain text.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import types
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import pygments
+from markdown import Extension, Markdown
+from markdown.extensions.codehilite import CodeHilite, HiliteTreeprocessor
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+from .utils import atomic_open
+
+HIGHLIGHT_CACHE_DIR_ENV = 'ORMD_HIGHLIGHT_CACHE_DIR'
+GUESS_LANG_ENV = 'ORMD_GUESS_LANG'
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def guess_lang_enabled() -> bool:
+    """Whether code blocks without a known language get a guessed lexer."""
+    return os.environ.get(GUESS_LANG_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+class HighlightCache:
+    """Highlighted HTML by key: an LRU in memory, optionally backed by files."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, cache_dir: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.html'
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+        if self.cache_dir is not None:
+            try:
+                html = self._path(key).read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError):
+                html = None
+            if html is not None:
+                self._remember(key, html)
+                with self._lock:
+                    self.hits += 1
+                return html
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, html: str) -> None:
+        self._remember(key, html)
+        if self.cache_dir is not None:
+            try:
+                self._write(self._path(key), html)
+            except OSError:
+                pass  # The disk tier is best effort
+
+    def _remember(self, key: str, html: str) -> None:
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _write(path: Path, html: str) -> None:
+        # atomic_open, so concurrent renders never read a partial entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(path, newline='') as f:
+            f.write(html)
+
+
+_cache: Optional[HighlightCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_highlight_cache() -> HighlightCache:
+    """Return the process-wide highlight cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_dir = os.environ.get(HIGHLIGHT_CACHE_DIR_ENV)
+                _cache = HighlightCache(cache_dir=Path(cache_dir) if cache_dir else None)
+    return _cache
+
+
+def reset_highlight_cache() -> None:
+    """Drop the process-wide highlight cache; the next use rebuilds it from the environment."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+class CachedCodeHilite(CodeHilite):
+    """``CodeHilite`` that reuses highlighted HTML from :func:`get_highlight_cache`."""
+
+    def hilite(self, shebang: bool = True) -> str:
+        if not isinstance(self.pygments_formatter, str):
+            # A formatter class may carry state the key cannot capture
+            return super().hilite(shebang)
+        key = hashlib.blake2b(json.dumps(
+            [pygments.__version__, self.src, self.lang, shebang, self.guess_lang, self.use_pygments,
+             self.lang_prefix, self.pygments_formatter, self.options],
+            sort_keys=True, default=repr,
+        ).encode('utf-8', 'surrogatepass'), digest_size=20).hexdigest()
+        cache = get_highlight_cache()
+        html = cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            cache.put(key, html)
+        return html
+
+
+def _highlighting_through_cache(function: types.FunctionType) -> types.FunctionType:
+    """A copy of ``function`` in which the global name ``CodeHilite`` is :class:`CachedCodeHilite`."""
+    namespace = dict(function.__globals__, CodeHilite=CachedCodeHilite)
+    copy = types.FunctionType(function.__code__, namespace, function.__name__, function.__defaults__,
+                              function.__closure__)
+    copy.__kwdefaults__ = function.__kwdefaults__
+    return copy
+
+
+class _CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    run = _highlighting_through_cache(HiliteTreeprocessor.run)
+
+
+class _CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    run = _highlighting_through_cache(FencedBlockPreprocessor.run)
+
+
+class CachedHighlightExtension(Extension):
+    """Make ``codehilite`` and ``fenced_code`` highlight through the cache.
+
+    Both build their highlighter from the ``CodeHilite`` name in their own
+    module. This extension swaps their processors for subclasses whose
+    ``run`` is the same code with that name bound to
+    :class:`CachedCodeHilite`, whose output is identical. Only the Markdown
+    instance it is added to is affected. List it after the extensions it
+    changes; it leaves alone any that are not loaded.
+    """
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        # Same names and priorities as the processors being replaced
+        if 'hilite' in md.treeprocessors:
+            hiliter = _CachedHiliteTreeprocessor(md)
+            hiliter.config = md.treeprocessors['hilite'].config
+            md.treeprocessors.register(hiliter, 'hilite', 30)
+        if 'fenced_code_block' in md.preprocessors:
+            config = md.preprocessors['fenced_code_block'].config
+            md.preprocessors.register(_CachedFencedBlockPreprocessor(md, config), 'fenced_code_block', 25)
@@ -1,128 +1,314 @@
+import copy
+import hashlib
+import html
 import markdown
 import json
 import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from .utils import get_view_template, SYMBOLS
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, TextIO, Tuple
+from markdown.extensions.toc import IDCOUNT_RE
+from .utils import SYMBOLS, atomic_open
+from .analyzer import LINK_REF
+from .packager import ORMDPackager
+from .links import LinkIndex
+from .parser import parse_document_lazy
+from .template_cache import CompiledTemplate, get_asset, get_template
+from . import highlight
+from .sections import SECTION_END_SOURCE, iter_sections
+
+# Markdown extensions used for every rendered document body
+MARKDOWN_EXTENSIONS = ['extra', 'toc', 'sane_lists', 'codehilite']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {
+        'css_class': 'codehilite',
+        'guess_lang': True,
+        'use_pygments': True
+    },
+    'toc': {
+        'permalink': True
+    }
+}
+
+
+class MarkdownRenderer:
+    """Converts Markdown to HTML, reusing one ``markdown.Markdown`` per thread.
+
+    Building a ``Markdown`` instance loads and registers every extension,
+    which costs more than converting a typical document. Each thread gets
+    its own instance (they are not thread-safe) on first use, and the
+    instance is ``reset()`` after every document so no state such as
+    footnotes or table-of-contents entries carries over.
+
+    Code blocks are highlighted through :mod:`.highlight`'s cache. With the
+    default configuration, ``guess_lang`` follows ``$ORMD_GUESS_LANG``.
+    """
+
+    def __init__(self, extensions: Optional[Sequence[Any]] = None,
+                 extension_configs: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.extensions = list(MARKDOWN_EXTENSIONS if extensions is None else extensions)
+        if extension_configs is None:
+            self.extension_configs = copy.deepcopy(MARKDOWN_EXTENSION_CONFIGS)
+            self.extension_configs['codehilite']['guess_lang'] = highlight.guess_lang_enabled()
+        else:
+            self.extension_configs = copy.deepcopy(extension_configs)
+        self._local = threading.local()
+
+    def _markdown(self) -> markdown.Markdown:
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            md = markdown.Markdown(extensions=self.extensions + [highlight.CachedHighlightExtension()],
+                                   extension_configs=self.extension_configs)
+            self._local.md = md
+        return md
+
+    def convert(self, text: str) -> str:
+        """Convert one Markdown document to HTML."""
+        md = self._markdown()
+        try:
+            return md.convert(text)
+        finally:
+            md.reset()
+
+    def convert_sections(self, sections: Iterable[str]) -> Iterator[str]:
+        """Convert a document split by :func:`.sections.iter_sections`, one section at a time.
+
+        The chunks joined are exactly ``convert(''.join(sections))``. Every
+        section but the last is converted with a sentinel heading after it;
+        what precedes the sentinel's HTML is the section's HTML plus the
+        separator the whole document would have. Heading ids repeated from
+        earlier sections are renumbered as the ``toc`` extension would have.
+        """
+        for text, _ in self.convert_sections_with_headings(sections):
+            yield text
+
+    def convert_sections_with_headings(self, sections: Iterable[str]) -> Iterator[Tuple[str, List['Heading']]]:
+        """Like :meth:`convert_sections`, also yielding each section's headings."""
+        md = self._markdown()
+        sentinel_html = self.convert(SECTION_END_SOURCE)
+        used_ids: Set[str] = set()
+        resumes: Dict[str, str] = {}
+        sections = iter(sections)
+        section = next(sections, None)
+        first = True
+        while section is not None:
+            following = next(sections, None)
+            try:
+                text = md.convert(section if following is None else section + SECTION_END_SOURCE)
+                headings = _flatten_toc(getattr(md, 'toc_tokens', []))
+            finally:
+                md.reset()
+            if following is not None:
+                if not text.endswith(sentinel_html):
+                    raise ValueError("Section boundary did not render as expected")
+                text = text[:-len(sentinel_html)]
+                headings = headings[:-1]
+            ids = [heading['id'] for heading in headings]
+            if first:
+                # Already numbered as in the whole document (and may carry explicit ids)
+                used_ids.update(ids)
+            elif headings:
+                text, ids = _renumber_headings(text, headings, used_ids, resumes, md.treeprocessors['toc'])
+            yield text, [Heading(heading['level'], heading_id, heading['name'])
+                         for heading, heading_id in zip(headings, ids)]
+            section = following
+            first = False
+
+
+class Heading(NamedTuple):
+    """A heading of a rendered body, as listed in its table of contents."""
+    level: int
+    id: str
+    name: str  # Text only, HTML-escaped
+
+
+_HEADING_ID = re.compile(r'<h[1-6] id="([^"]*)"')
+
+
+def _unique(heading_id: str, used_ids: Set[str], resumes: Dict[str, str]) -> str:
+    """``markdown.extensions.toc.unique``, resuming where the last search for ``heading_id`` ended.
+
+    ``used_ids`` only grows, so every id the earlier search skipped is still
+    taken; without this, a heading repeated n times costs O(n^2).
+    """
+    candidate = resumes.get(heading_id, heading_id)
+    while candidate in used_ids or not candidate:
+        m = IDCOUNT_RE.match(candidate)
+        if m:
+            candidate = '%s_%d' % (m.group(1), int(m.group(2)) + 1)
+        else:
+            candidate = '%s_%d' % (candidate, 1)
+    used_ids.add(candidate)
+    resumes[heading_id] = candidate
+    return candidate
+
+
+def _flatten_toc(tokens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """``toc_tokens`` in document order."""
+    flat = []
+    for token in tokens:
+        flat.append(token)
+        flat.extend(_flatten_toc(token['children']))
+    return flat
+
+
+def _renumber_headings(text: str, headings: List[Dict[str, Any]], used_ids: Set[str],
+                       resumes: Dict[str, str], toc) -> Tuple[str, List[str]]:
+    """Give the section's headings the ids they get in the whole document.
+
+    ``used_ids`` holds the ids of all earlier headings and is updated, as
+    is ``resumes`` (see :func:`_unique`).
+    Returns the new HTML and the headings' ids.
+    """
+    matches = list(_HEADING_ID.finditer(text))
+    if len(matches) != len(headings):
+        raise ValueError("Rendered headings do not match the table of contents")
+    pieces = []
+    ids = []
+    pos = 0
+    for match, heading in zip(matches, headings):
+        local_id = match.group(1)
+        final_id = _unique(toc.slugify(html.unescape(heading['name']), toc.sep), used_ids, resumes)
+        ids.append(final_id)
+        if final_id == local_id:
+            continue
+        # The id and the heading's own permalink
+        end = text.index('</h', match.end())
+        heading_html = text[match.start():end].replace(f'id="{local_id}"', f'id="{final_id}"', 1)
+        heading_html = heading_html.replace(f'href="#{local_id}"', f'href="#{final_id}"', 1)
+        pieces.append(text[pos:match.start()])
+        pieces.append(heading_html)
+        pos = end
+    pieces.append(text[pos:])
+    return ''.join(pieces), ids
+
+
+_default_renderer: Optional[MarkdownRenderer] = None
+_default_renderer_lock = threading.Lock()
+
+
+def get_markdown_renderer() -> MarkdownRenderer:
+    """Return the shared renderer used for document bodies."""
+    global _default_renderer
+    if _default_renderer is None:
+        with _default_renderer_lock:
+            if _default_renderer is None:
+                _default_renderer = MarkdownRenderer()
+    return _default_renderer
+
 
 def get_edit_template() -> str:
     """Reads and returns the content of the edit_template.html file."""
-    template_path = Path(__file__).parent / "templates" / "edit_template.html"
     try:
-        return template_path.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        return "<html><body><h1>Error: Edit template not found.</h1><p>Searched at: {}</p></body></html>".format(template_path.resolve())
+        return get_template("edit_template.html").source
+    except FileNotFoundError as e:
+        return f"<html><body><h1>Error: Edit template not found.</h1><p>{e}</p></body></html>"
     except Exception as e:
         return f"<html><body><h1>Error loading edit template: {e}</h1></body></html>"
 
-def _generate_viewable_html(file_path, raw_ormd, front_matter, body, links, meta):
-    """Generate HTML for viewing ORMD document"""
 
-    title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
-    permissions = front_matter.get('permissions', {}) if front_matter else {}
+def _load_template(name: str, label: str) -> CompiledTemplate:
+    """The compiled template ``name``, or a page reporting why it could not be loaded."""
+    try:
+        return get_template(name)
+    except FileNotFoundError as e:
+        message = f"<html><body><h1>Error: {label} template not found.</h1><p>{e}</p></body></html>"
+    except Exception as e:
+        message = f"<html><body><h1>Error loading {label.lower()} template: {e}</h1></body></html>"
+    return CompiledTemplate(message.replace('{', '{{').replace('}', '}}'))
+
+class PreparedDocument(NamedTuple):
+    """A document taken through the parse, link-resolve and Markdown stages."""
+    raw_ormd: str
+    front_matter: Optional[Dict[str, Any]]
+    body: str
+    parse_errors: List[str]
+    link_index: LinkIndex
+    main_html: str
 
-    # --- Semantic link rendering (same as render command) ---
-    def replace_link(match):
-        link_id = match.group(1)
-        link = next((l for l in links if l.get('id') == link_id), None)
-        if link:
-            rel = link.get('rel', 'related')
-            to = link.get('to', f'#{link_id}')
-            label = link_id
-            return f'<a href="{to}" class="ormd-link ormd-link-{rel}">{label}</a>'
-        else:
-            return f'<span class="ormd-link ormd-link-undefined">{link_id}</span>'
+    @property
+    def title(self) -> str:
+        return self.front_matter.get('title', 'ORMD Document') if self.front_matter else 'ORMD Document'
 
-    processed_body = re.sub(r'\[\[([^\]]+)\]\]', replace_link, body)
-
-    # Render Markdown to HTML with syntax highlighting
-    main_html = markdown.markdown(
-        processed_body,
-        extensions=['extra', 'toc', 'sane_lists', 'codehilite'],
-        extension_configs={
-            'codehilite': {
-                'css_class': 'codehilite',
-                'guess_lang': True,
-                'use_pygments': True
-            },
-            'toc': {
-                'permalink': True
-            }
-        }
-    )
-
-    # Prepare history info from meta.json if available
-    history = ''
-    if meta:
-        created = meta.get('created', '')
-        modified = meta.get('modified', '')
-        provenance = meta.get('provenance', {})
-        history = f"<b>Created:</b> {created}<br><b>Modified:</b> {modified}<br>"
-        if provenance:
-            history += f"<b>Hash:</b> {provenance.get('hash', '')}<br>"
-            history += f"<b>Signature Ref:</b> {provenance.get('sigRef', '')}<br>"
-            history += f"<b>Timestamp:</b> {provenance.get('timestamp', '')}<br>"
+    @property
+    def permissions(self) -> Dict[str, Any]:
+        return self.front_matter.get('permissions', {}) if self.front_matter else {}
 
-    # Add permissions info to history
-    if permissions:
-        history += "<br><b>Permissions:</b><br>"
-        history += f"Mode: {permissions.get('mode', 'draft')}<br>"
-        history += f"Editable: {permissions.get('editable', True)}<br>"
-        history += f"Signed: {permissions.get('signed', False)}<br>"
+    @property
+    def links(self) -> List[Any]:
+        return self.link_index.links
 
-    # Fill the HTML template (reuse existing template)
-    html_template_content = get_view_template() # Call the function from utils
-    html = html_template_content.format(
-        title=f"{title} - ORMD Viewer",
-        raw_ormd=raw_ormd.replace('<', '&lt;').replace('>', '&gt;'),
-        main_html=main_html,
-        history=history
-    )
 
-    # Insert links data for D3.js graph
-    links_json = json.dumps(links)
-    new_html, n = re.subn(r'// renderGraph\(.*\);', f'renderGraph({links_json});', html)
-    if n == 0:
-        new_html = html.replace('</script>', f'renderGraph({links_json});\n</script>')
+# Target size of the body HTML in one chunk of a lazily loaded view page
+CHUNK_SIZE = 64 * 1024
 
-    return new_html
 
-def _generate_editable_html(file_path, raw_ormd, front_matter, body, links, meta):
-    """Generate HTML for editing ORMD document"""
+class ChunkedDocument(NamedTuple):
+    """A prepared document whose body HTML is also split at headings into chunks.
+
+    ``''.join(chunks)`` is ``document.main_html``; ``headings[n]`` are the
+    headings in ``chunks[n]``.
+    """
+    document: PreparedDocument
+    chunks: List[str]
+    headings: List[List[Heading]]
+
+
+def _toc_html(headings: Iterable[Heading]) -> str:
+    items = ''.join(f'<li class="ormd-toc-h{h.level}"><a href="#{html.escape(h.id)}">{h.name}</a></li>'
+                    for h in headings)
+    return f'<nav class="ormd-toc"><ul>{items}</ul></nav>'
+
+
+def lazy_main_html(chunked: ChunkedDocument, chunk_url: Callable[[int], str]) -> str:
+    """Body HTML that shows a table of contents and the first chunk, and loads the rest on scroll.
+
+    Each later chunk is an empty placeholder that ``ormd.js`` fills from
+    ``chunk_url(n)``; its ``data-ids`` list the heading ids it holds, so
+    links into it load it first. A single chunk is returned as it is.
+    """
+    if len(chunked.chunks) <= 1:
+        return chunked.document.main_html
+    parts = [_toc_html(h for chunk_headings in chunked.headings for h in chunk_headings),
+             f'<div class="ormd-chunk" data-chunk="0">{chunked.chunks[0]}</div>']
+    for n in range(1, len(chunked.chunks)):
+        ids = html.escape(' '.join(h.id for h in chunked.headings[n]))
+        parts.append(f'<div class="ormd-chunk ormd-chunk-pending" data-chunk="{n}" '
+                     f'data-src="{html.escape(chunk_url(n))}" data-ids="{ids}"></div>')
+    return '\n'.join(parts)
+
 
-    title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
-    permissions = front_matter.get('permissions', {}) if front_matter else {}
+def resolve_links(body: str, link_index: LinkIndex,
+                  target_url: Optional[Callable[[str], str]] = None,
+                  document_url: Optional[Callable[[str], Optional[str]]] = None) -> str:
+    """Replace ``[[id]]`` references with links to their targets.
 
-    # --- Semantic link rendering (same as render command) ---
+    ``target_url`` rewrites the ``to:`` of defined links, and ``document_url``
+    gives the URL of another document for ids that are not defined here;
+    ``ormd render --site`` uses them to link pages to each other.
+    """
     def replace_link(match):
         link_id = match.group(1)
-        link = next((l for l in links if l.get('id') == link_id), None)
+        link = link_index.get(link_id)
         if link:
             rel = link.get('rel', 'related')
             to = link.get('to', f'#{link_id}')
+            if target_url is not None:
+                to = target_url(to)
             label = link_id
             return f'<a href="{to}" class="ormd-link ormd-link-{rel}">{label}</a>'
+        url = document_url(link_id) if document_url is not None else None
+        if url is not None:
+            return f'<a href="{url}" class="ormd-link ormd-link-document">{link_id}</a>'
         else:
             return f'<span class="ormd-link ormd-link-undefined">{link_id}</span>'
 
-    processed_body = re.sub(r'\[\[([^\]]+)\]\]', replace_link, body)
-
-    # Render Markdown to HTML with syntax highlighting
-    main_html = markdown.markdown(
-        processed_body,
-        extensions=['extra', 'toc', 'sane_lists', 'codehilite'],
-        extension_configs={
-            'codehilite': {
-                'css_class': 'codehilite',
-                'guess_lang': True,
-                'use_pygments': True
-            },
-            'toc': {
-                'permalink': True
-            }
-        }
-    )
-
-    # Prepare history info from meta.json if available
+    return LINK_REF.sub(replace_link, body)
+
+
+def history_html(meta: Optional[Dict[str, Any]], permissions: Optional[Dict[str, Any]] = None) -> str:
+    """Build the change history panel from meta.json and, optionally, permissions."""
     history = ''
     if meta:
         created = meta.get('created', '')
@@ -134,92 +320,314 @@ def _generate_editable_html(file_path, raw_ormd, front_matter, body, links, meta
             history += f"<b>Signature Ref:</b> {provenance.get('sigRef', '')}<br>"
             history += f"<b>Timestamp:</b> {provenance.get('timestamp', '')}<br>"
 
-    # Add permissions info to history
     if permissions:
         history += "<br><b>Permissions:</b><br>"
         history += f"Mode: {permissions.get('mode', 'draft')}<br>"
         history += f"Editable: {permissions.get('editable', True)}<br>"
         history += f"Signed: {permissions.get('signed', False)}<br>"
+    return history
+
+
+def _escape_raw(raw_ormd: str) -> str:
+    return raw_ormd.replace('<', '&lt;').replace('>', '&gt;')
+
+
+_RAW_CHUNK_SIZE = 1 << 20
+
+
+def _iter_escaped_raw(raw_ormd: str) -> Iterator[str]:
+    for start in range(0, len(raw_ormd), _RAW_CHUNK_SIZE):
+        yield _escape_raw(raw_ormd[start:start + _RAW_CHUNK_SIZE])
+
+
+# How a page carries the document's source (``--raw-source``): inlined in
+# the raw pane, in a separate file the pane fetches when opened, or not at all
+RAW_SOURCE_MODES = ('inline', 'external', 'none')
+RAW_SOURCE_OMITTED = 'The source is not included in this page.'
+
+
+def raw_source_path(page: Path) -> Path:
+    """Where ``--raw-source=external`` puts the source of the page at ``page``."""
+    return Path(page).with_suffix('.ormd.txt')
+
+
+def _raw_pane(raw_ormd: str, raw_source: str, source_url: Optional[str],
+              stream: bool = False) -> Tuple[Any, str]:
+    """Content and extra attributes of the raw source ``<pre>``."""
+    if raw_source == 'inline':
+        return (_iter_escaped_raw(raw_ormd) if stream else _escape_raw(raw_ormd)), ''
+    if raw_source == 'external':
+        if source_url is None:
+            raise ValueError("raw_source='external' needs the source's URL")
+        return '', f' data-src="{html.escape(source_url)}"'
+    if raw_source == 'none':
+        return RAW_SOURCE_OMITTED, ''
+    raise ValueError(f"Unknown raw_source {raw_source!r}; expected one of {', '.join(RAW_SOURCE_MODES)}")
+
+
+def _inline_assets() -> Tuple[str, str]:
+    """The shared stylesheet and script, inlined so the page is self-contained."""
+    return (f"<style>\n{get_asset('ormd.css')}  </style>",
+            f"<script>\n{get_asset('ormd.js')}  </script>")
+
+
+def _graph_json(link_index: LinkIndex) -> str:
+    # "</" would end the surrounding <script> element early
+    return json.dumps(link_index.graph_data()).replace('</', '<\\/')
+
+
+class RenderPipeline:
+    """Staged HTML generation: parse -> link-resolve -> Markdown -> template fill.
+
+    The first three stages depend only on the document text, so their result
+    (a :class:`PreparedDocument`) is cached by content digest and shared by
+    the render, view and edit outputs of the same document. Only the cheap
+    template fill runs per output.
+    """
+
+    def __init__(self, renderer: Optional[MarkdownRenderer] = None, cache_size: int = 32):
+        self.renderer = renderer or get_markdown_renderer()
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[bytes, PreparedDocument]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, raw_ormd: str) -> PreparedDocument:
+        """Parse ``raw_ormd`` and render its body, reusing a cached result if possible."""
+        key = hashlib.blake2b(raw_ormd.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        with self._lock:
+            prepared = self._cache.get(key)
+            if prepared is not None:
+                self._cache.move_to_end(key)
+                return prepared
+
+        document = parse_document_lazy(raw_ormd)
+        prepared = self._render_body(raw_ormd, document.front_matter, document.body,
+                                     document.link_index(), document.errors)
+
+        with self._lock:
+            self._cache[key] = prepared
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return prepared
+
+    def prepare_linked(self, raw_ormd: str, target_url: Callable[[str], str],
+                       document_url: Callable[[str], Optional[str]]) -> PreparedDocument:
+        """Like :meth:`prepare`, resolving links with :func:`resolve_links` hooks.
+
+        The result depends on where the page is published, so it is not cached.
+        """
+        document = parse_document_lazy(raw_ormd)
+        return self._render_body(raw_ormd, document.front_matter, document.body,
+                                 document.link_index(), document.errors, target_url, document_url)
+
+    def prepare_chunked(self, raw_ormd: str, chunk_size: int = CHUNK_SIZE,
+                        target_url: Optional[Callable[[str], str]] = None,
+                        document_url: Optional[Callable[[str], Optional[str]]] = None) -> ChunkedDocument:
+        """Like :meth:`prepare`, splitting the body HTML into chunks of about ``chunk_size``.
+
+        Chunks break only between :mod:`.sections`, so a body that cannot
+        be split is a single chunk, and ``chunk_size=0`` gives one chunk per
+        section. Links are resolved with the :func:`resolve_links` hooks.
+        The result is not cached.
+        """
+        parsed = parse_document_lazy(raw_ormd)
+        link_index = parsed.link_index()
+        chunks: List[List[str]] = []
+        headings: List[List[Heading]] = []
+        size = chunk_size
+        converted = self.renderer.convert_sections_with_headings(
+            resolve_links(section, link_index, target_url, document_url)
+            for section in iter_sections(parsed.body)
+        )
+        for text, section_headings in converted:
+            if size >= chunk_size:
+                chunks.append([])
+                headings.append([])
+                size = 0
+            chunks[-1].append(text)
+            headings[-1].extend(section_headings)
+            size += len(text)
+        chunk_html = [''.join(parts) for parts in chunks]
+        document = PreparedDocument(raw_ormd, parsed.front_matter, parsed.body, list(parsed.errors or []),
+                                    link_index, ''.join(chunk_html))
+        return ChunkedDocument(document, chunk_html, headings)
+
+    def prepare_parsed(self, raw_ormd: str, front_matter: Optional[Dict[str, Any]], body: str,
+                       links: List[Any], parse_errors: Optional[List[str]] = None) -> PreparedDocument:
+        """Run the link-resolve and Markdown stages on an already parsed document."""
+        return self._render_body(raw_ormd, front_matter, body, LinkIndex(links), parse_errors)
+
+    def _render_body(self, raw_ormd: str, front_matter: Optional[Dict[str, Any]], body: str,
+                     link_index: LinkIndex, parse_errors: Optional[List[str]],
+                     target_url: Optional[Callable[[str], str]] = None,
+                     document_url: Optional[Callable[[str], Optional[str]]] = None) -> PreparedDocument:
+        main_html = self.renderer.convert(resolve_links(body, link_index, target_url, document_url))
+        return PreparedDocument(raw_ormd, front_matter, body, list(parse_errors or []), link_index, main_html)
+
+    def render_html(self, document: PreparedDocument, meta: Optional[Dict[str, Any]] = None,
+                    raw_source: str = 'inline', source_url: Optional[str] = None) -> str:
+        """HTML for ``ormd render``.
+
+        ``raw_source`` is one of :data:`RAW_SOURCE_MODES`; with ``'external'``
+        the raw pane fetches the source from ``source_url`` when first opened.
+        """
+        styles, scripts = _inline_assets()
+        return self._view_page(document.title, document, history_html(meta), styles, scripts,
+                               raw_source, source_url)
+
+    def write_render_html(self, raw_ormd: str, out: TextIO, meta: Optional[Dict[str, Any]] = None,
+                          raw_source: str = 'inline', source_url: Optional[str] = None) -> None:
+        """Write the ``ormd render`` HTML for ``raw_ormd`` to ``out`` as it is produced.
 
-    # Create the editable HTML template with main area editing
-    editable_template_str = get_edit_template() # Call the function now in this module
+        The output is the same as ``render_html(prepare(raw_ormd), meta,
+        raw_source, source_url)``, but the body is rendered and written a
+        section at a time (see :mod:`.sections`) and the raw source is
+        escaped in chunks, so only one section's HTML is held in memory.
+        Nothing is cached.
+        """
+        document = parse_document_lazy(raw_ormd)
+        link_index = document.link_index()
+        front_matter = document.front_matter
+        title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
+        raw_pane, raw_attrs = _raw_pane(raw_ormd, raw_source, source_url, stream=True)
+        main_html = self.renderer.convert_sections(
+            resolve_links(section, link_index) for section in iter_sections(document.body)
+        )
+        styles, scripts = _inline_assets()
+        chunks = _load_template("view_template.html", "View").iter_fill(
+            title=title,
+            raw_ormd=raw_pane,
+            raw_attrs=raw_attrs,
+            main_html=main_html,
+            history=history_html(meta),
+            links_json=_graph_json(link_index),
+            styles=styles,
+            scripts=scripts,
+        )
+        for chunk in chunks:
+            out.write(chunk)
 
-    # Prepare template variables
-    file_name = Path(file_path).name
-    file_path_safe = file_path.replace('\\', '/').replace(' ', '_')  # Safe for localStorage key
-    raw_ormd_escaped = raw_ormd.replace('<', '&lt;').replace('>', '&gt;')
+    def view_html(self, document: PreparedDocument, meta: Optional[Dict[str, Any]] = None,
+                  extra_scripts: str = '') -> str:
+        """HTML for ``ormd open``; ``extra_scripts`` go after the page's own script."""
+        styles, scripts = _inline_assets()
+        return self._view_page(f"{document.title} - ORMD Viewer", document,
+                               history_html(meta, document.permissions), styles, scripts + extra_scripts)
 
-    return editable_template_str.format(
-        title=f"{title}",
-        raw_ormd_escaped=raw_ormd_escaped,
-        main_html=main_html,
-        history=history,
-        file_name=file_name,
-        file_path_safe=file_path_safe
-    )
+    def lazy_view_html(self, chunked: ChunkedDocument, chunk_url: Callable[[int], str],
+                       meta: Optional[Dict[str, Any]] = None) -> str:
+        """HTML for ``ormd open`` that loads the body chunk by chunk (see :func:`lazy_main_html`)."""
+        document = chunked.document._replace(main_html=lazy_main_html(chunked, chunk_url))
+        styles, scripts = _inline_assets()
+        return self._view_page(f"{document.title} - ORMD Viewer", document,
+                               history_html(meta, document.permissions), styles, scripts)
+
+    def site_html(self, document: PreparedDocument, asset_root: str,
+                  meta: Optional[Dict[str, Any]] = None,
+                  raw_source: str = 'inline', source_url: Optional[str] = None) -> str:
+        """HTML for one page of ``ormd render --site``.
+
+        The stylesheet and script are linked from ``asset_root`` (a relative
+        URL ending in ``/``) instead of being inlined.
+        """
+        return self._view_page(
+            document.title, document, history_html(meta),
+            f'<link rel="stylesheet" href="{asset_root}ormd.css">',
+            f'<script src="{asset_root}ormd.js"></script>',
+            raw_source, source_url,
+        )
+
+    def _view_page(self, title: str, document: PreparedDocument, history: str,
+                   styles: str, scripts: str,
+                   raw_source: str = 'inline', source_url: Optional[str] = None) -> str:
+        raw_pane, raw_attrs = _raw_pane(document.raw_ormd, raw_source, source_url)
+        return _load_template("view_template.html", "View").fill(
+            title=title,
+            raw_ormd=raw_pane,
+            raw_attrs=raw_attrs,
+            main_html=document.main_html,
+            history=history,
+            links_json=_graph_json(document.link_index),
+            styles=styles,
+            scripts=scripts,
+        )
+
+    def edit_html(self, document: PreparedDocument, file_path: str,
+                  meta: Optional[Dict[str, Any]] = None, save_url: str = '', preview_url: str = '') -> str:
+        """HTML for ``ormd edit``.
+
+        With a ``save_url`` the page saves by sending its changed lines
+        there (see :mod:`.editing`); without one it offers a file picker.
+        With a ``preview_url`` the preview is rendered by POSTing the text
+        there (see :func:`edit_preview`); without one it keeps ``main_html``.
+        """
+        return _load_template("edit_template.html", "Edit").fill(
+            title=f"{document.title}",
+            raw_ormd_escaped=_escape_raw(document.raw_ormd),
+            main_html=document.main_html,
+            history=history_html(meta, document.permissions),
+            file_name=Path(file_path).name,
+            file_path_safe=file_path.replace('\\', '/').replace(' ', '_'),  # Safe for localStorage key
+            save_url=save_url,
+            preview_url=preview_url,
+        )
+
+
+_default_pipeline: Optional[RenderPipeline] = None
+_default_pipeline_lock = threading.Lock()
+
+
+def get_render_pipeline() -> RenderPipeline:
+    """Return the shared render pipeline."""
+    global _default_pipeline
+    if _default_pipeline is None:
+        with _default_pipeline_lock:
+            if _default_pipeline is None:
+                _default_pipeline = RenderPipeline()
+    return _default_pipeline
+
+
+def edit_preview(raw_ormd: str) -> Dict[str, Any]:
+    """The ``ormd edit`` preview of ``raw_ormd``: its body HTML and parse errors."""
+    document = get_render_pipeline().prepare(raw_ormd)
+    return {'html': document.main_html, 'errors': document.parse_errors}
+
+
+def _generate_viewable_html(file_path, raw_ormd, front_matter, body, links, meta):
+    """Generate HTML for viewing ORMD document"""
+    pipeline = get_render_pipeline()
+    return pipeline.view_html(pipeline.prepare_parsed(raw_ormd, front_matter, body, links), meta)
+
+def _generate_editable_html(file_path, raw_ormd, front_matter, body, links, meta):
+    """Generate HTML for editing ORMD document"""
+    pipeline = get_render_pipeline()
+    return pipeline.edit_html(pipeline.prepare_parsed(raw_ormd, front_matter, body, links), file_path, meta)
 
 def generate_render_html(raw_ormd: str, front_matter: dict, body: str, links: list, meta: dict) -> str:
     """Generates HTML for the 'render' command."""
-    title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
+    pipeline = get_render_pipeline()
+    return pipeline.render_html(pipeline.prepare_parsed(raw_ormd, front_matter, body, links), meta)
 
-    # --- Semantic link rendering ---
-    def replace_link(match):
-        link_id = match.group(1)
-        link = next((l for l in links if l.get('id') == link_id), None)
-        if link:
-            rel = link.get('rel', 'related')
-            to = link.get('to', f'#{link_id}')
-            label = link_id
-            return f'<a href="{to}" class="ormd-link ormd-link-{rel}">{label}</a>'
-        else:
-            return f'<span class="ormd-link ormd-link-undefined">{link_id}</span>'
+def render_file_html(input_file: str) -> str:
+    """Read an ORMD file or package and return the 'render' command's HTML."""
+    raw_ormd, meta = ORMDPackager().read_source(input_file)
+    pipeline = get_render_pipeline()
+    return pipeline.render_html(pipeline.prepare(raw_ormd), meta)
 
-    processed_body = re.sub(r'\[\[([^\]]+)\]\]', replace_link, body)
-    # --- End semantic link rendering ---
-
-    # Render Markdown to HTML with syntax highlighting
-    main_html_content = markdown.markdown(
-        processed_body,  # Use the link-processed body
-        extensions=['extra', 'toc', 'sane_lists', 'codehilite'],
-        extension_configs={
-            'codehilite': {
-                'css_class': 'codehilite',
-                'guess_lang': True,
-                'use_pygments': True
-            },
-            'toc': {
-                'permalink': True
-            }
-        }
-    )
-
-    # Prepare history info from meta.json if available
-    history_content = ''
-    if meta:
-        created = meta.get('created', '')
-        modified = meta.get('modified', '')
-        provenance = meta.get('provenance', {})
-        history_content = f"<b>Created:</b> {created}<br><b>Modified:</b> {modified}<br>"
-        if provenance:
-            history_content += f"<b>Hash:</b> {provenance.get('hash', '')}<br>"
-            history_content += f"<b>Signature Ref:</b> {provenance.get('sigRef', '')}<br>"
-            history_content += f"<b>Timestamp:</b> {provenance.get('timestamp', '')}<br>"
-
-    # Fill the HTML template
-    template_str = get_view_template()
-    html_output = template_str.format(
-        title=title,
-        raw_ormd=raw_ormd.replace('<', '&lt;').replace('>', '&gt;'),
-        main_html=main_html_content,
-        history=history_content
-    )
-
-    # Insert links data for D3.js graph (as a JS variable)
-    links_json_str = json.dumps(links)
-    # Replace any '// renderGraph(...);' line with the actual call
-    final_html, n = re.subn(r'// renderGraph\(.*\);', f'renderGraph({links_json_str});', html_output)
-    if n == 0:
-        # If no placeholder was found, append the call at the end of the script
-        final_html = html_output.replace('</script>', f'renderGraph({links_json_str});\n</script>')
-
-    return final_html
+def write_render_file(input_file: str, out_path: Path, raw_source: str = 'inline') -> None:
+    """Render an ORMD file or package to ``out_path``, streaming the HTML.
+
+    The page is written to a temporary file next to ``out_path`` that then
+    replaces it, so a failed render leaves no partial output behind. With
+    ``raw_source='external'`` the source goes to :func:`raw_source_path`.
+    """
+    out_path = Path(out_path)
+    raw_ormd, meta = ORMDPackager().read_source(input_file)
+    source_url = None
+    if raw_source == 'external':
+        source_path = raw_source_path(out_path)
+        with atomic_open(source_path, newline='') as out:
+            out.write(raw_ormd)
+        source_url = source_path.name
+    with atomic_open(out_path) as out:
+        get_render_pipeline().write_render_html(raw_ormd, out, meta, raw_source, source_url)
@@ -0,0 +1,49 @@
+"""Index of the semantic links defined in an ORMD document's front-matter.
+
+A :class:`LinkIndex` is built once per document and shared by everything
+that looks links up by id: ``[[id]]`` resolution when rendering, the
+validator's consistency checks and the document graph data.
+"""
+
+from collections.abc import Hashable
+from typing import Any, Dict, List, Optional
+
+
+class LinkIndex:
+    """Maps link ids to their definitions in the front-matter ``links`` list.
+
+    When an id is defined more than once the first definition wins, as it
+    always has for rendering, and the id is listed in ``duplicates``.
+    """
+    __slots__ = ('links', 'by_id', 'duplicates')
+
+    def __init__(self, links: Any):
+        self.links: List[Any] = links if isinstance(links, list) else []
+        self.by_id: Dict[Any, Dict[str, Any]] = {}
+        self.duplicates: List[Any] = []
+        for link in self.links:
+            if not isinstance(link, dict) or 'id' not in link or not isinstance(link['id'], Hashable):
+                continue
+            link_id = link['id']
+            if link_id not in self.by_id:
+                self.by_id[link_id] = link
+            elif link_id not in self.duplicates:
+                self.duplicates.append(link_id)
+
+    @classmethod
+    def from_front_matter(cls, front_matter: Optional[Dict[str, Any]]) -> 'LinkIndex':
+        return cls(front_matter.get('links', []) if front_matter else [])
+
+    def __contains__(self, link_id: Any) -> bool:
+        return link_id in self.by_id
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, link_id: Any) -> Optional[Dict[str, Any]]:
+        """The definition of ``link_id``, or ``None`` if it is not defined."""
+        return self.by_id.get(link_id)
+
+    def graph_data(self) -> List[Dict[str, Any]]:
+        """Link definitions for the document graph, one per id."""
+        return list(self.by_id.values())
@@ -1,35 +1,43 @@
 # src/ormd_cli/main.py
 import click
-from .validator import ORMDValidator
-from .packager import ORMDPackager
-from .updater import ORMDUpdater
-from typing import Optional
-import io # Changed from 'from io import StringIO' to just 'import io'
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams, LTTextBoxHorizontal
-from pdfminer.pdfparser import PDFParser, PDFSyntaxError # Added PDFParser
-from pdfminer.pdfdocument import PDFDocument # Added PDFDocument
-from pdfminer.psparser import PSKeyword, PSLiteral # Added for decoding
-from pdfminer.utils import decode_text # Added for decoding
-import yaml
+import os
 from pathlib import Path
-from datetime import datetime, timezone, timedelta # Added timedelta
-from .utils import get_view_template, SYMBOLS
-from .parser import parse_document, serialize_front_matter, _parse_front_matter_and_body
-import zipfile
-import json # Used by render, open, edit
-# re is no longer used directly in main.py
-# webbrowser, threading, http.server, socketserver, tempfile, socket, os were moved
-from .server import _serve_and_open
-from .html_generator import _generate_viewable_html, _generate_editable_html, generate_render_html
+from datetime import datetime, timezone
+import json # Used by the validate JSON report
+from .utils import SYMBOLS
 from .logger import setup_logging, logger # Added
-# get_edit_template, _generate_viewable_html, _generate_editable_html, markdown and re imports removed as logic moved.
+# Heavier modules (validator, updater, packager, html_generator/markdown,
+# server, batch, cache, the daemon client and the pdfminer stack behind convert) are imported
+# inside the commands that use them so start-up only pays for what runs.
+# `ormd --startup-profile ...` reports per-module import times.
 
-@click.group(context_settings=dict(help_option_names=['-h', '--help']))
+class _ORMDGroup(click.Group):
+    """Command group that remembers its raw arguments for --startup-profile."""
+
+    def parse_args(self, ctx, args):
+        ctx.meta['ormd.raw_args'] = list(args)
+        return super().parse_args(ctx, args)
+
+def _run_startup_profile(ctx, param, value):
+    """Re-run the command under ``python -X importtime`` and report import times."""
+    if not value or ctx.resilient_parsing:
+        return
+    from .startup import profile_command
+    args = [arg for arg in ctx.meta.get('ormd.raw_args', []) if arg != '--startup-profile']
+    ctx.exit(profile_command(args))
+
+@click.group(cls=_ORMDGroup, context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-v', '--verbose', is_flag=True, help='Enable verbose output (DEBUG level).')
 @click.option('-q', '--quiet', is_flag=True, help='Suppress most output (show CRITICAL errors).')
+@click.option('--daemon', 'use_daemon', is_flag=True, help='Send validate/update/render to a running `ormd daemon` (falls back to in-process).')
+@click.option('--startup-profile', is_flag=True, is_eager=True, expose_value=False, callback=_run_startup_profile, help='Run the command and report per-module import times on stderr.')
+@click.option('--template-dir', 'template_dirs', multiple=True, type=click.Path(exists=True, file_okay=False),
+              help='Directory of HTML templates to use before the built-in ones (can be repeated).')
+@click.option('--no-guess-lang', is_flag=True, help='Do not guess the language of code blocks without one; render them as plain text.')
+@click.option('--highlight-cache-dir', type=click.Path(file_okay=False), default=None,
+              help='Keep highlighted code blocks in this directory so later renders reuse them.')
 @click.pass_context
-def cli(ctx, verbose, quiet):
+def cli(ctx, verbose, quiet, use_daemon, template_dirs, no_guess_lang, highlight_cache_dir):
     """ORMD CLI - Tools for Open Relational Markdown.
 
     Use -v/--verbose for detailed debug output, or -q/--quiet to suppress all non-critical messages.
@@ -38,11 +46,22 @@ def cli(ctx, verbose, quiet):
     # Store flags for potential direct use, though logger config is primary
     ctx.obj['VERBOSE'] = verbose
     ctx.obj['QUIET'] = quiet
+    ctx.obj['DAEMON'] = use_daemon
     if quiet and verbose:
         # Let quiet take precedence as per user requirement, though Click might handle this too
         # For setup_logging, quiet=True will override verbose=True
         pass # setup_logging will handle precedence
     setup_logging(verbose, quiet)
+    if template_dirs:
+        from .template_cache import add_template_dirs
+        add_template_dirs(template_dirs)
+    if no_guess_lang or highlight_cache_dir:
+        from .highlight import GUESS_LANG_ENV, HIGHLIGHT_CACHE_DIR_ENV
+        # Set through the environment so render worker processes pick them up too
+        if no_guess_lang:
+            os.environ[GUESS_LANG_ENV] = '0'
+        if highlight_cache_dir:
+            os.environ[HIGHLIGHT_CACHE_DIR_ENV] = highlight_cache_dir
 
 @cli.command()     # Existing decorator
 @click.pass_context # New decorator
@@ -55,6 +74,8 @@ def create(ctx, file_path: str): # Added ctx
       ormd create my_document.ormd
       ormd create path/to/my_new_report.ormd
     """
+    from .parser import serialize_front_matter
+
     logger.debug(f"Attempting to create ORMD file at: {file_path}")
     try:
         p = Path(file_path)
@@ -95,33 +116,110 @@ def create(ctx, file_path: str): # Added ctx
         # exit(1) removed for click consistency, though it was present in the original create
 @cli.command()
 @click.pass_context # New decorator
-@click.argument('file_path')
+@click.argument('paths', nargs=-1, required=True)
 # verbose option is now global, remove from here if not specifically overriding global
 # For now, keeping it to see if click handles local vs global context options gracefully
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed validation info (overrides global -v).')
-def validate(ctx, file_path, verbose): # Added ctx, verbose might be from global ctx.obj['VERBOSE']
-    """Validate an ORMD file against the 0.1 specification.
+@click.option('--jobs', '-j', type=int, default=None, help='Worker processes for multiple files (default: one per CPU).')
+@click.option('--json-report', 'json_report', default=None, help="Write a JSON report of all results to this file ('-' for stdout).")
+@click.option('--no-cache', is_flag=True, help='Ignore and do not update the validation cache (.ormd-cache/).')
+def validate(ctx, paths, verbose, jobs, json_report, no_cache): # Added ctx, verbose might be from global ctx.obj['VERBOSE']
+    """Validate ORMD files against the 0.1 specification.
+
+    PATHS may be files, directories (searched recursively for *.ormd) or
+    glob patterns. Multiple files are validated in parallel and reported
+    in sorted order. Results for unchanged documents are reused from the
+    on-disk cache unless --no-cache is given.
 
     The -v/--verbose flag (global or command-specific) shows detailed validation info.
     -q/--quiet will suppress typical success/warning messages if validation passes.
 
     Examples:
-    
+    
       ormd validate my_document.ormd
       ormd -v validate my_document.ormd
+      ormd validate docs/ --jobs 8
+      ormd validate "docs/**/*.ormd" --json-report report.json
     """
-    logger.debug(f"Validating file: {file_path}")
-    validator = ORMDValidator()
-    
-    is_valid = validator.validate_file(file_path)
+    from .batch import collect_ormd_files, validate_files
+    from .cache import open_cache
+
+    files = collect_ormd_files(paths)
+    if not files:
+        logger.error(f"{SYMBOLS['error']} No .ormd files found in: {', '.join(paths)}")
+        exit(1)
+
+    logger.debug(f"Validating {len(files)} file(s)")
+    results = _validate_via_daemon(files, jobs, no_cache) if ctx.obj.get('DAEMON') else None
+    if results is None:
+        cache = None if no_cache else open_cache()
+        try:
+            results = validate_files(files, jobs, cache)
+        finally:
+            if cache is not None:
+                logger.debug(f"Validation cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+                cache.close()
     
     # Determine if local verbose was explicitly set, otherwise use global
     # This assumes the local verbose flag is meant to override the global for this command.
     # If not, then `verbose_flag = ctx.obj.get('VERBOSE', False)` would be sufficient.
     verbose_flag = verbose if ctx.get_parameter_source('verbose') == click.core.ParameterSource.COMMANDLINE else ctx.obj.get('VERBOSE', False)
 
+    for file_path, is_valid, validator in results:
+        _log_validation_result(file_path, is_valid, validator, verbose_flag, show_name=len(results) > 1)
+
+    invalid_count = sum(1 for _, is_valid, _ in results if not is_valid)
+    if len(results) > 1:
+        logger.info(f"{len(results)} file(s) validated: {len(results) - invalid_count} valid, {invalid_count} invalid")
+
+    if json_report:
+        report = {
+            'files': [
+                {'file': file_path, 'valid': is_valid, 'errors': validator.errors, 'warnings': validator.warnings}
+                for file_path, is_valid, validator in results
+            ],
+            'valid': len(results) - invalid_count,
+            'invalid': invalid_count,
+        }
+        with click.open_file(json_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    
+    if invalid_count:
+        exit(1)
+
+def _validate_via_daemon(files, jobs, no_cache):
+    """Validate through a running daemon; ``None`` if none is reachable."""
+    from . import daemon
+    from .validator import ORMDValidator
+
+    absolute = [str(Path(f).resolve()) for f in files]
+    response = daemon.request({'command': 'validate', 'paths': absolute, 'jobs': jobs, 'no_cache': no_cache,
+                               'settings': _daemon_settings()})
+    if response is None or not response.get('ok'):
+        logger.debug("No usable ORMD daemon; validating in-process.")
+        return None
+    results = []
+    for file_path, entry in zip(files, response['results']):
+        validator = ORMDValidator()
+        validator.errors = entry['errors']
+        validator.warnings = entry['warnings']
+        results.append((file_path, entry['valid'], validator))
+    return results
+
+def _daemon_settings():
+    """This command's template dirs, environment and directory, for the daemon to apply."""
+    from . import daemon
+    from .template_cache import template_dirs
+
+    return daemon.client_settings(template_dirs())
+
+def _log_validation_result(file_path, is_valid, validator, verbose_flag, show_name=False):
+    """Log the outcome of validating one file."""
     if verbose_flag or not is_valid:
-        # Show detailed validation summary
+        # Show detailed validation summary, prefixed by the file when several are checked
+        if show_name:
+            logger.info(f"{file_path}:")
         logger.info(validator.get_validation_summary())
     else:
         # Show simple success message
@@ -135,10 +233,54 @@ def validate(ctx, file_path, verbose): # Added ctx, verbose might be from global
     # Always show warnings even in non-verbose mode if validation passes
     if is_valid and validator.warnings and not verbose_flag: # Use the determined verbose_flag
         logger.warning(f"{SYMBOLS['warning']}  {len(validator.warnings)} warning(s) - use --verbose for details")
+
+@cli.command(name='daemon')
+@click.option('--socket', 'socket_path', default=None, help='Unix socket path (default: $ORMD_DAEMON_SOCKET or a per-user runtime directory).')
+def daemon_cmd(socket_path):
+    """Run a long-lived ORMD server for fast validate/update/render.
+
+    Clients connect over a Unix domain socket with a JSON-lines protocol;
+    `ormd --daemon validate ...` uses it automatically when it is running.
+
+    Examples:
     
-    if not is_valid:
+      ormd daemon &
+      ormd --daemon validate my_document.ormd
+    """
+    from . import daemon
+
+    try:
+        daemon.serve(Path(socket_path) if socket_path else None)
+    except OSError as e:
+        logger.error(f"{SYMBOLS['error']} Failed to start daemon: {e}")
         exit(1)
 
+@cli.group()
+def cache():
+    """Manage the on-disk validation cache (.ormd-cache/ or $ORMD_CACHE_DIR)."""
+
+@cache.command()
+@click.option('--max-size', default='64MB', show_default=True, help='Evict least recently used results until the cache is at most this size (e.g. 500K, 64MB, 0 to empty).')
+def prune(max_size):
+    """Evict stale and least recently used validation results.
+
+    Examples:
+    
+      ormd cache prune
+      ormd cache prune --max-size 10MB
+    """
+    from .cache import ValidationCache, parse_size
+
+    try:
+        max_bytes = parse_size(max_size)
+    except ValueError as e:
+        logger.error(f"{SYMBOLS['error']} {e}")
+        exit(1)
+
+    with ValidationCache() as validation_cache:
+        removed, remaining = validation_cache.prune(max_bytes)
+    logger.info(f"{SYMBOLS['success']} Pruned {removed} cached result(s); {remaining} byte(s) remain")
+
 @cli.command()
 @click.pass_context # New decorator
 @click.argument('content_file')
@@ -146,16 +288,25 @@ def validate(ctx, file_path, verbose): # Added ctx, verbose might be from global
 @click.option('--out', '-o', default='package.ormd', help='Output package file')
 @click.option('--validate/--no-validate', default=True, help='Validate content before packing')
 @click.option('--overwrite', is_flag=True, help='Overwrite the output package if it already exists.') # New
-def pack(ctx, content_file, meta_file, out, validate, overwrite): # Added overwrite
+@click.option('--level', type=click.IntRange(0, 9), default=6, show_default=True,
+              help='Deflate level for members that are not compressed already (0 stores everything).')
+@click.option('--jobs', '-j', type=int, default=None, help='Threads compressing members (default: one per CPU).')
+def pack(ctx, content_file, meta_file, out, validate, overwrite, level, jobs): # Added overwrite
     """Pack content.ormd and meta.json into a single .ormd package.
 
+    The package also gets render.css and ops/ from the content file's
+    directory if present, and the local assets listed in asset_ids.
+
     Examples:
     
       ormd pack content.ormd meta.json
       ormd pack chapter1.ormd chapter1_meta.json --out my_book.ormd
       ormd pack document.ormd metadata.json --no-validate
+      ormd pack gallery.ormd meta.json --level 9 -j 4
     """
-    
+    from .packager import ORMDPackager
+    from .validator import ORMDValidator
+
     # Optional validation step
     if validate:
         validator = ORMDValidator()
@@ -180,7 +331,8 @@ def pack(ctx, content_file, meta_file, out, validate, overwrite): # Added overwr
         return
     
     packager = ORMDPackager()
-    if packager.pack(content_file, meta_file, str(output_package_path)): # Use potentially modified path
+    # Use potentially modified path
+    if packager.pack(content_file, meta_file, str(output_package_path), compress_level=level, jobs=jobs):
         logger.info(f"{SYMBOLS['success']} Created package: {output_package_path}")
     else:
         logger.error(f"{SYMBOLS['error']} Failed to create package")
@@ -200,7 +352,7 @@ def unpack(ctx, package_file, out_dir, overwrite): # Added ctx
       ormd unpack my_book.ormd --out-dir ./book_files
       ormd unpack archive.ormd --overwrite
     """
-    from pathlib import Path
+    from .packager import ORMDPackager
 
     output_dir_str = out_dir
     if output_dir_str == './unpacked' and Path(package_file).stem != 'unpacked':
@@ -235,14 +387,20 @@ def unpack(ctx, package_file, out_dir, overwrite): # Added ctx
 
 @cli.command()
 @click.pass_context # New decorator
-@click.argument('file_path')
+@click.argument('paths', nargs=-1, required=True)
 @click.option('--dry-run', '-n', is_flag=True, help='Show what would be updated without making changes')
 @click.option('--force-update', '-f', is_flag=True, help='Update locked fields (ignore locked: true)')
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed update information (overrides global -v).')
-def update(ctx, file_path, dry_run, force_update, verbose): # Added ctx, verbose might be from global
+@click.option('--jobs', '-j', type=int, default=None, help='Worker processes for multiple files (default: one per CPU).')
+@click.option('--json-report', 'json_report', default=None, help="Write a JSON report of every file's changes to this file ('-' for stdout).")
+def update(ctx, paths, dry_run, force_update, verbose, jobs, json_report): # Added ctx, verbose might be from global
     # If local verbose is removed, use: verbose = ctx.obj.get('VERBOSE', False)
     """Update and sync front-matter fields (date_modified, word_count, etc.).
 
+    PATHS may be files, directories (searched recursively for *.ormd) or
+    glob patterns. Multiple files are updated in parallel, each written
+    atomically, and reported in sorted order.
+
     The -v/--verbose flag (global or command-specific) shows detailed update information.
 
     Examples:
@@ -251,111 +409,192 @@ def update(ctx, file_path, dry_run, force_update, verbose): # Added ctx, verbose
       ormd -v update my_document.ormd
       ormd update my_document.ormd --dry-run
       ormd update my_document.ormd --force-update
+      ormd update docs/ --jobs 8
+      ormd update "docs/**/*.ormd" --dry-run --json-report -
     """
-    logger.debug(f"Updating file: {file_path}")
-    updater = ORMDUpdater()
+    from .batch import collect_ormd_files, update_files
+
+    files = collect_ormd_files(paths)
+    if not files:
+        logger.error(f"{SYMBOLS['error']} No .ormd files found in: {', '.join(paths)}")
+        exit(1)
     
     # Determine if local verbose was explicitly set for update, otherwise use global
     # This assumes the local verbose flag is meant to override the global for this command.
     # If not, then `verbose_flag = ctx.obj.get('VERBOSE', False)` would be sufficient.
     verbose_flag = verbose if ctx.get_parameter_source('verbose') == click.core.ParameterSource.COMMANDLINE else ctx.obj.get('VERBOSE', False)
 
-    try:
-        result = updater.update_file(
-            file_path,
-            dry_run=dry_run,
-            force_update=force_update,
-            verbose=verbose_flag # Pass the determined verbosity
-        )
-
-        if dry_run:
-            if result['changes']:
-                logger.debug("Dry run: Showing potential changes.")
-                logger.info(f"{SYMBOLS['info']} Would update {file_path}:")
+    logger.debug(f"Updating {len(files)} file(s)")
+    results = None
+    if ctx.obj.get('DAEMON') and len(files) == 1:
+        results = _update_via_daemon(files[0], dry_run, force_update, verbose_flag)
+    if results is None:
+        results = update_files(files, jobs, dry_run=dry_run, force_update=force_update)
+
+    for file_path, result, error in results:
+        _log_update_result(file_path, result, error, dry_run, verbose_flag)
+
+    failed = sum(1 for _, result, _ in results if result is None)
+    changed = sum(1 for _, result, _ in results if result is not None and result['changes'])
+    if len(results) > 1:
+        action = 'would be updated' if dry_run else 'updated'
+        logger.info(f"{len(results)} file(s) processed: {changed} {action}, "
+                    f"{len(results) - changed - failed} up to date, {failed} failed")
+
+    if json_report:
+        report = {
+            'dry_run': dry_run,
+            'files': [
+                {
+                    'file': file_path,
+                    'updated': bool(result and result['updated']),
+                    'changes': result['changes'] if result else {},
+                    'error': error,
+                }
+                for file_path, result, error in results
+            ],
+            'changed': changed,
+            'failed': failed,
+        }
+        with click.open_file(json_report, 'w', encoding='utf-8') as f:
+            # Front-matter dates may be parsed as date objects by YAML
+            json.dump(report, f, indent=2, default=str)
+            f.write('\n')
+
+    if failed:
+        exit(1)
+
+def _update_via_daemon(file_path, dry_run, force_update, verbose_flag):
+    """Update through a running daemon; ``None`` if none is reachable."""
+    from . import daemon
+
+    response = daemon.request({
+        'command': 'update',
+        'path': str(Path(file_path).resolve()),
+        'dry_run': dry_run,
+        'force_update': force_update,
+        'verbose': verbose_flag,
+        'settings': _daemon_settings(),
+    })
+    if response is None:
+        logger.debug("No ORMD daemon; updating in-process.")
+        return None
+    if not response.get('ok'):
+        return [(file_path, None, response.get('error'))]
+    return [(file_path, response['result'], None)]
+
+def _log_update_result(file_path, result, error, dry_run, verbose_flag):
+    """Log the outcome of updating one file."""
+    if result is None:
+        logger.error(f"{SYMBOLS['error']} Failed to update {file_path}: {error}")
+    elif dry_run:
+        if result['changes']:
+            logger.debug("Dry run: Showing potential changes.")
+            logger.info(f"{SYMBOLS['info']} Would update {file_path}:")
+            for field, change in result['changes'].items():
+                old_val = change.get('old', 'None') # Ensure old_val is defined if using it here
+                new_val = change.get('new')
+                logger.info(f"  {SYMBOLS['bullet']} {field}: {old_val} → {new_val}")
+        else:
+            logger.info(f"{SYMBOLS['success']} {file_path} is already up to date (dry run)")
+    else:
+        if result['updated']:
+            logger.info(f"{SYMBOLS['success']} Updated {file_path}")
+            if verbose_flag and result['changes']: # Use determined verbosity
+                logger.debug("Changes made:") # Detailed changes to debug
                 for field, change in result['changes'].items():
-                    old_val = change.get('old', 'None') # Ensure old_val is defined if using it here
+                    old_val = change.get('old', 'None')
                     new_val = change.get('new')
-                    logger.info(f"  {SYMBOLS['bullet']} {field}: {old_val} → {new_val}")
-            else:
-                logger.info(f"{SYMBOLS['success']} {file_path} is already up to date (dry run)")
+                    logger.debug(f"  {SYMBOLS['bullet']} {field}: {old_val} → {new_val}")
         else:
-            if result['updated']:
-                logger.info(f"{SYMBOLS['success']} Updated {file_path}")
-                if verbose_flag and result['changes']: # Use determined verbosity
-                    logger.debug("Changes made:") # Detailed changes to debug
-                    for field, change in result['changes'].items():
-                        old_val = change.get('old', 'None')
-                        new_val = change.get('new')
-                        logger.debug(f"  {SYMBOLS['bullet']} {field}: {old_val} → {new_val}")
-            else:
-                logger.info(f"{SYMBOLS['success']} {file_path} is already up to date")
-                
-    except Exception as e:
-        logger.error(f"{SYMBOLS['error']} Failed to update {file_path}: {str(e)}")
-        exit(1)
+            logger.info(f"{SYMBOLS['success']} {file_path} is already up to date")
 
 @cli.command()
 @click.pass_context # New decorator
 @click.argument('input_file')
-@click.option('--out', '-o', default=None, help='Output HTML file')
+@click.option('--out', '-o', default=None, help='Output HTML file (with --site, the output directory).')
 @click.option('--overwrite', is_flag=True, help='Overwrite the output file if it already exists.') # New
-def render(ctx, input_file, out, overwrite: bool): # Added overwrite
+@click.option('--site', is_flag=True, help='Render every .ormd under INPUT_FILE (a directory) into a static site in the --out directory.')
+@click.option('--jobs', '-j', type=int, default=None, help='Worker processes for --site (default: one per CPU).')
+@click.option('--full', is_flag=True, help='With --site, render every page even if it is up to date.')
+@click.option('--raw-source', type=click.Choice(['inline', 'external', 'none']), default='inline', show_default=True,
+              help='Embed the source in the page, write it to a sibling .ormd.txt fetched on demand, or leave it out.')
+def render(ctx, input_file, out, overwrite: bool, site, jobs, full, raw_source): # Added overwrite
     """Render an ORMD file or package to HTML.
 
+    With --site, INPUT_FILE is a source directory and --out the site
+    directory; only documents changed since the last build are rendered.
+
     Examples:
     
       ormd render my_document.ormd
       ormd render my_package.ormd -o custom_name.html
+      ormd render --site docs/ -o public/ --jobs 8
+      ormd render my_document.ormd --raw-source external
     """
-    logger.debug(f"Rendering {input_file} to {out if out else 'default HTML output'}")
-    input_path = Path(input_file)
-    is_zip = input_path.suffix == '.ormd' and zipfile.is_zipfile(input_file)
-    raw_ormd = ''
-    meta = {}
-    title = 'ORMD Document'
-    history = ''
-    main_html = ''
-    links = []
-    front_matter = {}
-    body = ''
-    metadata = None
-
-    if is_zip:
-        logger.debug(f"Input is a zip package. Reading content.ormd and meta.json.")
-        with zipfile.ZipFile(input_file, 'r') as zf:
-            if 'content.ormd' in zf.namelist():
-                raw_ormd = zf.read('content.ormd').decode('utf-8')
-            if 'meta.json' in zf.namelist():
-                meta = json.loads(zf.read('meta.json').decode('utf-8'))
-    else:
-        logger.debug(f"Input is a plain ORMD file. Reading directly.")
-        raw_ormd = Path(input_file).read_text(encoding='utf-8')
-
-    # Unified parsing for both file and package using the shared parser
-    front_matter, body, metadata, parse_errors = parse_document(raw_ormd)
-    logger.debug("Document parsed. Generating HTML content.")
-    title = front_matter.get('title', title) if front_matter else title
-    links = front_matter.get('links', []) if front_matter else []
+    if site:
+        _render_site(input_file, out, jobs, full, raw_source)
+        return
 
-    # The main HTML generation logic is now in html_generator.py
-    # However, the render command itself still handles initial parsing and file I/O.
-    # The 'body' passed to generate_render_html is the raw body from parse_document.
-    # Link replacement and markdown conversion are now inside generate_render_html.
-    html_content = generate_render_html(raw_ormd, front_matter, body, links, meta)
+    logger.debug(f"Rendering {input_file} to {out if out else 'default HTML output'}")
 
     # Determine output path
     output_path_str = out
     if output_path_str is None:
-        output_path_str = str(input_path.with_suffix('.html'))
+        output_path_str = str(Path(input_file).with_suffix('.html'))
 
     out_path = Path(output_path_str)
+    if ctx.obj.get('DAEMON'):
+        from . import daemon
+        response = daemon.request({
+            'command': 'render',
+            'input_file': str(Path(input_file).resolve()),
+            'out': str(out_path.resolve()),
+            'overwrite': overwrite,
+            'raw_source': raw_source,
+            'settings': _daemon_settings(),
+        })
+        if response is not None:
+            if not response.get('ok'):
+                logger.error(f"{SYMBOLS['error']} Failed to render {input_file}: {response.get('error')}")
+                exit(1)
+            if not response['written']:
+                logger.error(f"Error: Output file '{out_path}' already exists. Use --overwrite to replace it.")
+                return
+            logger.info(f"{SYMBOLS['success']} Rendered HTML written to: {out_path}")
+            return
+
     if out_path.exists() and not overwrite:
         logger.error(f"Error: Output file '{out_path}' already exists. Use --overwrite to replace it.")
         return
 
-    out_path.write_text(html_content, encoding='utf-8')
+    from .html_generator import write_render_file
+
+    # Reading (plain file or package), parsing, link replacement and
+    # markdown conversion all live in html_generator; the page is
+    # written section by section as it is rendered.
+    write_render_file(input_file, out_path, raw_source)
     logger.info(f"{SYMBOLS['success']} Rendered HTML written to: {out_path}") # Use out_path here
 
+def _render_site(src_dir, out_dir, jobs, full, raw_source):
+    from .site_builder import build_site
+
+    if not out_dir:
+        raise click.UsageError("--site needs an output directory: ormd render --site SRC_DIR -o OUT_DIR")
+    if not Path(src_dir).is_dir():
+        raise click.UsageError(f"--site needs a source directory, got '{src_dir}'")
+
+    logger.debug(f"Rendering site from {src_dir} into {out_dir}")
+    build = build_site(src_dir, out_dir, jobs, force=full, raw_source=raw_source)
+    for source, error in build.failed:
+        logger.error(f"{SYMBOLS['error']} Failed to render {source}: {error}")
+    for source in build.rendered:
+        logger.debug(f"  {SYMBOLS['bullet']} rendered {source}")
+    logger.info(f"{SYMBOLS['success']} Site written to {out_dir}: {len(build.rendered)} rendered, "
+                f"{len(build.up_to_date)} up to date, {len(build.removed)} removed, {len(build.failed)} failed")
+    if build.failed:
+        exit(1)
+
 @cli.command()
 @click.pass_context # New decorator
 @click.argument('file_path')
@@ -371,6 +610,10 @@ def open(ctx, file_path, port, no_browser, show_url): # Added ctx
       ormd open my_package.ormd -p 8080
       ormd open my_document.ormd --no-browser
     """
+    from .html_generator import get_render_pipeline
+    from .packager import ORMDPackager
+    from .server import _serve_and_open
+
     logger.debug(f"Preparing to open {file_path} for viewing.")
     # Validate file exists
     if not Path(file_path).exists():
@@ -378,36 +621,26 @@ def open(ctx, file_path, port, no_browser, show_url): # Added ctx
         exit(1)
     
     try:
-        # Parse the document (similar to render command)
-        input_path = Path(file_path)
-        is_zip = input_path.suffix == '.ormd' and zipfile.is_zipfile(file_path)
-        raw_ormd = ''
-        meta = {}
-        
-        if is_zip:
-            with zipfile.ZipFile(file_path, 'r') as zf:
-                if 'content.ormd' in zf.namelist():
-                    raw_ormd = zf.read('content.ormd').decode('utf-8')
-                if 'meta.json' in zf.namelist():
-                    meta = json.loads(zf.read('meta.json').decode('utf-8'))
-        else:
-            raw_ormd = Path(file_path).read_text(encoding='utf-8')
-
-        # Parse document
-        front_matter, body, metadata, parse_errors = parse_document(raw_ormd)
-        logger.debug("Document parsed for viewing mode.")
+        # Read the document (plain file or package)
+        raw_ormd, meta = ORMDPackager().read_source(file_path)
+
+        # Parse the document and render its body in chunks, so a large
+        # document shows its first part while the rest loads on scroll
+        pipeline = get_render_pipeline()
+        chunked = pipeline.prepare_chunked(raw_ormd)
+        document = chunked.document
+        logger.debug(f"Document parsed for viewing mode ({len(chunked.chunks)} chunk(s)).")
         
-        if parse_errors:
+        if document.parse_errors:
             logger.warning(f"{SYMBOLS['warning']} Document has parsing errors:")
-            for error in parse_errors:
+            for error in document.parse_errors:
                 logger.warning(f"  {SYMBOLS['bullet']} {error}")
         
-        title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
-        links = front_matter.get('links', []) if front_matter else []
-        permissions = front_matter.get('permissions', {}) if front_matter else {}
+        title = document.title
         
-        # Generate HTML for viewing
-        html_content = _generate_viewable_html(file_path, raw_ormd, front_matter, body, links, meta)
+        # Generate HTML for viewing; later chunks are served next to the page
+        chunk_files = {f"chunks/{n}.html": chunk for n, chunk in enumerate(chunked.chunks) if n}
+        html_content = pipeline.lazy_view_html(chunked, lambda n: f"chunks/{n}.html", meta)
         
         if show_url:
             # Just show what would happen without starting server
@@ -418,12 +651,65 @@ def open(ctx, file_path, port, no_browser, show_url): # Added ctx
             return
         
         # Start server and open browser
-        _serve_and_open(html_content, port, no_browser, file_path, title)
+        _serve_and_open(html_content, port, no_browser, file_path, title, chunk_files)
         
     except Exception as e:
         logger.error(f"{SYMBOLS['error']} Failed to open {file_path}: {str(e)}")
         exit(1)
 
+@cli.command()
+@click.pass_context
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--watch', '-w', is_flag=True, help='Re-render documents when their source changes and update open pages.')
+@click.option('--port', '-p', default=0, help='Local server port (0 for random)')
+@click.option('--no-browser', is_flag=True, help='Don\'t automatically open browser')
+@click.option('--interval', type=float, default=0.5, show_default=True,
+              help='Seconds between checks for changes where inotify is not available.')
+def serve(ctx, path, watch, port, no_browser, interval):
+    """Serve an ORMD document, or every document under a directory, for preview.
+
+    A directory is laid out like `ormd render --site` output, with links
+    between documents resolved and a list of pages at /. With --watch,
+    edited documents are rendered again and open pages update in place.
+
+    Examples:
+
+      ormd serve my_document.ormd --watch
+      ormd serve docs/ -w -p 8080
+    """
+    from .preview import serve_preview
+
+    logger.debug(f"Preparing to serve {path} (watch={watch}).")
+    serve_preview(path, port, no_browser, watch, interval)
+
+@cli.command()
+@click.pass_context
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--port', '-p', default=0, help='Local server port (0 for random)')
+@click.option('--no-browser', is_flag=True, help='Don\'t automatically open browser')
+@click.option('--jobs', '-j', type=int, default=None, help='Worker processes for the initial index (default: one per CPU).')
+@click.option('--cache-size', type=click.IntRange(min=1), default=256, show_default=True,
+              help='Rendered pages kept in memory.')
+@click.option('--interval', type=float, default=0.5, show_default=True,
+              help='Seconds between checks for changes where inotify is not available.')
+def workspace(ctx, directory, port, no_browser, jobs, cache_size, interval):
+    """Serve every ORMD document under DIRECTORY from one long-lived server.
+
+    Documents are indexed once at start-up and rendered when first
+    visited; rendered pages stay cached until their source changes.
+    The index (titles, links, link_ids, asset_ids, permissions) is
+    served at /index.json.
+
+    Examples:
+
+      ormd workspace docs/
+      ormd workspace docs/ -p 8080 --cache-size 1000
+    """
+    from .workspace import serve_workspace
+
+    logger.debug(f"Preparing workspace for {directory}.")
+    serve_workspace(directory, port, no_browser, jobs, cache_size, interval)
+
 @cli.command()
 @click.pass_context # New decorator
 @click.argument('file_path')
@@ -440,6 +726,11 @@ def edit(ctx, file_path, port, no_browser, force, show_url): # Added ctx
       ormd edit my_package.ormd -p 8081 --force
       ormd edit my_document.ormd --no-browser
     """
+    from .editing import SourceFile
+    from .html_generator import edit_preview, get_render_pipeline
+    from .packager import ORMDPackager
+    from .server import PREVIEW_PATH, SOURCE_PATH, _serve_and_open
+
     logger.debug(f"Preparing to open {file_path} for editing.")
     # Validate file exists
     if not Path(file_path).exists():
@@ -447,33 +738,24 @@ def edit(ctx, file_path, port, no_browser, force, show_url): # Added ctx
         exit(1)
     
     try:
-        # Parse the document
-        input_path = Path(file_path)
-        is_zip = input_path.suffix == '.ormd' and zipfile.is_zipfile(file_path)
-        raw_ormd = ''
-        meta = {}
-        
-        if is_zip:
-            with zipfile.ZipFile(file_path, 'r') as zf:
-                if 'content.ormd' in zf.namelist():
-                    raw_ormd = zf.read('content.ormd').decode('utf-8')
-                if 'meta.json' in zf.namelist():
-                    meta = json.loads(zf.read('meta.json').decode('utf-8'))
-        else:
-            raw_ormd = Path(file_path).read_text(encoding='utf-8')
-
-        # Parse document
-        front_matter, body, metadata, parse_errors = parse_document(raw_ormd)
+        # Read the document (plain file or package)
+        packager = ORMDPackager()
+        raw_ormd, meta = packager.read_source(file_path)
+        # Plain files are saved through the local server; packages are downloaded
+        source = None if packager.is_package(file_path) else SourceFile(file_path)
+
+        # Parse the document and render its body (shared with render/open/edit)
+        pipeline = get_render_pipeline()
+        document = pipeline.prepare(raw_ormd)
         logger.debug("Document parsed for editing mode.")
         
-        if parse_errors:
+        if document.parse_errors:
             logger.warning(f"{SYMBOLS['warning']} Document has parsing errors:")
-            for error in parse_errors:
+            for error in document.parse_errors:
                 logger.warning(f"  {SYMBOLS['bullet']} {error}")
         
-        title = front_matter.get('title', 'ORMD Document') if front_matter else 'ORMD Document'
-        links = front_matter.get('links', []) if front_matter else []
-        permissions = front_matter.get('permissions', {}) if front_matter else {}
+        title = document.title
+        permissions = document.permissions
         
         # Check permissions before proceeding
         can_edit = permissions.get('editable', True)  # Default to editable
@@ -504,7 +786,7 @@ def edit(ctx, file_path, port, no_browser, force, show_url): # Added ctx
                 logger.warning(f"{SYMBOLS['warning']} Editing document marked as non-editable")
         
         # Generate HTML for editing
-        html_content = _generate_editable_html(file_path, raw_ormd, front_matter, body, links, meta)
+        html_content = pipeline.edit_html(document, file_path, meta, SOURCE_PATH if source else '', PREVIEW_PATH)
         
         if show_url:
             # Just show what would happen without starting server
@@ -515,7 +797,8 @@ def edit(ctx, file_path, port, no_browser, force, show_url): # Added ctx
             return
         
         # Start server and open browser
-        _serve_and_open(html_content, port, no_browser, file_path, f"{title} [EDIT]")
+        _serve_and_open(html_content, port, no_browser, file_path, f"{title} [EDIT]", source=source,
+                        preview=edit_preview)
         
     except Exception as e:
         logger.error(f"{SYMBOLS['error']} Failed to edit {file_path}: {str(e)}")
@@ -1,27 +1,258 @@
 # src/ormd_cli/packager.py
 import zipfile
 import json
+import os
+import struct
+import tempfile
+import time
+import zlib
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, List, NamedTuple, Optional, Sequence, Tuple
+
+from .logger import logger
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_COMPRESS_LEVEL = 6
+# Formats that are compressed already: deflating them again costs time and saves nothing
+STORED_SUFFIXES = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.heic',
+    '.mp3', '.m4a', '.ogg', '.opus', '.mp4', '.m4v', '.mov', '.webm', '.mkv',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.woff', '.woff2',
+})
+# Optional package members, next to the content file (see spec section 5)
+OPTIONAL_FILES = ('render.css',)
+OPTIONAL_DIRS = ('ops',)
+
+# Sizes and offsets from this one up go in Zip64 fields, and the 32-bit
+# field holds _ZIP64_MARKER instead
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_MARKER = 0xFFFFFFFF
+_UTF8_NAMES = 0x800
+
+
+class PackMember(NamedTuple):
+    """A file to put in a package, and its path in the archive."""
+    name: str
+    path: Path
+
+
+class _PreparedMember(NamedTuple):
+    member: PackMember
+    method: int
+    crc: int
+    size: int
+    mtime: float
+    mode: int
+    data: Optional[BinaryIO]  # The deflated stream; None to copy the file as it is
+
+
+def _prepare(member: PackMember, level: int) -> _PreparedMember:
+    """CRC (and, unless it is stored, deflate) ``member`` a chunk at a time."""
+    stat = member.path.stat()
+    store = level == 0 or Path(member.name).suffix.lower() in STORED_SUFFIXES
+    data = None if store else tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE)
+    compressor = None if store else zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc, size = 0, 0
+    with open(member.path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                data.write(compressor.compress(chunk))
+    if compressor is not None:
+        data.write(compressor.flush())
+        if data.tell() >= size:  # Did not shrink
+            data.close()
+            data = None
+        else:
+            data.seek(0)
+    method = zipfile.ZIP_STORED if data is None else zipfile.ZIP_DEFLATED
+    return _PreparedMember(member, method, crc, size, stat.st_mtime, stat.st_mode, data)
+
+
+def _dos_date_time(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class _ZipWriter:
+    """Writes members that :func:`_prepare` CRC'd and compressed; Zip64 where sizes or offsets need it.
+
+    ``zipfile`` compresses as it writes, one member at a time, so it cannot
+    take members compressed in parallel.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self.central: List[bytes] = []
+
+    def add(self, prepared: _PreparedMember) -> None:
+        name = prepared.member.name.encode('utf-8')
+        offset = self.fp.tell()
+        if prepared.data is None:
+            compress_size = prepared.size
+        else:
+            prepared.data.seek(0, os.SEEK_END)
+            compress_size = prepared.data.tell()
+            prepared.data.seek(0)
+        dos_time, dos_date = _dos_date_time(prepared.mtime)
+        zip64 = prepared.size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT
+        version = 45 if zip64 or offset >= _ZIP64_LIMIT else 20
+
+        extra = struct.pack('<HHQQ', 1, 16, prepared.size, compress_size) if zip64 else b''
+        sizes = (_ZIP64_MARKER, _ZIP64_MARKER) if zip64 else (compress_size, prepared.size)
+        self.fp.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, version, _UTF8_NAMES, prepared.method,
+                                  dos_time, dos_date, prepared.crc, *sizes, len(name), len(extra)))
+        self.fp.write(name)
+        self.fp.write(extra)
+        if prepared.data is None:
+            self._copy_file(prepared)
+        else:
+            with prepared.data:
+                for chunk in iter(lambda: prepared.data.read(CHUNK_SIZE), b''):
+                    self.fp.write(chunk)
+
+        # Central directory: the Zip64 extra holds just the fields that overflow, in this order
+        fields = [(prepared.size, 'Q'), (compress_size, 'Q'), (offset, 'Q')]
+        large = [(value, fmt) for value, fmt in fields if value >= _ZIP64_LIMIT]
+        extra = (struct.pack('<HH' + ''.join(fmt for _, fmt in large), 1, 8 * len(large), *(v for v, _ in large))
+                 if large else b'')
+        capped = [_ZIP64_MARKER if value >= _ZIP64_LIMIT else value for value, _ in fields]
+        self.central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, _UTF8_NAMES,
+                                        prepared.method, dos_time, dos_date, prepared.crc, capped[1], capped[0],
+                                        len(name), len(extra), 0, 0, 0, (prepared.mode & 0xFFFF) << 16, capped[2])
+                            + name + extra)
+
+    def _copy_file(self, prepared: _PreparedMember) -> None:
+        """Copy a stored member, checking it did not change since it was CRC'd."""
+        crc, size = 0, 0
+        with open(prepared.member.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(min(CHUNK_SIZE, prepared.size - size)), b''):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                self.fp.write(chunk)
+        if (crc, size) != (prepared.crc, prepared.size) or os.path.getsize(prepared.member.path) != size:
+            raise ValueError(f"{prepared.member.path} changed while it was being packed")
+
+    def close(self) -> None:
+        start = self.fp.tell()
+        for header in self.central:
+            self.fp.write(header)
+        end = self.fp.tell()
+        count, size = len(self.central), end - start
+        if count >= 0xFFFF or start >= _ZIP64_LIMIT or size >= _ZIP64_LIMIT:
+            self.fp.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, size, start))
+            self.fp.write(struct.pack('<IIQI', 0x07064b50, 0, end, 1))
+        self.fp.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                  _ZIP64_MARKER if size >= _ZIP64_LIMIT else size,
+                                  _ZIP64_MARKER if start >= _ZIP64_LIMIT else start, 0))
+
 
 class ORMDPackager:
-    def pack(self, content_file: str, meta_file: str, output: str) -> bool:
-        """Pack content.ormd and meta.json into a .ormd zip"""
+    def pack(self, content_file: str, meta_file: str, output: str, assets: Optional[Sequence[str]] = None,
+             compress_level: int = DEFAULT_COMPRESS_LEVEL, jobs: Optional[int] = None) -> bool:
+        """Pack content.ormd, meta.json and the files they use into a .ormd zip.
+
+        Besides the two required members, the package gets ``render.css``
+        and ``ops/`` from the content file's directory if they exist, and
+        the local files named by ``assets`` (the content's ``asset_ids`` if
+        not given) at the same relative paths; assets that do not exist are
+        skipped with a warning. Files are read in chunks, so
+        none is held in memory whole; those in :data:`STORED_SUFFIXES` are
+        stored and the rest deflated at ``compress_level`` (0 stores all)
+        by ``jobs`` threads (default: one per CPU).
+        """
+        output_path = Path(output)
+        temp_path = output_path.with_name(f'.{output_path.name}.{os.getpid()}.tmp')
         try:
-            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
-                # Add main content file
-                zf.write(content_file, 'content.ormd')
-                
-                # Add metadata
-                zf.write(meta_file, 'meta.json')
-                
-                # TODO: Add optional files (render.css, ops/, etc.)
-                
+            if not 0 <= compress_level <= 9:
+                raise ValueError(f"Compression level must be 0-9, not {compress_level}")
+            members = self.members(content_file, meta_file, assets)
+            with open(temp_path, 'wb') as fp:
+                self._write_members(fp, members, compress_level, jobs)
+            os.replace(temp_path, output_path)
             return True
         except Exception as e:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
             print(f"Packing failed: {e}")
             return False
-    
+
+    def members(self, content_file: str, meta_file: str, assets: Optional[Sequence[str]] = None) -> List[PackMember]:
+        """The files :meth:`pack` puts in the package, in archive order."""
+        content_path = Path(content_file)
+        base_dir = content_path.parent
+        members = [PackMember('content.ormd', content_path), PackMember('meta.json', Path(meta_file))]
+        for name in OPTIONAL_FILES:
+            if (base_dir / name).is_file():
+                members.append(PackMember(name, base_dir / name))
+        for name in OPTIONAL_DIRS:
+            directory = base_dir / name
+            if directory.is_dir():
+                members.extend(PackMember(path.relative_to(base_dir).as_posix(), path)
+                               for path in sorted(directory.rglob('*')) if path.is_file())
+
+        if assets is None:
+            assets = self._asset_ids(content_path)
+        names = {member.name for member in members}
+        resolved_base = base_dir.resolve()
+        for asset in assets:
+            if not isinstance(asset, str) or asset.startswith(('http://', 'https://', '/')):
+                continue
+            path = base_dir / asset
+            try:
+                name = path.resolve().relative_to(resolved_base).as_posix()
+            except ValueError:
+                logger.warning(f"Not packing {asset}: it is outside {base_dir}")
+                continue
+            if name in names:
+                continue
+            if not path.is_file():
+                logger.warning(f"Not packing {asset}: no such file (looked in {path})")
+                continue
+            names.add(name)
+            members.append(PackMember(name, path))
+        return members
+
+    def _asset_ids(self, content_path: Path) -> List[str]:
+        from .parser import open_document
+
+        with open_document(content_path) as document:
+            front_matter = document.front_matter or {}
+            listed = front_matter.get('asset_ids')
+            return list(dict.fromkeys((listed if isinstance(listed, list) else []) + document.analysis().asset_ids))
+
+    def _write_members(self, fp: BinaryIO, members: List[PackMember], level: int, jobs: Optional[int]) -> None:
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(members)))
+        writer = _ZipWriter(fp)
+        # zlib releases the GIL, so threads compress in parallel. Members are
+        # written in order, with at most a few compressed ones waiting.
+        with ThreadPoolExecutor(jobs) as pool:
+            pending = deque()
+            try:
+                for member in members:
+                    pending.append(pool.submit(_prepare, member, level))
+                    if len(pending) > 2 * jobs:
+                        writer.add(pending.popleft().result())
+                while pending:
+                    writer.add(pending.popleft().result())
+            finally:
+                for future in pending:
+                    future.cancel()
+                    if not future.cancelled() and future.exception() is None:
+                        data = future.result().data
+                        if data is not None:
+                            data.close()
+        writer.close()
+
     def unpack(self, package_file: str, output_dir: str) -> bool:
         """Unpack a .ormd zip into directory"""
         try:
@@ -34,4 +265,25 @@ class ORMDPackager:
             return True
         except Exception as e:
             print(f"Unpacking failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def is_package(self, file_path: str) -> bool:
+        """Whether ``file_path`` is a .ormd package (a zip) rather than a plain file."""
+        return Path(file_path).suffix == '.ormd' and zipfile.is_zipfile(file_path)
+
+    def read_source(self, file_path: str) -> Tuple[str, dict]:
+        """Return ``(raw_ormd, meta)`` for a plain .ormd file or a .ormd package.
+
+        Plain files have no meta.json, so ``meta`` is empty for them.
+        """
+        raw_ormd = ''
+        meta = {}
+        if self.is_package(file_path):
+            with zipfile.ZipFile(file_path, 'r') as zf:
+                if 'content.ormd' in zf.namelist():
+                    raw_ormd = zf.read('content.ormd').decode('utf-8')
+                if 'meta.json' in zf.namelist():
+                    meta = json.loads(zf.read('meta.json').decode('utf-8'))
+        else:
+            raw_ormd = Path(file_path).read_text(encoding='utf-8')
+        return raw_ormd, meta
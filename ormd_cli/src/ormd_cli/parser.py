@@ -1,7 +1,328 @@
 """Parsing utilities for ORMD documents."""
+import codecs
+import itertools
+import mmap
 import re
 import yaml
-from typing import Tuple, Dict, Optional, List
+from pathlib import Path
+from typing import Tuple, Dict, Optional, List, NamedTuple, Union
+
+from .analyzer import LINK_REF, BodyAnalysis, analyze_body
+from .links import LinkIndex
+
+VERSION_TAG = '<!-- ormd:0.1 -->'
+
+# Per-line markers the tokenizer looks for after the front-matter: a bare
+# ``---``/``+++`` delimiter line, or a legacy ``+++meta``/``+++end-meta`` line.
+# {space} is whitespace other than a newline, {end} the end of a word.
+_MARKER_LINE = r'(?:(?P<delim>{space}*(?:---|\+\+\+){space}*$)|[ ]*\+\+\+(?P<meta>meta|end-meta){end})'
+_CLOSING_LINE = r'^{space}*{delimiter}{space}*$'
+
+# What ``str.isspace`` (and ``\s`` in a text pattern) counts as whitespace,
+# encoded as UTF-8, so that byte buffers split a document exactly where its
+# decoded text would. The ASCII part is the same in every encoding.
+_ASCII_SPACE = b'\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f '
+_UTF8_SPACE = r'\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80'
+_WORD_CHAR = re.compile(r'\w')
+
+# A document buffer is either decoded text or raw bytes (including an mmap).
+Buffer = Union[str, bytes, mmap.mmap]
+
+
+class _Syntax(NamedTuple):
+    """Literals and compiled patterns for one buffer type (text or bytes)."""
+    version_tag: Union[str, bytes]
+    newline: Union[str, bytes]
+    delimiters: Tuple[Union[str, bytes], ...]
+    whitespace: re.Pattern
+    marker_at: re.Pattern
+    marker_scan: re.Pattern
+    closing: Dict[str, re.Pattern]
+    link_ref: re.Pattern
+
+
+def _build_syntax(encode, space: str, line_space: str, word_end: str) -> _Syntax:
+    marker_line = _MARKER_LINE.format(space=line_space, end=word_end)
+    return _Syntax(
+        version_tag=encode(VERSION_TAG),
+        newline=encode('\n'),
+        delimiters=(encode('---'), encode('+++')),
+        whitespace=re.compile(encode(space + '*')),
+        marker_at=re.compile(encode(marker_line), re.MULTILINE),
+        marker_scan=re.compile(encode('^' + marker_line), re.MULTILINE),
+        closing={
+            '---': re.compile(encode(_CLOSING_LINE.format(space=line_space, delimiter='---')), re.MULTILINE),
+            '+++': re.compile(encode(_CLOSING_LINE.format(space=line_space, delimiter=r'\+\+\+')), re.MULTILINE),
+        },
+        link_ref=re.compile(encode(LINK_REF.pattern)),
+    )
+
+
+_TEXT_SYNTAX = _build_syntax(lambda s: s, r'\s', r'[^\S\n]', r'\b')
+# Bytes patterns only see ASCII word characters; a non-ASCII one after
+# "+++meta" is ruled out by _continues_word
+_BYTES_SYNTAX = _build_syntax(
+    lambda s: s.encode('ascii'),
+    rf'(?:[\t\n\x0b\x0c\r\x1c-\x1f ]|{_UTF8_SPACE})',
+    rf'(?:[\t\x0b\x0c\r\x1c-\x1f ]|{_UTF8_SPACE})',
+    r'(?![A-Za-z0-9_])',
+)
+
+
+def _syntax_for(content: Buffer) -> _Syntax:
+    return _TEXT_SYNTAX if isinstance(content, str) else _BYTES_SYNTAX
+
+
+class DocumentTokens(NamedTuple):
+    """Offsets of the structural parts of an ORMD document.
+
+    All spans index into the original buffer so that callers can slice only
+    what they need. ``yaml_span`` and ``front_matter_span`` are ``None`` when
+    no complete front-matter block was found; ``front_matter_span`` covers
+    the delimiter lines too, up to and including the closing newline.
+    """
+    has_version_tag: bool
+    delimiter: Optional[str]
+    yaml_span: Optional[Tuple[int, int]]
+    body_span: Tuple[int, int]
+    has_secondary_delimiter: bool
+    has_legacy_meta: bool
+    has_legacy_end_meta: bool
+    front_matter_span: Optional[Tuple[int, int]] = None
+    version_tag_end: Optional[int] = None
+
+
+def _skip_whitespace(content: Buffer, pos: int, end: int) -> int:
+    return _syntax_for(content).whitespace.match(content, pos, max(pos, end)).end()
+
+
+def _trim_trailing_whitespace(content: Buffer, start: int, end: int) -> int:
+    if isinstance(content, str):
+        while end > start and content[end - 1].isspace():
+            end -= 1
+        return end
+    while end > start:
+        if content[end - 1] < 0x80:
+            if content[end - 1] not in _ASCII_SPACE:
+                break
+            end -= 1
+            continue
+        # The last character is multi-byte: find where it starts
+        char_start = end - 1
+        while char_start > max(start, end - 4) and 0x80 <= content[char_start] < 0xC0:
+            char_start -= 1
+        if not _BYTES_SYNTAX.whitespace.fullmatch(content, char_start, end):
+            break
+        end = char_start
+    return end
+
+
+def _continues_word(content: Buffer, pos: int) -> bool:
+    """Whether a non-ASCII word character starts at byte ``pos`` of a UTF-8 buffer."""
+    if isinstance(content, str) or pos >= len(content) or content[pos] < 0x80:
+        return False
+    char = bytes(content[pos:pos + 4]).decode('utf-8', 'ignore')[:1]
+    return bool(_WORD_CHAR.match(char))
+
+
+def _locate_front_matter(content: Buffer, start: int, end: int) -> Tuple[Optional[str], Optional[Tuple[int, int]], int, Optional[int]]:
+    """Find the front-matter block in ``content[start:end]``.
+
+    ``start``/``end`` must already exclude surrounding whitespace.
+    Returns ``(delimiter, yaml_span, body_start, closing_end)``;
+    ``delimiter`` is set whenever the region opens with a delimiter line,
+    even if it is never closed, in which case ``yaml_span`` is ``None`` and
+    the body is the whole region.
+    """
+    syntax = _syntax_for(content)
+    opening = content[start:start + 3]
+    if opening not in syntax.delimiters or start + 4 > end or content[start + 3:start + 4] != syntax.newline:
+        return None, None, start, None
+
+    delimiter = opening if isinstance(opening, str) else opening.decode('ascii')
+    yaml_start = start + 4
+    closing = syntax.closing[delimiter].search(content, yaml_start, end)
+    if closing:
+        body_start = _skip_whitespace(content, min(closing.end() + 1, end), end)
+        return delimiter, (yaml_start, max(yaml_start, closing.start() - 1)), body_start, closing.end()
+
+    return delimiter, None, start, None
+
+
+def tokenize_document(content: Buffer) -> DocumentTokens:
+    """Locate the version tag, front-matter and body markers in one pass.
+
+    Only offsets are computed here; no part of the document is copied, so
+    callers decide which slices (front-matter, body) to materialize.
+    ``content`` may be text or a bytes-like buffer such as an ``mmap``, in
+    which case the offsets are byte offsets.
+    """
+    syntax = _syntax_for(content)
+    end = _trim_trailing_whitespace(content, 0, len(content))
+    first = _skip_whitespace(content, 0, end)
+
+    if content[first:first + len(syntax.version_tag)] != syntax.version_tag:
+        return DocumentTokens(False, None, None, (first, end), False, False, False)
+
+    # The tag is only consumed when it sits at the start of a line.
+    pos = first
+    if first == 0 or content[first - 1:first] == syntax.newline:
+        pos = first + len(syntax.version_tag)
+    start = _skip_whitespace(content, pos, end)
+
+    delimiter, yaml_span, body_start, closing_end = _locate_front_matter(content, start, end)
+
+    front_matter_span = None
+    if yaml_span is not None:
+        line_end = content.find(syntax.newline, closing_end)
+        front_matter_span = (start, len(content) if line_end == -1 else line_end + 1)
+
+    secondary = meta = end_meta = False
+    if delimiter is None or yaml_span is not None:
+        # The body may begin mid-line (its leading whitespace is trimmed), so
+        # its first line is matched explicitly in addition to the line starts.
+        matches = syntax.marker_scan.finditer(content, body_start, end)
+        first_line = syntax.marker_at.match(content, body_start, end)
+        if first_line:
+            matches = itertools.chain((first_line,), matches)
+        for match in matches:
+            if match.group('meta') is not None and _continues_word(content, match.end()):
+                continue
+            if match.group('delim') is not None:
+                secondary = True
+            elif match.group('meta') in ('meta', b'meta'):
+                meta = True
+            else:
+                end_meta = True
+            if secondary and meta and end_meta:
+                break
+
+    return DocumentTokens(True, delimiter, yaml_span, (body_start, end), secondary, meta, end_meta,
+                          front_matter_span, pos)
+
+
+def _load_yaml(yaml_content: str) -> Optional[Dict]:
+    """Parse a front-matter YAML block, returning ``None`` on invalid YAML."""
+    try:
+        if yaml_content.strip():
+            front_matter = yaml.safe_load(yaml_content)
+            if front_matter is None:
+                front_matter = {}
+        else:
+            front_matter = {}
+    except yaml.YAMLError:
+        return None
+    return front_matter
+
+
+class ParsedDocument:
+    """Lazy view over a parsed ORMD document.
+
+    Keeps the raw content and the offsets found by :func:`tokenize_document`
+    and only slices the body or front-matter text when asked, so callers that
+    need just the front-matter and link references never copy the body.
+    When ``content`` is a bytes buffer (see :func:`open_document`), slices
+    are decoded with ``encoding`` as they are produced.
+    """
+    __slots__ = ('content', 'front_matter', 'errors', 'tokens', 'encoding', '_body_start', '_body_end',
+                 '_analysis', '_link_index')
+
+    def __init__(self, content: Buffer, front_matter: Optional[Dict], errors: List[str],
+                 tokens: DocumentTokens, body_start: int, body_end: int, encoding: str = 'utf-8'):
+        self.content = content
+        self.front_matter = front_matter
+        self.errors = errors
+        self.tokens = tokens
+        self.encoding = encoding
+        self._body_start = body_start
+        self._body_end = body_end
+        self._analysis: Optional[BodyAnalysis] = None
+        self._link_index: Optional[LinkIndex] = None
+
+    def __enter__(self) -> 'ParsedDocument':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the underlying buffer if it is a memory map."""
+        if isinstance(self.content, mmap.mmap):
+            self.content.close()
+
+    def text(self, start: int, end: int) -> str:
+        """Return ``content[start:end]`` as text."""
+        chunk = self.content[start:end]
+        return chunk if isinstance(chunk, str) else chunk.decode(self.encoding)
+
+    @property
+    def has_version_tag(self) -> bool:
+        return self.tokens.has_version_tag
+
+    @property
+    def body_span(self) -> Tuple[int, int]:
+        return self._body_start, self._body_end
+
+    @property
+    def body(self) -> str:
+        """The document body, sliced from the raw content on each access."""
+        return self.text(self._body_start, self._body_end)
+
+    @property
+    def front_matter_text(self) -> str:
+        """The raw YAML between the front-matter delimiters ('' if absent)."""
+        if self.tokens.yaml_span is None:
+            return ''
+        return self.text(*self.tokens.yaml_span)
+
+    def body_lines(self, start: int, end: Optional[int] = None) -> List[str]:
+        """Return body lines ``[start, end)`` (0-based) without slicing the whole body."""
+        content, pos, body_end = self.content, self._body_start, self._body_end
+        newline = _syntax_for(content).newline
+        lines: List[str] = []
+        index = 0
+        while pos <= body_end and (end is None or index < end):
+            line_end = content.find(newline, pos, body_end)
+            if line_end == -1:
+                line_end = body_end
+            if index >= start:
+                lines.append(self.text(pos, line_end))
+            pos = line_end + 1
+            index += 1
+        return lines
+
+    def link_refs(self) -> List[str]:
+        """Return every ``[[id]]`` reference in the body, in document order."""
+        refs = _syntax_for(self.content).link_ref.findall(self.content, self._body_start, self._body_end)
+        if isinstance(self.content, str):
+            return refs
+        return [ref.decode(self.encoding) for ref in refs]
+
+    def link_ids(self) -> List[str]:
+        """Return the distinct ``[[id]]`` references in the body, in order of first use.
+
+        Taken from :meth:`analysis` if it has already run, otherwise from a
+        scan of the raw content that does not decode the body.
+        """
+        if self._analysis is not None:
+            return self._analysis.link_ids
+        return list(dict.fromkeys(self.link_refs()))
+
+    def analysis(self) -> BodyAnalysis:
+        """Word count, link and asset IDs and code ranges of the body (computed once)."""
+        if self._analysis is None:
+            self._analysis = analyze_body(self.body)
+        return self._analysis
+
+    def link_index(self) -> LinkIndex:
+        """Index of the front-matter link definitions by id (built once)."""
+        if self._link_index is None:
+            self._link_index = LinkIndex.from_front_matter(self.front_matter)
+        return self._link_index
+
+    def as_tuple(self) -> Tuple[Optional[Dict], str, Optional[Dict[str, str]], List[str]]:
+        """Materialize the classic ``(front_matter, body, metadata, errors)`` result."""
+        return self.front_matter, self.body, None, self.errors
 
 
 def parse_document(content: str) -> Tuple[Optional[Dict], str, Optional[Dict[str, str]], List[str]]:
@@ -15,49 +336,81 @@ def parse_document(content: str) -> Tuple[Optional[Dict], str, Optional[Dict[str
     Note: The metadata parameter is kept for backward compatibility but will always be None
     since all metadata now goes in the front-matter YAML block.
     """
+    return parse_document_lazy(content).as_tuple()
+
+
+def parse_document_lazy(content: Buffer, encoding: str = 'utf-8') -> ParsedDocument:
+    """Parse ORMD document content into a :class:`ParsedDocument` view.
+
+    Performs the same checks as :func:`parse_document` but defers slicing
+    the body until a caller asks for it. ``content`` may also be a bytes
+    buffer, in which case only the front-matter is decoded here.
+    """
     errors: List[str] = []
+    tokens = tokenize_document(content)
+    body_start, body_end = tokens.body_span
     
     # Check for version tag at the beginning
-    if not content.strip().startswith('<!-- ormd:0.1 -->'):
+    if not tokens.has_version_tag:
         errors.append("Missing or invalid version tag (expected at the beginning of the document)")
-        return None, "", None, errors
+        return ParsedDocument(content, None, errors, tokens, 0, 0, encoding)
     
-    # Remove the version tag
-    content_without_version = re.sub(r'^<!-- ormd:0\.1 -->\s*\n?', '', content, flags=re.MULTILINE)
+    document = ParsedDocument(content, None, errors, tokens, body_start, body_end, encoding)
     
-    # Parse front-matter and body
-    front_matter, body = _parse_front_matter_and_body(content_without_version)
+    # Parse front-matter
+    front_matter = None
+    if tokens.yaml_span is not None:
+        front_matter = _load_yaml(document.front_matter_text)
     
     # Validate YAML if present
-    if front_matter is None and content_without_version.strip().startswith(('---', '+++')):
+    opens_like_front_matter = (tokens.delimiter is not None
+                               or content[body_start:body_start + 3] in _syntax_for(content).delimiters)
+    if front_matter is None and opens_like_front_matter:
         errors.append("Invalid YAML in front-matter")
-        return None, body, None, errors
+        return document
     
     # Convert empty front-matter to empty dict
     if front_matter is None:
         front_matter = {}
+    document.front_matter = front_matter
     
-    # Validate YAML if present, and ensure no multiple front-matter blocks
-    if front_matter is None:
-        if content_without_version.strip().startswith(('---', '+++')):
-            errors.append("Error: Invalid YAML in front-matter.")
-            # No further checks needed if the primary front-matter is invalid
-            return None, body, None, errors
-        # If no front-matter delimiters at all, it's a valid document with an empty front_matter
-        front_matter = {}
-    else: # Valid initial front-matter was found
-        # Check for subsequent YAML block delimiters in the body
-        # This regex looks for '---' or '+++' at the beginning of a line, possibly with spaces before it.
-        if re.search(r'^\s*(---\s*$|\+\+\+\s*$)', body, re.MULTILINE):
-            errors.append("Error: Multiple YAML front-matter blocks found. Only one is allowed at the beginning of the document.")
+    # Check for subsequent YAML block delimiters in the body
+    if tokens.has_secondary_delimiter:
+        errors.append("Error: Multiple YAML front-matter blocks found. Only one is allowed at the beginning of the document.")
 
     # Error for legacy +++meta blocks
-    if re.search(r'^[ ]*\+\+\+meta\b', body, re.MULTILINE):
+    if tokens.has_legacy_meta:
         errors.append("Error: `+++meta` blocks are no longer supported. All metadata must be in the YAML front-matter.")
-    if re.search(r'^[ ]*\+\+\+end-meta\b', body, re.MULTILINE): # Check for +++end-meta as well
+    if tokens.has_legacy_end_meta:
         errors.append("Error: `+++end-meta` blocks are no longer supported.")
     
-    return front_matter, body, None, errors
+    return document
+
+
+def open_document(file_path: Union[str, Path], encoding: str = 'utf-8') -> ParsedDocument:
+    """Memory-map ``file_path`` and parse it without decoding the whole file.
+
+    Only the front-matter is decoded up front; body slices are decoded on
+    demand. Files containing carriage returns are read as text instead so
+    that newlines are normalized exactly as ``Path.read_text`` does, and so
+    are files in encodings other than UTF-8, whose whitespace the byte
+    patterns do not know. Use the result as a context manager (or call
+    ``close()``) to release the mapping.
+    """
+    if codecs.lookup(encoding).name != 'utf-8':
+        return parse_document_lazy(Path(file_path).read_text(encoding=encoding), encoding)
+    with open(file_path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return parse_document_lazy(b'', encoding)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        # Scans are front-to-back; let the kernel drop pages behind them
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    if mapped.find(b'\r') != -1:
+        mapped.close()
+        return parse_document_lazy(Path(file_path).read_text(encoding=encoding), encoding)
+    return parse_document_lazy(mapped, encoding)
 
 
 def _parse_front_matter_and_body(content: str) -> Tuple[Optional[Dict], str]:
@@ -66,56 +419,13 @@ def _parse_front_matter_and_body(content: str) -> Tuple[Optional[Dict], str]:
     Supports both --- and +++ delimiters for front-matter.
     Returns (front_matter_dict, body_content)
     """
-    content = content.strip()
-    
-    # Check if content starts with front-matter delimiters
-    if content.startswith('---\n'):
-        return _extract_yaml_block(content, '---')
-    elif content.startswith('+++\n'):
-        return _extract_yaml_block(content, '+++')
-    else:
-        # No front-matter, entire content is body
-        return None, content
-
-
-def _extract_yaml_block(content: str, delimiter: str) -> Tuple[Optional[Dict], str]:
-    """Extract YAML front-matter block with given delimiter."""
-    lines = content.split('\n')
-    
-    if lines[0] != delimiter:
-        return None, content
-    
-    # Find closing delimiter
-    closing_line = None
-    for i in range(1, len(lines)):
-        if lines[i].strip() == delimiter:
-            closing_line = i
-            break
-    
-    if closing_line is None:
-        # No closing delimiter found, treat as body content
-        return None, content
-    
-    # Extract YAML content
-    yaml_lines = lines[1:closing_line]
-    yaml_content = '\n'.join(yaml_lines)
-    
-    # Extract body content (everything after closing delimiter)
-    body_lines = lines[closing_line + 1:]
-    body_content = '\n'.join(body_lines).strip()
-    
-    # Parse YAML
-    try:
-        if yaml_content.strip():
-            front_matter = yaml.safe_load(yaml_content)
-            if front_matter is None:
-                front_matter = {}
-        else:
-            front_matter = {}
-    except yaml.YAMLError:
-        return None, body_content
-    
-    return front_matter, body_content
+    end = _trim_trailing_whitespace(content, 0, len(content))
+    start = _skip_whitespace(content, 0, end)
+    delimiter, yaml_span, body_start, _ = _locate_front_matter(content, start, end)
+    body = content[body_start:end]
+    if yaml_span is None:
+        return None, body
+    return _load_yaml(content[yaml_span[0]:yaml_span[1]]), body
 
 # Removed migrate_legacy_metadata and _migrate_metadata_fields functions
 
@@ -0,0 +1,384 @@
+"""Live preview behind ``ormd serve``.
+
+``ormd serve FILE`` renders one document at ``/``; ``ormd serve DIR`` renders
+every ``.ormd`` under DIR the way ``ormd render --site`` lays it out
+(``guide/intro.ormd`` at ``/guide/intro.html``, cross-document links
+resolved) and lists them at ``/``. Pages are served from memory by an
+:class:`.server.ORMDServer`.
+
+With ``--watch`` a :class:`SourceWatcher` reports sources that were added,
+changed or removed. Only those documents are rendered again, together with
+pages whose ``[[id]]`` links now resolve to a different document. Each page
+body is a list of sections (see :mod:`.sections`) keyed by a digest of their
+HTML; open pages receive an ``update`` event with the new list of keys and the
+HTML of the sections they do not have yet, and ``ormd-live.js`` swaps in
+just those. The source is not part of the event: it is served next to the
+page (``/intro.ormd.txt``) and the raw pane fetches it when it is next shown.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import html
+import os
+import posixpath
+import select
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .batch import collect_ormd_files
+from .logger import logger
+from .server import EventHub, ORMDServer, Resource, bind_server, run_server
+from .site_builder import PageLinks, SiteIndex, page_path
+from .utils import SYMBOLS
+
+# Seconds between scans for changed sources when inotify is not available
+POLL_INTERVAL = 0.5
+# With inotify, a full scan still runs this often, in case an event was missed
+_INOTIFY_RESCAN = 5.0
+# Editors often save in several steps; let them finish before scanning
+_SETTLE_DELAY = 0.05
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_INOTIFY_MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+_LIVE_SCRIPT = '/_ormd/ormd-live.js'
+
+
+class _Inotify:
+    """Just enough of Linux inotify (through the C library) to wake up when a directory changes."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._libc = libc
+        self._fd = fd
+        self._watched = set()
+
+    @classmethod
+    def create(cls) -> Optional['_Inotify']:
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            return cls()
+        except (OSError, AttributeError):
+            return None
+
+    def watch(self, directory: str) -> None:
+        if directory not in self._watched:
+            if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _INOTIFY_MASK) >= 0:
+                self._watched.add(directory)
+
+    def forget_missing(self) -> None:
+        # The kernel drops the watches of removed directories
+        self._watched = {directory for directory in self._watched if os.path.isdir(directory)}
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for changes; whether there were any."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        time.sleep(_SETTLE_DELAY)
+        try:
+            while os.read(self._fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def find_sources(root) -> List[Path]:
+    """The ``.ormd`` files under ``root``, or ``root`` itself if it is a file."""
+    root = Path(root)
+    if root.is_dir():
+        return [Path(path) for path in collect_ormd_files([str(root)])]
+    return [root]
+
+
+class SourceWatcher:
+    """Reports ``.ormd`` sources under ``root`` (a file or directory) that were added, changed or removed.
+
+    Changes are found by comparing ``(mtime, size)`` snapshots. Where inotify
+    is available it wakes the watcher as soon as a watched directory
+    changes; otherwise the sources are scanned every ``interval`` seconds.
+    """
+
+    def __init__(self, root, interval: float = POLL_INTERVAL, use_inotify: bool = True):
+        self.root = Path(root)
+        self.interval = interval
+        self._inotify = _Inotify.create() if use_inotify else None
+        self._snapshot = self.scan()
+        self._watch_directories()
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in find_sources(self.root):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _watch_directories(self) -> None:
+        if self._inotify is None:
+            return
+        self._inotify.forget_missing()
+        if self.root.is_dir():
+            for directory, _, _ in os.walk(self.root):
+                self._inotify.watch(directory)
+        else:
+            self._inotify.watch(str(self.root.parent))
+
+    def wait(self) -> Tuple[List[Path], List[Path]]:
+        """Wait for the next scan; return the sources changed (or added) and removed since the last one."""
+        if self._inotify is not None:
+            self._inotify.wait(max(self.interval, _INOTIFY_RESCAN))
+        else:
+            time.sleep(self.interval)
+        snapshot = self.scan()
+        changed = sorted(path for path, state in snapshot.items() if self._snapshot.get(path) != state)
+        removed = sorted(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        if changed or removed:
+            self._watch_directories()
+        return changed, removed
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def section_keys(sections: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """Key each section by a digest of its HTML; repeated sections get a ``-n`` suffix."""
+    keys: List[str] = []
+    by_key: Dict[str, str] = {}
+    seen: Dict[str, int] = {}
+    for text in sections:
+        key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        if count:
+            key = f'{key}-{count}'
+        keys.append(key)
+        by_key[key] = text
+    return keys, by_key
+
+
+class PreviewPage:
+    """What the preview last rendered for one source."""
+    __slots__ = ('url', 'title', 'keys', 'sections', 'refs')
+
+    def __init__(self, url: str, title: str, keys: List[str], sections: Dict[str, str],
+                 refs: Dict[str, Optional[str]]):
+        self.url = url
+        self.title = title
+        self.keys = keys
+        self.sections = sections
+        self.refs = refs
+
+
+class PreviewSite:
+    """Renders the pages of ``ormd serve`` into ``server.resources`` and announces updates to open pages."""
+
+    def __init__(self, root, server: ORMDServer):
+        self.root = Path(root)
+        self.server = server
+        self.is_dir = self.root.is_dir()
+        self.sources: Set[Path] = set()
+        self.pages: Dict[Path, PreviewPage] = {}
+        self.index: Optional[SiteIndex] = None
+        # Version of the page at each URL; it keeps counting if a source is removed and added again
+        self.versions: Dict[str, int] = {}
+        self._index_items: Optional[List[Tuple[str, str, str]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def live(self) -> bool:
+        return self.server.events is not None
+
+    def _name(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix() if self.is_dir else path.name
+
+    def _url(self, path: Path) -> str:
+        return '/' + page_path(self._name(path)) if self.is_dir else '/index.html'
+
+    @staticmethod
+    def _source_url(url: str) -> str:
+        return posixpath.splitext(url)[0] + '.ormd.txt'
+
+    def _publish(self, url: str, event: str, data: dict) -> None:
+        if self.server.events is not None:
+            self.server.events.publish(url, event, data)
+
+    def _live_script(self, url: str, **data: str) -> str:
+        if not self.live:
+            return ''
+        attrs = ''.join(f' data-{name}="{html.escape(value)}"' for name, value in data.items())
+        return (f'<script src="{_LIVE_SCRIPT}" data-page="{html.escape(url)}" '
+                f'data-version="{self.versions.get(url, 0)}"{attrs}></script>')
+
+    def _set_index(self) -> None:
+        if self.is_dir:
+            self.index = SiteIndex(sorted(self._name(path) for path in self.sources))
+
+    def build(self, sources: List[Path]) -> None:
+        """Render every page of the preview."""
+        with self._lock:
+            self.sources = set(sources)
+            self._set_index()
+            for path in sorted(self.sources):
+                self._render(path)
+            self._render_index()
+
+    def update(self, changed: List[Path], removed: List[Path]) -> None:
+        """Render ``changed`` sources again, drop ``removed`` ones, and tell open pages."""
+        with self._lock:
+            stale = list(changed)
+            sources = (self.sources | set(changed)) - set(removed)
+            if sources != self.sources:
+                self.sources = sources
+                self._set_index()
+                # Pages whose links to other documents now resolve differently
+                for path, page in self.pages.items():
+                    if path in changed or path in removed or self.index is None:
+                        continue
+                    links = PageLinks(page.url.lstrip('/'), self.index)
+                    if any(links.url_for(link_id) != url for link_id, url in page.refs.items()):
+                        stale.append(path)
+            for path in removed:
+                url = self._url(path)
+                self.pages.pop(path, None)
+                self.server.resources.pop(url, None)
+                self.server.resources.pop(self._source_url(url), None)
+                self._publish(url, 'removed', {'version': str(self.versions.get(url, 0))})
+                logger.info(f"{SYMBOLS['info']} Removed {self._name(path)}")
+            for path in stale:
+                if self._render(path):
+                    logger.info(f"{SYMBOLS['success']} Updated {self._name(path)}")
+            self._render_index()
+
+    def _render(self, path: Path) -> bool:
+        from .html_generator import get_render_pipeline
+        from .packager import ORMDPackager
+
+        url = self._url(path)
+        previous = self.pages.get(path)
+        try:
+            raw_ormd, meta = ORMDPackager().read_source(str(path))
+            pipeline = get_render_pipeline()
+            if self.index is not None:
+                links = PageLinks(url.lstrip('/'), self.index)
+                chunked = pipeline.prepare_chunked(raw_ormd, 0, links.target_url, links.document_url)
+                refs = links.resolved
+            else:
+                chunked = pipeline.prepare_chunked(raw_ormd, 0)
+                refs = {}
+            document = chunked.document
+            keys, sections = section_keys(chunked.chunks)
+            main_html = ''.join(f'<div class="ormd-section" data-key="{key}">{sections[key]}</div>'
+                                for key in keys)
+        except Exception as e:
+            logger.error(f"{SYMBOLS['error']} Failed to render {self._name(path)}: {str(e)}")
+            if previous is None:
+                # Nothing to keep showing: serve the error, and reload once the source is fixed
+                self.server.resources[url] = Resource.html(
+                    f'<!DOCTYPE html>\n<html>\n<body>\n<h1>Failed to render {html.escape(self._name(path))}</h1>\n'
+                    f'<pre>{html.escape(str(e))}</pre>\n{self._live_script(url)}\n</body>\n</html>\n')
+            self._publish(url, 'failed', {'version': str(self.versions.get(url, 0)), 'error': str(e)})
+            return False
+
+        version = self.versions.get(url, 0) + 1
+        self.versions[url] = version
+        page_html = pipeline.view_html(document._replace(main_html=main_html), meta,
+                                       self._live_script(url, title=document.title))
+        self.server.resources[url] = Resource.html(page_html)
+        if self.live:
+            self.server.resources[self._source_url(url)] = Resource.text(raw_ormd)
+        self.pages[path] = PreviewPage(url, document.title, keys, sections, refs)
+        if previous is None:
+            # Pages showing an error, or that the source was removed, start over
+            self._publish(url, 'reload', {'version': str(version)})
+        else:
+            self._publish(url, 'update', {
+                'version': str(version),
+                'previous': str(version - 1),
+                'title': document.title,
+                'keys': keys,
+                'html': {key: sections[key] for key in keys if key not in previous.sections},
+                'source': self._source_url(url),
+                'links': document.link_index.graph_data(),
+            })
+        return True
+
+    def _render_index(self) -> None:
+        """List the pages of a directory preview at ``/``."""
+        if not self.is_dir:
+            return
+        items = [(self._url(path), self.pages[path].title if path in self.pages else self._name(path),
+                  self._name(path)) for path in sorted(self.sources)]
+        if items == self._index_items:
+            return
+        self._index_items = items
+        version = self.versions.get('/index.html', 0) + 1
+        self.versions['/index.html'] = version
+        self.server.resources['/index.html'] = Resource.html(
+            listing_html(self.root.resolve().name or str(self.root), items, self._live_script('/index.html')))
+        self._publish('/index.html', 'reload', {'version': str(version)})
+
+
+def listing_html(title: str, items: List[Tuple[str, str, str]], extra: str = '') -> str:
+    """A page listing documents as ``(url, title, source name)`` items."""
+    title = html.escape(title)
+    entries = ''.join(f'<li><a href="{html.escape(url)}">{html.escape(doc_title)}</a> '
+                      f'<code>{html.escape(name)}</code></li>' for url, doc_title, name in items)
+    return (f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n<title>{title} - ORMD</title>\n'
+            f'<link rel="stylesheet" href="/_ormd/ormd.css">\n</head>\n<body>\n<div id="container">\n'
+            f'<div id="main-doc">\n<h1>{title}</h1>\n<ul>{entries}</ul>\n</div>\n</div>\n{extra}\n</body>\n</html>\n')
+
+
+def _watch(target, watcher: SourceWatcher) -> None:
+    while True:
+        try:
+            changed, removed = watcher.wait()
+            if changed or removed:
+                target.update(changed, removed)
+        except Exception as e:
+            logger.error(f"{SYMBOLS['error']} Update after a change failed: {str(e)}")
+            time.sleep(watcher.interval)
+
+
+def start_watching(target, watcher: SourceWatcher) -> None:
+    """Call ``target.update(changed, removed)`` from a background thread whenever ``watcher`` reports changes."""
+    threading.Thread(target=_watch, args=(target, watcher), daemon=True).start()
+
+
+def serve_preview(path: str, port: int = 0, no_browser: bool = False, watch: bool = False,
+                  interval: float = POLL_INTERVAL) -> None:
+    """Serve ``path`` (a document or a directory of them) until Ctrl+C; see the module docstring."""
+    httpd = bind_server(port, events=EventHub() if watch else None)
+    site = PreviewSite(path, httpd)
+    watcher = SourceWatcher(path, interval) if watch else None
+    sources = find_sources(path)
+    if not sources:
+        logger.warning(f"{SYMBOLS['warning']} No .ormd files found in {path}")
+    site.build(sources)
+    logger.info(f"{SYMBOLS['info']} Serving {len(site.pages)} document(s)")
+
+    if watcher is not None:
+        logger.info(f"{SYMBOLS['info']} Watching {path} for changes ({watcher.backend})")
+        start_watching(site, watcher)
+
+    title = Path(path).name if site.is_dir else next((page.title for page in site.pages.values()), Path(path).name)
+    run_server(httpd, title, no_browser)
@@ -64,6 +64,7 @@ class Metrics:
     """Document metrics"""
     word_count: Optional[int] = None
     reading_time: Optional[str] = None
+    body_digest: Optional[str] = None
 
 
 @dataclass
@@ -247,6 +248,11 @@ class FrontMatterValidator:
             reading_time = metrics['reading_time']
             if not isinstance(reading_time, str):
                 self.errors.append("Field 'metrics.reading_time' must be a string")
+        
+        if 'body_digest' in metrics:
+            body_digest = metrics['body_digest']
+            if not isinstance(body_digest, str):
+                self.errors.append("Field 'metrics.body_digest' must be a string")
     
     def _validate_permissions(self, permissions: Any) -> None:
         """Validate permissions object"""
@@ -0,0 +1,77 @@
+"""Split a document body into sections that can be rendered one at a time.
+
+Python-Markdown renders a body as a whole, but only a few features reach
+from one part of it into another: footnotes, reference-style link and
+abbreviation definitions, a ``[TOC]`` marker, raw HTML blocks (which may
+span blank lines) and explicit element ids. A body that uses none of them
+renders to the same HTML section by section, provided it is only split
+before an ATX heading (``#`` at the start of a line) that follows a blank
+line and is not inside fenced code or an ``[[id]]`` reference.
+
+Heading ids are the exception: the ``toc`` extension numbers repeated
+headings (``parameters``, ``parameters_1``...) across the whole document.
+:meth:`.html_generator.MarkdownRenderer.convert_sections` renumbers them.
+"""
+
+import re
+from typing import Iterator, List
+
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+from .analyzer import LINK_REF
+
+# Appended to every section but the last: rendering it shows exactly what
+# separates the section's HTML from the next section's heading
+SECTION_END = 'ormd-section-end'
+SECTION_END_SOURCE = f'# {SECTION_END}\n'
+
+# Features whose rendering depends on more than the section they appear in
+_CROSS_SECTION = re.compile(
+    r'\[\^'                            # Footnotes
+    r'|^ {0,3}\[[^\]\n]*\]:'           # Reference-style link definitions
+    r'|^\*\['                          # Abbreviation definitions
+    r'|^[ \t]*\[TOC\][ \t]*$'          # Table of contents marker
+    r'|^[ \t]*<[A-Za-z!/?]'            # Raw HTML blocks
+    r'|\{:?[ \t]*#|\bid[ \t]*='        # Explicit ids (attribute lists, HTML)
+    r'|\r|' + SECTION_END,
+    re.MULTILINE,
+)
+_HEADING_LINE = re.compile(r'^#', re.MULTILINE)
+
+
+def can_split(body: str) -> bool:
+    """Whether ``body`` renders the same split into sections as it does whole."""
+    return _CROSS_SECTION.search(body) is None
+
+
+def section_starts(body: str) -> List[int]:
+    """Offsets at which ``body`` can be split; always starts with 0."""
+    if not can_split(body):
+        return [0]
+    # Spans a split would cut through
+    protected = [m.span() for m in FencedBlockPreprocessor.FENCED_BLOCK_RE.finditer(body)]
+    protected += [m.span() for m in LINK_REF.finditer(body)]
+    protected.sort()
+
+    starts = [0]
+    span_index = 0
+    for heading in _HEADING_LINE.finditer(body):
+        pos = heading.start()
+        if pos == 0:
+            continue
+        previous_line = body[body.rfind('\n', 0, pos - 1) + 1:pos - 1]
+        if previous_line.strip():
+            continue
+        while span_index < len(protected) and protected[span_index][1] <= pos:
+            span_index += 1
+        if span_index < len(protected) and protected[span_index][0] < pos:
+            continue
+        starts.append(pos)
+    return starts
+
+
+def iter_sections(body: str) -> Iterator[str]:
+    """Yield the sections of ``body``; joined, they give ``body`` back."""
+    starts = section_starts(body)
+    for start, end in zip(starts, starts[1:] + [len(body)]):
+        yield body[start:end]
@@ -1,73 +1,421 @@
-import webbrowser
+"""Local HTTP server behind ``ormd open`` and ``ormd edit``.
+
+Everything is served from memory: the page, any further files it needs
+(the body chunks of a large document) and the package's page assets under
+``/_ormd/``. Each response carries an ETag and is gzipped for clients that
+accept it; the server handles each connection on its own thread and keeps
+connections alive, so several tabs and parallel asset requests do not wait
+on each other.
+
+A server may also carry an :class:`EventHub`; pages then subscribe to a
+topic at ``/_ormd/events?topic=...`` and receive its events as
+Server-Sent Events (``ormd serve --watch`` pushes updates this way).
+
+The server behind ``ormd edit`` renders the editor's preview: the text
+POSTed to ``/_ormd/preview`` comes back as JSON with its body HTML. For a
+plain file it also carries the :class:`.editing.SourceFile` being edited:
+``/_ormd/source`` returns its text, and takes PATCH (line edits) and PUT
+(the whole text) requests that save it. Such a server listens on
+127.0.0.1 only and answers only requests addressed to
+``localhost`` or ``127.0.0.1`` (so pages on other sites cannot reach it by
+DNS rebinding), and every save must name the version it is based on.
+"""
+
+import gzip
+import hashlib
+import json
+import queue
 import threading
-import http.server
-import socketserver
-import tempfile
-import socket
-import os
-import click # Keep for SYMBOLS if logger doesn't handle them, or remove if SYMBOLS are removed/re-scoped
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from .utils import SYMBOLS # Assuming SYMBOLS still used. If logger handles icons, this might be removable.
-from .logger import logger # Added
-
-def _serve_and_open(html_content, port, no_browser, file_path, title):
-    """Start local server and optionally open browser"""
-    logger.debug("Creating temporary HTML file for serving.")
-    # Create temporary HTML file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-        f.write(html_content)
-        temp_html_path = f.name
-
-    # Find available port if not specified
-    if port == 0:
-        sock = socket.socket()
-        sock.bind(('', 0))
-        port = sock.getsockname()[1]
-        sock.close()
-
-    # Custom HTTP handler to serve our temporary file
-    class ORMDHandler(http.server.SimpleHTTPRequestHandler):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, directory=Path(temp_html_path).parent, **kwargs)
-
-        def log_message(self, format, *args):
-            # Suppress HTTP logs for cleaner output
-            return
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, unquote
+from .utils import SYMBOLS
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .editing import SourceFile
+
+# Page assets served from the package (or template directories)
+ASSET_PREFIX = '/_ormd/'
+EVENTS_PATH = ASSET_PREFIX + 'events'
+SOURCE_PATH = ASSET_PREFIX + 'source'
+PREVIEW_PATH = ASSET_PREFIX + 'preview'
+# Served besides the vendored scripts; not versioned, so revalidated by ETag
+_PAGE_ASSETS = ('ormd.css', 'ormd.js', 'ormd-live.js')
+_ASSET_TYPES = {'.css': 'text/css; charset=utf-8', '.js': 'text/javascript; charset=utf-8'}
+# Asset names include a version (or change with the package), so they can be cached for a year
+_ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Pages change when the document does: browsers must revalidate (cheaply, by ETag)
+_PAGE_CACHE_CONTROL = 'no-cache'
+_HTML_TYPE = 'text/html; charset=utf-8'
+_JSON_TYPE = 'application/json; charset=utf-8'
+_TEXT_TYPE = 'text/plain; charset=utf-8'
+# Smaller bodies are not worth compressing
+_GZIP_MIN_SIZE = 1024
+# Seconds between comments sent on an idle event stream, to notice closed pages
+_EVENT_KEEPALIVE = 15
+
 
+class Resource:
+    """A response body kept in memory, with its ETag and a lazily gzipped copy."""
+    __slots__ = ('body', 'content_type', 'cache_control', 'etag', '_gzipped', '_lock')
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str = _PAGE_CACHE_CONTROL):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._gzipped: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def html(cls, text: str) -> 'Resource':
+        return cls(text.encode('utf-8'), _HTML_TYPE)
+
+    @classmethod
+    def text(cls, text: str) -> 'Resource':
+        return cls(text.encode('utf-8'), _TEXT_TYPE)
+
+    @classmethod
+    def json(cls, data: Any) -> 'Resource':
+        return cls(json.dumps(data, default=str).encode('utf-8'), _JSON_TYPE)
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= _GZIP_MIN_SIZE
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            with self._lock:
+                if self._gzipped is None:
+                    self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+def _asset_response(name):
+    """``(body, content_type)`` of the served asset ``name``, or ``None``."""
+    from .template_cache import VENDOR_ASSETS, get_asset
+
+    if name not in VENDOR_ASSETS and name not in _PAGE_ASSETS:
+        return None
     try:
-        # Use a simpler approach with better interrupt handling
-        httpd = http.server.HTTPServer(("", port), ORMDHandler)
-        httpd.timeout = 0.5  # Short timeout for responsiveness
+        body = get_asset(name).encode('utf-8')
+    except (OSError, UnicodeDecodeError):
+        return None
+    return body, _ASSET_TYPES[Path(name).suffix]
+
+
+_assets: Dict[str, Resource] = {}
+
+
+def _asset_resource(name: str) -> Optional[Resource]:
+    resource = _assets.get(name)
+    if resource is None:
+        asset = _asset_response(name)
+        if asset is None:
+            return None
+        cache_control = _PAGE_CACHE_CONTROL if name in _PAGE_ASSETS else _ASSET_CACHE_CONTROL
+        resource = _assets.setdefault(name, Resource(asset[0], asset[1], cache_control))
+    return resource
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', 'x-gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class EventHub:
+    """Fans events out to the pages subscribed to each topic.
+
+    The last event of a topic is also sent to each new subscriber, so a page
+    that connects just after an update still sees it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List['queue.Queue']] = {}
+        self._last: Dict[str, bytes] = {}
+
+    def subscribe(self, topic: str) -> 'queue.Queue':
+        events: 'queue.Queue' = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(events)
+            if topic in self._last:
+                events.put(self._last[topic])
+        return events
+
+    def unsubscribe(self, topic: str, events: 'queue.Queue') -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(topic, [])
+            if events in subscribers:
+                subscribers.remove(events)
+            if not subscribers:
+                self._subscribers.pop(topic, None)
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(topic, []))
+
+    def publish(self, topic: str, event: str, data: Any) -> None:
+        """Send ``data`` (JSON-encoded) as an ``event`` to every subscriber of ``topic``."""
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+        with self._lock:
+            self._last[topic] = message
+            for events in self._subscribers.get(topic, []):
+                events.put(message)
+
+
+class ORMDRequestHandler(BaseHTTPRequestHandler):
+    """Serves :attr:`ORMDServer.resources`, the ``/_ormd/`` assets and event streams."""
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    timeout = 30  # Close idle keep-alive connections
+
+    def do_GET(self):
+        if not self._check_host():
+            return
+        path, _, query = self.path.partition('?')
+        if path == EVENTS_PATH and self.server.events is not None:
+            self._stream_events(parse_qs(query).get('topic', [''])[0])
+            return
+        self._send(self._resource(), head=False)
+
+    def do_HEAD(self):
+        if self._check_host():
+            self._send(self._resource(), head=True)
 
-        url = f"http://localhost:{port}/{Path(temp_html_path).name}"
+    def do_PATCH(self):
+        self._save_source(replace=False)
 
-        logger.info(f"{SYMBOLS['success']} Opening '{title}' in browser")
-        logger.info(f"{SYMBOLS['info']} Server running at {url}")
-        logger.info(f"{SYMBOLS['info']} Press Ctrl+C to stop")
+    def do_PUT(self):
+        self._save_source(replace=True)
 
-        if not no_browser:
-            # Open browser after short delay to ensure server is ready
-            threading.Timer(1.0, lambda: webbrowser.open(url)).start()
+    def do_POST(self):
+        self._render_preview()
 
-        # Simple serving loop that's easier to interrupt
+    def _check_host(self) -> bool:
+        """On an ``ormd edit`` server, refuse requests not addressed to this machine."""
+        if not self.server.local_only:
+            return True
+        port = self.server.server_address[1]
+        if self.headers.get('Host', '') in (f'localhost:{port}', f'127.0.0.1:{port}'):
+            return True
+        self._refuse(403)
+        return False
+
+    def _refuse(self, code: int) -> None:
+        """Answer with error ``code`` without reading the request body."""
+        self.close_connection = True  # The unread body would be read as the next request
+        self.send_error(code)
+
+    def _resource(self) -> Optional[Resource]:
+        path = unquote(self.path.split('?', 1)[0].split('#', 1)[0])
+        if path == SOURCE_PATH and self.server.source is not None:
+            text, _ = self.server.source.read()
+            return Resource.text(text)
+        if path.startswith(ASSET_PREFIX):
+            return _asset_resource(path[len(ASSET_PREFIX):])
+        path = '/index.html' if path == '/' else path
+        resource = self.server.resources.get(path)
+        if resource is None and self.server.pages is not None:
+            resource = self.server.pages(path)
+        return resource
+
+    def _send(self, resource: Optional[Resource], head: bool) -> None:
+        if resource is None:
+            self.send_error(404)
+            return
+        not_modified = resource.etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        body = resource.body
+        compressed = resource.compressible and _accepts_gzip(self.headers.get('Accept-Encoding', ''))
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', resource.etag)
+        self.send_header('Cache-Control', resource.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+        if compressed:
+            body = resource.gzipped()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', resource.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Any) -> None:
+        body = json.dumps(data, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', _JSON_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _save_source(self, replace: bool) -> None:
+        from .editing import EditConflict, LineEdit
+
+        source = self.server.source
+        if self.path.split('?', 1)[0] != SOURCE_PATH or source is None:
+            self._refuse(404)
+            return
+        if not self._check_host():
+            return
+        if not self._check_origin():
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            if replace:
+                text, base = body.decode('utf-8'), self.headers.get('If-Match')
+            else:
+                request = json.loads(body)
+                if not isinstance(request, dict) or not isinstance(request.get('edits'), list):
+                    raise ValueError("Expected {\"base\": version, \"edits\": [...]}")
+                edits, base = [LineEdit.from_json(edit) for edit in request['edits']], request.get('base')
+            if not base:
+                # Saving without a version would overwrite changes made on disk unseen
+                where = 'an If-Match header' if replace else "'base'"
+                self._send_json(428, {'error': f"A save must name the version it is based on in {where}"})
+                return
+            result = source.replace(text, base) if replace else source.patch(base, edits)
+        except EditConflict as e:
+            self._send_json(409, {'error': str(e), 'version': e.version})
+        except ValueError as e:  # Includes malformed JSON and UTF-8
+            self._send_json(400, {'error': str(e)})
+        except OSError as e:
+            logger.error(f"{SYMBOLS['error']} Failed to save {source.path}: {str(e)}")
+            self._send_json(500, {'error': f"Failed to save: {e}"})
+        else:
+            logger.info(f"{SYMBOLS['success']} Saved {source.path}")
+            self._send_json(200, result)
+
+    def _check_origin(self) -> bool:
+        """Only the page itself may save or render; browsers send Origin with cross-site requests."""
+        origin = self.headers.get('Origin')
+        if origin is not None and origin != f"http://{self.headers.get('Host', '')}":
+            self._refuse(403)
+            return False
+        return True
+
+    def _render_preview(self) -> None:
+        preview = self.server.preview
+        if self.path.split('?', 1)[0] != PREVIEW_PATH or preview is None:
+            self._refuse(404)
+            return
+        if not self._check_host() or not self._check_origin():
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
         try:
+            result = preview(body.decode('utf-8'))
+        except ValueError as e:  # Includes malformed UTF-8
+            self._send_json(400, {'error': str(e)})
+        else:
+            self._send_json(200, result)
+
+    def _stream_events(self, topic: str) -> None:
+        hub = self.server.events
+        events = hub.subscribe(topic)
+        self.close_connection = True  # The stream ends only when the connection does
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(b'retry: 1000\n\n')
+            self.wfile.flush()
             while True:
-                httpd.handle_request()
-        except KeyboardInterrupt:
-            logger.info(f"\n{SYMBOLS['info']} Stopping server...")
+                try:
+                    message = events.get(timeout=_EVENT_KEEPALIVE)
+                except queue.Empty:
+                    message = b': keep-alive\n\n'
+                self.wfile.write(message)
+                self.wfile.flush()
+        except OSError:
+            pass  # The page went away
         finally:
-            httpd.server_close()
+            hub.unsubscribe(topic, events)
+
+    def log_message(self, format, *args):
+        # Suppress HTTP logs for cleaner output
+        return
+
+
+class ORMDServer(ThreadingHTTPServer):
+    """A threaded HTTP server for in-memory ``resources`` (URL path to :class:`Resource`).
+
+    ``resources`` may be replaced entry by entry while the server runs.
+    Paths not among them are passed to ``pages``, if given, which returns a
+    :class:`Resource` (rendering it on demand) or ``None``. ``preview``, if
+    given, turns the text POSTed to :data:`PREVIEW_PATH` into a JSON answer.
+    """
+    daemon_threads = True
 
+    def __init__(self, address, resources: Optional[Dict[str, Resource]] = None,
+                 events: Optional[EventHub] = None, source: Optional['SourceFile'] = None,
+                 pages: Optional[Callable[[str], Optional[Resource]]] = None,
+                 preview: Optional[Callable[[str], Any]] = None):
+        super().__init__(address, ORMDRequestHandler)
+        self.resources: Dict[str, Resource] = dict(resources or {})
+        self.events = events
+        self.source = source
+        self.pages = pages
+        self.preview = preview
+
+    @property
+    def local_only(self) -> bool:
+        """Whether this is an ``ormd edit`` server, which only this machine may use."""
+        return self.source is not None or self.preview is not None
+
+
+def bind_server(port, resources=None, events=None, source=None, pages=None, preview=None) -> ORMDServer:
+    """Create an :class:`ORMDServer` on ``port`` (0 for a free one), exiting with a message on failure."""
+    try:
+        # A server that writes files or renders posted text is only reachable from this machine
+        local_only = source is not None or preview is not None
+        return ORMDServer(('127.0.0.1' if local_only else '', port), resources, events, source, pages, preview)
     except OSError as e:
         if "Address already in use" in str(e):
             logger.error(f"{SYMBOLS['error']} Port {port} is already in use. Try a different port with --port")
         else:
             logger.error(f"{SYMBOLS['error']} Failed to start server: {str(e)}")
         exit(1) # Consider if exit is appropriate here or if exception should bubble up
+
+
+def run_server(httpd: ORMDServer, title: str, no_browser: bool) -> None:
+    """Announce ``httpd``, optionally open its root page in a browser, and serve until Ctrl+C."""
+    host, port = httpd.server_address[:2]
+    url = f"http://{'127.0.0.1' if host == '127.0.0.1' else 'localhost'}:{port}/"
+
+    logger.info(f"{SYMBOLS['success']} Opening '{title}' in browser")
+    logger.info(f"{SYMBOLS['info']} Server running at {url}")
+    logger.info(f"{SYMBOLS['info']} Press Ctrl+C to stop")
+
+    if not no_browser:
+        # Open browser after short delay to ensure server is ready
+        threading.Timer(1.0, lambda: webbrowser.open(url)).start()
+
+    try:
+        httpd.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        logger.info(f"\n{SYMBOLS['info']} Stopping server...")
     finally:
-        # Cleanup temporary file
-        logger.debug(f"Attempting to clean up temporary file: {temp_html_path}")
-        try:
-            os.unlink(temp_html_path)
-        except:
-            pass # Keep pass if silent failure on unlink is acceptable
+        httpd.server_close()
+
+
+def _serve_and_open(html_content, port, no_browser, file_path, title, files=None, source=None, preview=None):
+    """Start local server and optionally open browser
+
+    ``files`` maps further URL paths (relative to the page, e.g. the body
+    chunks of a large document) to their text; ``source`` is the
+    :class:`.editing.SourceFile` the page saves to and ``preview`` renders
+    the editor's preview (see :class:`ORMDServer`).
+    """
+    resources = {'/index.html': Resource.html(html_content)}
+    for name, text in (files or {}).items():
+        resources['/' + name.lstrip('/')] = Resource.html(text)
+    run_server(bind_server(port, resources, source=source, preview=preview), title, no_browser)
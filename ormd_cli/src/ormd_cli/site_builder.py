@@ -0,0 +1,281 @@
+"""Render a tree of ORMD documents into a static HTML site.
+
+``ormd render --site SRC_DIR -o OUT_DIR`` mirrors the source tree, so
+``guide/intro.ormd`` becomes ``guide/intro.html``. The stylesheet and script
+every page uses are written once to ``_ormd/`` and linked rather than
+inlined. Links between documents become relative URLs:
+
+* a ``to:`` target naming another ``.ormd`` file (``intro.ormd#setup``, or
+  ``/guide/intro.ormd`` from the site root) points at its page;
+* an ``[[id]]`` with no link defined in the document points at the document
+  whose path without extension is ``id`` (``[[guide/intro]]``), or whose
+  file name is, if only one document has it (``[[intro#setup]]``).
+
+With ``raw_source='external'`` (``--raw-source external``) each page's
+source is written next to it as ``<page>.ormd.txt`` and fetched by the page
+when its source pane is opened.
+
+Builds are incremental. ``.ormd-site.json`` in OUT_DIR records the mtime,
+size and content digest of every source and how its cross-document ids
+resolved. A page is rendered again only if its source changed, one of its
+ids now resolves differently, its output is missing, or the renderer or
+page template changed; pages whose source is gone are removed.
+"""
+
+import hashlib
+import json
+import posixpath
+import re
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .batch import collect_ormd_files, run_parallel
+from .cache import file_digest
+from .utils import atomic_open
+
+MANIFEST_NAME = '.ormd-site.json'
+ASSET_DIR = '_ormd'
+SITE_ASSETS = ('ormd.css', 'ormd.js')
+SITE_FORMAT = 1
+
+# Modules whose code determines the rendered pages
+_RENDER_MODULES = ('html_generator.py', 'highlight.py', 'parser.py', 'analyzer.py', 'links.py', 'sections.py',
+                   'template_cache.py', 'packager.py', 'site_builder.py')
+_URL_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:')
+
+
+def page_path(source: str) -> str:
+    """Site-relative page for a site-relative source path."""
+    return posixpath.splitext(source)[0] + '.html'
+
+
+def site_fingerprint(raw_source: str = 'inline') -> str:
+    """Digest of everything besides the sources that shapes the pages."""
+    import markdown
+    import pygments
+    from .highlight import guess_lang_enabled
+    from .template_cache import get_template
+
+    settings = [SITE_FORMAT, markdown.__version__, pygments.__version__, guess_lang_enabled(), raw_source]
+    digest = hashlib.blake2b(':'.join(map(str, settings)).encode(), digest_size=16)
+    package_dir = Path(__file__).parent
+    for name in _RENDER_MODULES:
+        digest.update((package_dir / name).read_bytes())
+    digest.update(get_template('view_template.html').source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SiteIndex:
+    """Where each document of the site is published, for cross-document links."""
+    __slots__ = ('pages', 'by_name')
+
+    def __init__(self, sources: List[str]):
+        self.pages: Dict[str, str] = {}
+        names: Dict[str, List[str]] = {}
+        for source in sources:
+            key = posixpath.splitext(source)[0]
+            self.pages[key] = page_path(source)
+            names.setdefault(posixpath.basename(key), []).append(key)
+        self.by_name = {name: keys[0] for name, keys in names.items() if len(keys) == 1}
+
+    def document_page(self, link_id: str) -> Optional[str]:
+        """Site-relative page (plus any ``#fragment``) of the document ``link_id`` names."""
+        key, sep, fragment = link_id.partition('#')
+        key = key.strip('/')
+        if key not in self.pages:
+            key = self.by_name.get(key)
+            if key is None:
+                return None
+        return self.pages[key] + sep + fragment
+
+
+class PageLinks:
+    """Resolves link targets for one page, remembering which ids it looked up."""
+
+    def __init__(self, page: str, index: SiteIndex):
+        self.page = page
+        self.index = index
+        self.resolved: Dict[str, Optional[str]] = {}
+        self._dir = posixpath.dirname(page) or '.'
+
+    def relative(self, site_path: str) -> str:
+        """URL of ``site_path`` (relative to the site root) from this page."""
+        path, sep, fragment = site_path.partition('#')
+        url = posixpath.relpath(path, self._dir) if path else ''
+        return url + sep + fragment
+
+    def target_url(self, to: Any) -> Any:
+        """Point ``to:`` targets naming another ``.ormd`` file at its page."""
+        if not isinstance(to, str) or to.startswith(('#', '//')) or _URL_SCHEME.match(to):
+            return to
+        path, sep, fragment = to.partition('#')
+        if not path.lower().endswith('.ormd'):
+            return to
+        if path.startswith('/'):
+            return self.relative(page_path(path.lstrip('/')) + sep + fragment)
+        return page_path(path) + sep + fragment
+
+    def url_for(self, link_id: str) -> Optional[str]:
+        page = self.index.document_page(link_id)
+        return self.relative(page) if page is not None else None
+
+    def document_url(self, link_id: str) -> Optional[str]:
+        """URL of the document an otherwise undefined ``[[id]]`` names, if any."""
+        url = self.url_for(link_id)
+        self.resolved[link_id] = url
+        return url
+
+
+class SiteBuild(NamedTuple):
+    """What one ``build_site`` run did, by site-relative source path."""
+    rendered: List[str]
+    up_to_date: List[str]
+    removed: List[str]
+    failed: List[Tuple[str, str]]
+
+
+def _write_text(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_open(path, newline='') as f:
+        f.write(text)
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def _render_page(source: str, src_dir: str, out_dir: str, index: SiteIndex, template_dirs: List[str],
+                 raw_source: str = 'inline') -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    from .html_generator import get_render_pipeline, raw_source_path
+    from .packager import ORMDPackager
+    from . import template_cache
+
+    # Spawned workers do not inherit the parent's --template-dir settings
+    missing = [d for d in map(Path, template_dirs) if d not in template_cache.template_dirs()]
+    if missing:
+        template_cache.add_template_dirs(missing)
+
+    src_path = Path(src_dir, source)
+    page = page_path(source)
+    try:
+        stat = src_path.stat()
+        digest = file_digest(src_path)
+        raw_ormd, meta = ORMDPackager().read_source(str(src_path))
+        links = PageLinks(page, index)
+        pipeline = get_render_pipeline()
+        document = pipeline.prepare_linked(raw_ormd, links.target_url, links.document_url)
+        source_path = raw_source_path(Path(out_dir, page))
+        if raw_source == 'external':
+            _write_text(source_path, raw_ormd)
+        else:
+            _remove(source_path)
+        html = pipeline.site_html(document, links.relative(ASSET_DIR) + '/', meta, raw_source, source_path.name)
+        _write_text(Path(out_dir, page), html)
+    except Exception as e:
+        return source, None, str(e)
+    entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'digest': digest, 'refs': links.resolved}
+    return source, entry, None
+
+
+def _is_current(entry: Dict[str, Any], src_path: Path, out_path: Path, links: PageLinks,
+                raw_source: str = 'inline') -> bool:
+    from .html_generator import raw_source_path
+
+    try:
+        stat = src_path.stat()
+    except OSError:
+        return False
+    if not out_path.exists():
+        return False
+    if raw_source == 'external' and not raw_source_path(out_path).exists():
+        return False
+    if (stat.st_mtime_ns, stat.st_size) != (entry['mtime_ns'], entry['size']):
+        # Touched or rewritten: only content changes count
+        if stat.st_size != entry['size'] or file_digest(src_path) != entry['digest']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+    return all(links.url_for(link_id) == url for link_id, url in entry['refs'].items())
+
+
+def _load_manifest(out_dir: Path) -> Dict[str, Any]:
+    try:
+        manifest = json.loads((out_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) and manifest.get('format') == SITE_FORMAT else {}
+
+
+def _write_assets(out_dir: Path) -> None:
+    from .template_cache import get_asset
+
+    for name in SITE_ASSETS:
+        path = out_dir / ASSET_DIR / name
+        text = get_asset(name)
+        try:
+            if path.read_text(encoding='utf-8') == text:
+                continue
+        except OSError:
+            pass
+        _write_text(path, text)
+
+
+def build_site(src_dir: str, out_dir: str, jobs: Optional[int] = None, force: bool = False,
+               raw_source: str = 'inline') -> SiteBuild:
+    """Render every ``*.ormd`` under ``src_dir`` into ``out_dir``; see the module docstring.
+
+    With ``force`` every page is rendered again. ``raw_source`` is one of
+    :data:`.html_generator.RAW_SOURCE_MODES`.
+    """
+    from .html_generator import RAW_SOURCE_MODES, raw_source_path
+    from .template_cache import template_dirs
+
+    if raw_source not in RAW_SOURCE_MODES:
+        raise ValueError(f"Unknown raw_source {raw_source!r}; expected one of {', '.join(RAW_SOURCE_MODES)}")
+
+    src_root, out_root = Path(src_dir), Path(out_dir)
+    sources = [Path(path).relative_to(src_root).as_posix() for path in collect_ormd_files([src_dir])]
+    index = SiteIndex(sources)
+    fingerprint = site_fingerprint(raw_source)
+
+    manifest = _load_manifest(out_root)
+    previous: Dict[str, Dict[str, Any]] = manifest.get('pages', {})
+    reusable = previous if manifest.get('fingerprint') == fingerprint and not force else {}
+
+    stale: List[str] = []
+    pages: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        entry = reusable.get(source)
+        if entry is not None and _is_current(entry, src_root / source, out_root / page_path(source),
+                                             PageLinks(page_path(source), index), raw_source):
+            pages[source] = entry
+        else:
+            stale.append(source)
+    up_to_date = list(pages)
+
+    out_root.mkdir(parents=True, exist_ok=True)
+    _write_assets(out_root)
+
+    render = partial(_render_page, src_dir=src_dir, out_dir=out_dir, index=index,
+                     template_dirs=[str(d) for d in template_dirs()], raw_source=raw_source)
+    rendered, failed = [], []
+    for source, entry, error in run_parallel(render, stale, jobs):
+        if entry is None:
+            failed.append((source, error))
+        else:
+            pages[source] = entry
+            rendered.append(source)
+
+    removed = sorted(set(previous) - set(sources))
+    for source in removed:
+        _remove(out_root / page_path(source))
+        _remove(raw_source_path(out_root / page_path(source)))
+
+    _write_text(out_root / MANIFEST_NAME, json.dumps(
+        {'format': SITE_FORMAT, 'fingerprint': fingerprint, 'pages': dict(sorted(pages.items()))},
+        separators=(',', ':'),
+    ))
+    return SiteBuild(rendered, up_to_date, removed, failed)
@@ -0,0 +1,76 @@
+"""Start-up import profiling for ``ormd --startup-profile``.
+
+The requested command is re-run in a child interpreter with ``-X importtime``
+so that every import is measured, including the ones the command itself
+triggers lazily. The command's own output passes straight through and a
+per-module summary is printed to stderr afterwards.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Sequence
+
+import click
+
+# "import time:   self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+_IMPORTTIME_HEADER = 'import time: self [us]'
+
+_RUN_CLI = "import sys; from ormd_cli.main import cli; cli(sys.argv[1:], prog_name='ormd')"
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime_line(line: str):
+    """Parse one ``-X importtime`` line, or return ``None`` for other output."""
+    match = _IMPORTTIME_LINE.match(line)
+    if match is None:
+        return None
+    self_us, cumulative_us, indent, module = match.groups()
+    return ImportTiming(module, int(self_us), int(cumulative_us), len(indent) // 2)
+
+
+def format_report(timings: List[ImportTiming], args: Sequence[str], top: int = 20) -> str:
+    """Summarise import timings, slowest (cumulative) first."""
+    total_ms = sum(t.self_us for t in timings) / 1000
+    command = ' '.join(['ormd', *args])
+    lines = [
+        f"Startup import profile for `{command}`: {total_ms:.1f} ms across {len(timings)} modules",
+        f"{'cumulative':>12} {'self':>10}  module",
+    ]
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{timing.cumulative_us / 1000:>9.1f} ms {timing.self_us / 1000:>7.1f} ms  {timing.module}")
+    return '\n'.join(lines)
+
+
+def profile_command(args: Sequence[str], top: int = 20) -> int:
+    """Run ``ormd ARGS`` under ``-X importtime``, report, and return its exit code."""
+    env = dict(os.environ)
+    # Make sure the child imports this same copy of the package
+    package_root = str(Path(__file__).resolve().parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+
+    timings = []
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', _RUN_CLI, *args],
+        stderr=subprocess.PIPE, env=env, text=True, errors='replace',
+    )
+    for line in process.stderr:
+        timing = parse_importtime_line(line)
+        if timing is not None:
+            timings.append(timing)
+        elif not line.startswith(_IMPORTTIME_HEADER):
+            sys.stderr.write(line)
+    returncode = process.wait()
+
+    click.echo(format_report(timings, args, top), err=True)
+    return returncode
@@ -0,0 +1,162 @@
+"""Process-wide cache of compiled HTML templates.
+
+Templates use ``str.format`` syntax (``{name}`` slots, ``{{``/``}}`` for
+literal braces). Each one is read and parsed once into a list of static
+chunks with the slot positions recorded, so filling it is a single
+``''.join``. Entries are keyed on the file's modification time and size,
+so an edited template is picked up by the next render without a restart.
+
+Templates are looked up in ``$ORMD_TEMPLATE_PATH`` (``os.pathsep``
+separated), then in directories added with :func:`add_template_dirs`
+(``ormd --template-dir``), then in the package's own ``templates/``. The
+stylesheet and script shared by every page (``ormd.css``, ``ormd.js``) are
+found the same way but used as plain text, see :func:`get_asset`.
+"""
+
+import os
+import string
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+TEMPLATE_PATH_ENV = 'ORMD_TEMPLATE_PATH'
+BUILTIN_TEMPLATE_DIR = Path(__file__).parent / 'templates'
+
+# Third-party scripts the pages use, looked up like templates (see
+# templates/vendor/README.md). Names carry the version.
+VENDOR_ASSETS = ('vendor/js-yaml-4.1.0.min.js',)
+
+
+class CompiledTemplate:
+    """A template split into static chunks and named slots."""
+    __slots__ = ('source', 'path', '_parts', '_slots')
+
+    def __init__(self, source: str, path: Optional[Path] = None):
+        self.source = source
+        self.path = path
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, str]] = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if not field.isidentifier() or format_spec or conversion:
+                raise ValueError(f"Unsupported template slot {{{field}}} in {path or 'template'}: "
+                                 "only plain {name} slots are allowed")
+            self._slots.append((len(self._parts), field))
+            self._parts.append('')
+
+    @property
+    def slot_names(self) -> List[str]:
+        return [name for _, name in self._slots]
+
+    def fill(self, **values) -> str:
+        """Substitute ``values`` into the slots, like ``source.format(**values)``."""
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            value = values[name]
+            parts[index] = value if isinstance(value, str) else str(value)
+        return ''.join(parts)
+
+    def iter_fill(self, **values) -> Iterator[str]:
+        """Like :meth:`fill`, but yield the output piece by piece.
+
+        A value may also be an iterable of strings, which is consumed as
+        its slot is reached, so it should fill only one slot.
+        """
+        slots = dict(self._slots)
+        for index, part in enumerate(self._parts):
+            if index not in slots:
+                yield part
+                continue
+            value = values[slots[index]]
+            if isinstance(value, str):
+                yield value
+            elif hasattr(value, '__iter__'):
+                yield from value
+            else:
+                yield str(value)
+
+
+class TemplateCache:
+    """Finds templates by name and keeps them compiled until their file changes."""
+
+    def __init__(self, template_dirs: Iterable[Path] = ()):
+        self._extra_dirs: List[Path] = [Path(d) for d in template_dirs]
+        self._entries: Dict[Tuple[str, bool], Tuple[Path, int, int, Union[CompiledTemplate, str]]] = {}
+        self._lock = threading.Lock()
+
+    def add_template_dirs(self, template_dirs: Iterable[Path]) -> None:
+        """Search ``template_dirs`` before the built-in templates."""
+        with self._lock:
+            self._extra_dirs.extend(Path(d) for d in template_dirs)
+            self._entries.clear()
+
+    def set_template_dirs(self, template_dirs: Iterable[Path]) -> None:
+        """Search ``template_dirs``, replacing those added so far."""
+        with self._lock:
+            self._extra_dirs = [Path(d) for d in template_dirs]
+            self._entries.clear()
+
+    @property
+    def template_dirs(self) -> List[Path]:
+        """Directories added with :meth:`add_template_dirs`."""
+        return list(self._extra_dirs)
+
+    def search_dirs(self) -> List[Path]:
+        env_dirs = [Path(d) for d in os.environ.get(TEMPLATE_PATH_ENV, '').split(os.pathsep) if d]
+        return env_dirs + self._extra_dirs + [BUILTIN_TEMPLATE_DIR]
+
+    def get(self, name: str) -> CompiledTemplate:
+        """Return the compiled template ``name``; raise ``FileNotFoundError`` if none exists."""
+        return self._load(name, compiled=True)
+
+    def get_text(self, name: str) -> str:
+        """Return the contents of ``name`` without compiling it."""
+        return self._load(name, compiled=False)
+
+    def _load(self, name: str, compiled: bool):
+        for template_dir in self.search_dirs():
+            path = template_dir / name
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entry = self._entries.get((name, compiled))
+            if entry is not None and entry[:3] == (path, stat.st_mtime_ns, stat.st_size):
+                return entry[3]
+            source = path.read_text(encoding='utf-8')
+            value = CompiledTemplate(source, path) if compiled else source
+            with self._lock:
+                self._entries[(name, compiled)] = (path, stat.st_mtime_ns, stat.st_size, value)
+            return value
+        raise FileNotFoundError(f"Template {name!r} not found in: {', '.join(map(str, self.search_dirs()))}")
+
+
+_cache = TemplateCache()
+
+
+def get_template(name: str) -> CompiledTemplate:
+    """Return the compiled template ``name`` from the process-wide cache."""
+    return _cache.get(name)
+
+
+def get_asset(name: str) -> str:
+    """Return the text of the shared page asset ``name`` (e.g. ``ormd.css``)."""
+    return _cache.get_text(name)
+
+
+def add_template_dirs(template_dirs: Iterable[Path]) -> None:
+    """Add user template directories to the process-wide cache."""
+    _cache.add_template_dirs(template_dirs)
+
+
+def set_template_dirs(template_dirs: Iterable[Path]) -> None:
+    """Replace the user template directories of the process-wide cache."""
+    _cache.set_template_dirs(template_dirs)
+
+
+def template_dirs() -> List[Path]:
+    """User template directories added to the process-wide cache."""
+    return _cache.template_dirs
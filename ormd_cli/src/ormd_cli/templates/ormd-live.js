@@ -0,0 +1,100 @@
+// Live preview for `ormd serve --watch`: applies the updates the server pushes to this page.
+//
+// An `update` lists the page's sections (by key) in their new order, with the
+// HTML of the sections that are new; sections the page already shows are kept
+// as they are. The document source is left out: the raw pane fetches it from
+// `update.source` when it is next shown. A page that missed an update reloads
+// instead.
+(function() {
+  const script = document.currentScript;
+  const page = script.dataset.page;
+  let version = script.dataset.version;
+  let title = script.dataset.title;
+
+  function showStatus(message) {
+    let banner = document.getElementById('ormd-live-status');
+    if (!message) {
+      if (banner) banner.remove();
+      return;
+    }
+    if (!banner) {
+      banner = document.createElement('div');
+      banner.id = 'ormd-live-status';
+      banner.style.cssText = 'position:fixed;bottom:0;left:0;right:0;padding:0.5em 1em;' +
+        'background:#7a1f1f;color:#fff;font-family:monospace;white-space:pre-wrap;z-index:1000;';
+      document.body.appendChild(banner);
+    }
+    banner.textContent = message;
+  }
+
+  function applyUpdate(update) {
+    const main = document.getElementById('main-doc');
+    const current = new Map();
+    Array.from(main.children).forEach(el => {
+      if (el.dataset.key) current.set(el.dataset.key, el);
+    });
+    const sections = update.keys.map(key => {
+      let section = current.get(key);
+      if (!section) {
+        section = document.createElement('div');
+        section.className = 'ormd-section';
+        section.dataset.key = key;
+        section.innerHTML = update.html[key];
+      }
+      return section;
+    });
+    main.replaceChildren(...sections);
+
+    if (title !== undefined) {
+      document.title = document.title.replace(title, update.title);
+      title = update.title;
+    }
+    const raw = document.getElementById('raw-content');
+    if (raw) {
+      raw.dataset.src = update.source;
+      if (typeof loadRawSource === 'function') {
+        rawLoaded = false;
+        loadRawSource();
+      } else {
+        // A custom template without ormd.js
+        fetch(update.source).then(response => response.text()).then(text => {
+          raw.textContent = text;
+        });
+      }
+    }
+    if (typeof renderGraph === 'function') {
+      ormdLinksData = update.links;
+      if (graphRendered) {
+        document.getElementById('graph-container').innerHTML = '';
+        renderGraph(update.links);
+      }
+    }
+  }
+
+  const events = new EventSource('/_ormd/events?topic=' + encodeURIComponent(page));
+
+  events.addEventListener('update', e => {
+    const update = JSON.parse(e.data);
+    if (update.version === version) return;
+    if (update.previous !== version) {
+      location.reload();
+      return;
+    }
+    applyUpdate(update);
+    version = update.version;
+    showStatus('');
+  });
+
+  events.addEventListener('reload', e => {
+    if (JSON.parse(e.data).version !== version) location.reload();
+  });
+
+  events.addEventListener('failed', e => {
+    const failure = JSON.parse(e.data);
+    if (failure.version === version) showStatus('Render failed: ' + failure.error);
+  });
+
+  events.addEventListener('removed', e => {
+    if (JSON.parse(e.data).version === version) showStatus('The source file was removed.');
+  });
+})();
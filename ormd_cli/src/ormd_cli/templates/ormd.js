@@ -0,0 +1,273 @@
+// Sidebar toggle logic
+const sidebar = document.getElementById('sidebar');
+const collapseBtn = document.getElementById('collapse-btn');
+collapseBtn.onclick = () => {
+  sidebar.classList.toggle('collapsed');
+  loadRawSource();
+};
+
+// With --raw-source=external the source is fetched the first time its pane is shown
+const rawContent = document.getElementById('raw-content');
+let rawLoaded = !(rawContent && rawContent.dataset.src);
+
+function loadRawSource() {
+  if (rawLoaded || sidebar.classList.contains('collapsed') ||
+      !document.getElementById('panel-raw').classList.contains('active')) {
+    return;
+  }
+  rawLoaded = true;
+  rawContent.textContent = 'Loading…';
+  fetch(rawContent.dataset.src)
+    .then(response => {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(text => {
+      rawContent.textContent = text;
+    })
+    .catch(() => {
+      // e.g. pages opened from disk, where browsers refuse to fetch
+      const link = document.createElement('a');
+      link.href = rawContent.dataset.src;
+      link.textContent = rawContent.dataset.src;
+      rawContent.textContent = 'Could not load the source: ';
+      rawContent.appendChild(link);
+    });
+}
+
+// Panel switching logic
+const panels = ['raw', 'graph', 'history'];
+let ormdLinksData = null;
+let graphRendered = false;
+
+panels.forEach(name => {
+  document.getElementById('toggle-' + name).onclick = () => {
+    panels.forEach(n => {
+      document.getElementById('toggle-' + n).classList.remove('active');
+      document.getElementById('panel-' + n).classList.remove('active');
+    });
+    document.getElementById('toggle-' + name).classList.add('active');
+    document.getElementById('panel-' + name).classList.add('active');
+
+    if (name === 'raw') {
+      loadRawSource();
+    }
+
+    // Render the graph when the graph panel is activated
+    if (name === 'graph' && ormdLinksData && !graphRendered) {
+      const gc = document.getElementById('graph-container');
+      gc.innerHTML = '';
+      renderGraph(ormdLinksData);
+      graphRendered = true;
+    }
+  };
+});
+
+// Smooth scrolling for anchor links
+document.addEventListener('click', function(e) {
+  if (e.target.tagName === 'A' && e.target.getAttribute('href').startsWith('#')) {
+    e.preventDefault();
+    const targetId = e.target.getAttribute('href').substring(1);
+    loadChunksUpTo(targetId).then(() => {
+      const targetElement = document.getElementById(targetId);
+      if (targetElement) {
+        targetElement.scrollIntoView({ behavior: 'smooth' });
+        // Highlight the target briefly
+        targetElement.style.backgroundColor = '#004080';
+        setTimeout(() => {
+          targetElement.style.backgroundColor = '';
+        }, 1000);
+      }
+    });
+  }
+});
+
+// Large documents opened with `ormd open` arrive as a first chunk plus
+// placeholders; each placeholder is fetched when scrolled near, in order
+const chunkLoads = new Map();
+
+function loadChunk(chunk) {
+  if (!chunkLoads.has(chunk)) {
+    chunkLoads.set(chunk, fetch(chunk.dataset.src)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      })
+      .then(html => {
+        chunk.innerHTML = html;
+        chunk.classList.remove('ormd-chunk-pending');
+      })
+      .catch(() => {
+        chunk.textContent = 'Could not load this part of the document.';
+        chunk.classList.remove('ormd-chunk-pending');
+      }));
+  }
+  return chunkLoads.get(chunk);
+}
+
+function pendingChunks() {
+  return Array.from(document.querySelectorAll('.ormd-chunk-pending'));
+}
+
+// Load every chunk up to the one holding the heading `id`, so the page
+// above it has its final layout when it is scrolled to
+function loadChunksUpTo(id) {
+  const pending = pendingChunks();
+  const index = pending.findIndex(chunk => chunk.dataset.ids.split(' ').includes(id));
+  return Promise.all(pending.slice(0, index + 1).map(loadChunk));
+}
+
+if (pendingChunks().length && 'IntersectionObserver' in window) {
+  const chunkObserver = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+      if (entry.isIntersecting) {
+        chunkObserver.unobserve(entry.target);
+        loadChunk(entry.target).then(observeNextChunk);
+      }
+    });
+  }, { rootMargin: '100% 0px' });
+
+  function observeNextChunk() {
+    const next = pendingChunks().find(chunk => !chunkLoads.has(chunk));
+    if (next) {
+      chunkObserver.observe(next);
+    }
+  }
+
+  observeNextChunk();
+} else {
+  pendingChunks().forEach(loadChunk);
+}
+
+if (location.hash) {
+  const hashId = decodeURIComponent(location.hash.substring(1));
+  loadChunksUpTo(hashId).then(() => {
+    const target = document.getElementById(hashId);
+    if (target) {
+      target.scrollIntoView();
+    }
+  });
+}
+
+// Document graph: a small force-directed layout drawn as SVG, so the page
+// needs no third-party script
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+function svgElement(parent, tag, attrs) {
+  const el = document.createElementNS(SVG_NS, tag);
+  Object.entries(attrs).forEach(([name, value]) => el.setAttribute(name, value));
+  parent.appendChild(el);
+  return el;
+}
+
+function renderGraph(links) {
+  ormdLinksData = links;
+  const container = document.getElementById('graph-container');
+  const width = container.clientWidth;
+  const height = 400;
+  const svg = svgElement(container, 'svg', {width: width, height: height});
+
+  const nodeIndex = new Map();
+  links.forEach(l => {
+    [l.id, l.to].forEach(id => {
+      if (!nodeIndex.has(id)) {
+        nodeIndex.set(id, {id: id});
+      }
+    });
+  });
+  const nodeData = Array.from(nodeIndex.values());
+  const linkData = links.map(l => ({source: nodeIndex.get(l.id), target: nodeIndex.get(l.to), rel: l.rel}));
+
+  // Start on a spiral around the centre
+  nodeData.forEach((d, i) => {
+    const radius = 10 * Math.sqrt(0.5 + i);
+    const angle = i * Math.PI * (3 - Math.sqrt(5));
+    d.x = width / 2 + radius * Math.cos(angle);
+    d.y = height / 2 + radius * Math.sin(angle);
+    d.vx = 0;
+    d.vy = 0;
+  });
+
+  const linkGroup = svgElement(svg, 'g', {'stroke': '#999', 'stroke-opacity': 0.6});
+  const lines = linkData.map(() => svgElement(linkGroup, 'line', {'stroke-width': 2}));
+  const nodeGroup = svgElement(svg, 'g', {'stroke': '#fff', 'stroke-width': 1.5});
+  const circles = nodeData.map(() => svgElement(nodeGroup, 'circle', {r: 18, fill: '#1976d2'}));
+  const labelGroup = svgElement(svg, 'g', {});
+  const labels = nodeData.map(d => {
+    const text = svgElement(labelGroup, 'text', {'text-anchor': 'middle', 'dy': '.35em', 'fill': '#fff'});
+    text.textContent = d.id;
+    return text;
+  });
+
+  function draw() {
+    linkData.forEach((l, i) => {
+      lines[i].setAttribute('x1', l.source.x);
+      lines[i].setAttribute('y1', l.source.y);
+      lines[i].setAttribute('x2', l.target.x);
+      lines[i].setAttribute('y2', l.target.y);
+    });
+    nodeData.forEach((d, i) => {
+      circles[i].setAttribute('cx', d.x);
+      circles[i].setAttribute('cy', d.y);
+      labels[i].setAttribute('x', d.x);
+      labels[i].setAttribute('y', d.y);
+    });
+  }
+
+  // Links pull towards 80px, nodes repel each other, and the whole graph is
+  // kept centred; the motion cools down over about 300 frames
+  let alpha = 1;
+  function tick() {
+    linkData.forEach(l => {
+      const dx = (l.target.x - l.source.x) || 1e-6;
+      const dy = (l.target.y - l.source.y) || 1e-6;
+      const distance = Math.sqrt(dx * dx + dy * dy);
+      const k = (distance - 80) / distance * alpha * 0.5;
+      l.target.vx -= dx * k;
+      l.target.vy -= dy * k;
+      l.source.vx += dx * k;
+      l.source.vy += dy * k;
+    });
+    for (let i = 0; i < nodeData.length; i++) {
+      for (let j = i + 1; j < nodeData.length; j++) {
+        const a = nodeData[i];
+        const b = nodeData[j];
+        const dx = (b.x - a.x) || 1e-6;
+        const dy = (b.y - a.y) || 1e-6;
+        const k = 200 * alpha / Math.max(dx * dx + dy * dy, 1);
+        a.vx -= dx * k;
+        a.vy -= dy * k;
+        b.vx += dx * k;
+        b.vy += dy * k;
+      }
+    }
+    let cx = 0;
+    let cy = 0;
+    nodeData.forEach(d => {
+      d.vx *= 0.6;
+      d.vy *= 0.6;
+      d.x += d.vx;
+      d.y += d.vy;
+      cx += d.x;
+      cy += d.y;
+    });
+    if (nodeData.length) {
+      cx = cx / nodeData.length - width / 2;
+      cy = cy / nodeData.length - height / 2;
+      nodeData.forEach(d => {
+        d.x -= cx;
+        d.y -= cy;
+      });
+    }
+    draw();
+    alpha -= alpha * 0.0228;
+    if (alpha > 0.001) {
+      requestAnimationFrame(tick);
+    }
+  }
+  requestAnimationFrame(tick);
+}
@@ -4,12 +4,15 @@ This module provides functionality to automatically update and sync
 front-matter fields in ORMD documents.
 """
 
-import re
+import copy
+import hashlib
 import yaml
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Set, Any, Tuple, Optional
-from .parser import parse_document, serialize_front_matter
+from .analyzer import BodyAnalysis, analyze_body
+from .parser import open_document, parse_document_lazy, ParsedDocument, serialize_front_matter
+from .utils import atomic_open
 
 
 class ORMDUpdater:
@@ -36,18 +39,57 @@ class ORMDUpdater:
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
         
-        # Read and parse the document
-        content = file_path.read_text(encoding='utf-8')
-        front_matter, body, metadata, parse_errors = parse_document(content)
+        # Memory-map and parse the document; the body is only decoded when
+        # the metrics have to be recomputed, and the rest of the file is
+        # only sliced when rewriting
+        with open_document(file_path) as document:
+            changes, updated_fm = self._refresh(document, force_update)
+            
+            # Return early if dry run or no changes
+            if not changes:
+                return {'updated': False, 'changes': {}, 'errors': []}
+            
+            if dry_run:
+                return {'updated': False, 'changes': changes, 'errors': []}
+            
+            new_content = self._build_updated_content(document, updated_fm)
+        
+        # Write updated file (after the mapping is released)
+        self._write_updated_file(file_path, new_content)
+        
+        return {'updated': True, 'changes': changes, 'errors': []}
+    
+    def update_text(self, content: str, force_update: bool = False) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Update the front-matter of document text held in memory.
         
-        if parse_errors:
-            raise ValueError(f"Parse errors: {'; '.join(parse_errors)}")
+        Used by ``ormd edit`` to refresh a document as it is saved, so the
+        file is written once. Returns ``(new_content, changes)``;
+        ``new_content`` is ``None`` if nothing needed updating.
+        """
+        document = parse_document_lazy(content)
+        changes, updated_fm = self._refresh(document, force_update)
+        if not changes:
+            return None, {}
+        return self._build_updated_content(document, updated_fm), changes
+    
+    def _refresh(self, document: ParsedDocument,
+                 force_update: bool = False) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Changed fields and the updated front-matter of ``document`` (``({}, None)`` if up to date)."""
+        if document.errors:
+            raise ValueError(f"Parse errors: {'; '.join(document.errors)}")
         
+        front_matter = document.front_matter
         if front_matter is None:
             front_matter = {}
         
+        # Nothing derived from the body can have changed since the last
+        # update, so leave the file (and its mtime) alone
+        body_digest = self._body_digest(document)
+        if not force_update and self._is_up_to_date(front_matter, body_digest):
+            return {}, None
+        
         # Compute updated values
-        updated_fm = self._compute_updates(front_matter, body, force_update)
+        updated_fm = self._compute_updates(front_matter, document.analysis(), force_update, body_digest)
         
         # Track changes
         changes = {}
@@ -58,22 +100,14 @@ class ORMDUpdater:
             if old_val != new_val:
                 changes[field] = {'old': old_val, 'new': new_val}
         
-        # Return early if dry run or no changes
-        if not changes:
-            return {'updated': False, 'changes': {}, 'errors': []}
-        
-        if dry_run:
-            return {'updated': False, 'changes': changes, 'errors': []}
-        
-        # Write updated file
-        self._write_updated_file(file_path, content, updated_fm)
-        
-        return {'updated': True, 'changes': changes, 'errors': []}
+        return changes, updated_fm
     
-    def _compute_updates(self, front_matter: Dict[str, Any], body: str, 
-                        force_update: bool = False) -> Dict[str, Any]:
+    def _compute_updates(self, front_matter: Dict[str, Any], analysis: BodyAnalysis,
+                        force_update: bool = False, body_digest: Optional[str] = None) -> Dict[str, Any]:
         """Compute updated front-matter values."""
-        updated_fm = front_matter.copy()
+        # Deep copy so nested namespaces (dates, metrics) can be compared
+        # against the original to detect changes
+        updated_fm = copy.deepcopy(front_matter)
         
         # Ensure required fields exist
         if 'title' not in updated_fm:
@@ -87,13 +121,41 @@ class ORMDUpdater:
         self._update_dates(updated_fm, force_update)
         
         # Update metrics
-        self._update_metrics(updated_fm, body, force_update)
+        self._update_metrics(updated_fm, analysis, force_update)
+        if body_digest is not None:
+            # Bookkeeping for the next update rather than a user-facing
+            # metric, so it is recorded even when the metrics are locked
+            updated_fm['metrics']['body_digest'] = body_digest
         
         # Update link and asset IDs
-        self._update_ids(updated_fm, body, force_update)
+        self._update_ids(updated_fm, analysis, force_update)
         
         return updated_fm
     
+    def _body_digest(self, document: ParsedDocument) -> str:
+        """Digest of the raw document body, stored as ``metrics.body_digest``."""
+        start, end = document.body_span
+        body = document.content[start:end]
+        if isinstance(body, str):
+            body = body.encode(document.encoding)
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+    
+    def _is_up_to_date(self, front_matter: Dict[str, Any], body_digest: str) -> bool:
+        """Check whether a previous update already covers the current body."""
+        metrics = front_matter.get('metrics')
+        dates = front_matter.get('dates')
+        if not isinstance(metrics, dict) or not isinstance(dates, dict):
+            return False
+        if metrics.get('body_digest') != body_digest:
+            return False
+        # A field removed by hand still needs to be filled in again
+        required = [
+            all(field in front_matter for field in ('title', 'authors', 'links', 'link_ids', 'asset_ids')),
+            all(field in metrics for field in ('word_count', 'reading_time')),
+            all(field in dates for field in ('created', 'modified')) or self._is_locked(dates, 'modified'),
+        ]
+        return all(required)
+    
     def _update_dates(self, front_matter: Dict[str, Any], force_update: bool = False):
         """Update date fields."""
         dates = front_matter.setdefault('dates', {})
@@ -106,13 +168,13 @@ class ORMDUpdater:
         if force_update or not self._is_locked(dates, 'modified'):
             dates['modified'] = self._current_timestamp()
     
-    def _update_metrics(self, front_matter: Dict[str, Any], body: str, force_update: bool = False):
+    def _update_metrics(self, front_matter: Dict[str, Any], analysis: BodyAnalysis, force_update: bool = False):
         """Update metrics fields."""
         metrics = front_matter.setdefault('metrics', {})
         
         # Update word count unless locked
         if force_update or not self._is_locked(metrics, 'word_count'):
-            metrics['word_count'] = self._count_words(body)
+            metrics['word_count'] = analysis.word_count
         
         # Update reading time estimate unless locked
         if force_update or not self._is_locked(metrics, 'reading_time'):
@@ -121,99 +183,27 @@ class ORMDUpdater:
             minutes = max(1, round(word_count / 200))
             metrics['reading_time'] = f"{minutes} min"
     
-    def _update_ids(self, front_matter: Dict[str, Any], body: str, force_update: bool = False):
+    def _update_ids(self, front_matter: Dict[str, Any], analysis: BodyAnalysis, force_update: bool = False):
         """Update link_ids and asset_ids fields."""
         # Update link_ids unless locked
         if force_update or not self._is_locked(front_matter, 'link_ids'):
-            front_matter['link_ids'] = self._extract_link_ids(body)
+            front_matter['link_ids'] = analysis.link_ids
         
         # Update asset_ids unless locked
         if force_update or not self._is_locked(front_matter, 'asset_ids'):
-            front_matter['asset_ids'] = self._extract_asset_ids(body)
+            front_matter['asset_ids'] = analysis.asset_ids
     
     def _extract_link_ids(self, body: str) -> List[str]:
         """Extract all [[id]] references from the document body."""
-        # Find all [[...]] patterns
-        link_pattern = r'\[\[([^\]]+)\]\]'
-        matches = re.findall(link_pattern, body)
-        
-        # Return unique IDs, preserving order
-        seen = set()
-        unique_ids = []
-        for link_id in matches:
-            if link_id not in seen:
-                seen.add(link_id)
-                unique_ids.append(link_id)
-        
-        return unique_ids
+        return analyze_body(body).link_ids
     
     def _extract_asset_ids(self, body: str) -> List[str]:
-        """Extract all asset references from the document body."""
-        asset_ids = []
-        
-        # Markdown image syntax: ![alt](path)
-        img_pattern = r'!\[[^\]]*\]\(([^)]+)\)'
-        img_matches = re.findall(img_pattern, body)
-        
-        # HTML img tags: <img src="path">
-        html_img_pattern = r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>'
-        html_img_matches = re.findall(html_img_pattern, body, re.IGNORECASE)
-        
-        # Markdown link syntax for assets: [text](path) where path looks like an asset
-        asset_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.pdf', '.doc', '.docx', 
-                          '.mp4', '.mp3', '.wav', '.zip', '.tar', '.gz'}
-        link_pattern = r'\[[^\]]*\]\(([^)]+)\)'
-        link_matches = re.findall(link_pattern, body)
-        asset_links = [path for path in link_matches 
-                      if any(path.lower().endswith(ext) for ext in asset_extensions)]
-        
-        # Combine all asset references
-        all_assets = img_matches + html_img_matches + asset_links
-        
-        # Filter for local assets (not URLs) and remove duplicates
-        local_assets = []
-        seen = set()
-        for asset in all_assets:
-            # Skip URLs
-            if asset.startswith(('http://', 'https://', 'ftp://', '//')):
-                continue
-            
-            # Skip absolute paths that look like system paths
-            if asset.startswith('/') and not asset.startswith('./'):
-                continue
-            
-            if asset not in seen:
-                seen.add(asset)
-                local_assets.append(asset)
-        
-        return local_assets
+        """Extract all local asset references from the document body."""
+        return analyze_body(body).asset_ids
     
     def _count_words(self, text: str) -> int:
         """Count words in text, excluding code blocks and other non-prose elements."""
-        # Remove code blocks (```...```)
-        text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-        
-        # Remove inline code (`...`)
-        text = re.sub(r'`[^`]+`', '', text)
-        
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Remove markdown links but keep the text: [text](url) -> text
-        text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-        
-        # Remove markdown image syntax
-        text = re.sub(r'!\[[^\]]*\]\([^)]+\)', '', text)
-        
-        # Remove markdown headers (#)
-        text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-        
-        # Remove other markdown formatting
-        text = re.sub(r'[*_`]', '', text)
-        
-        # Split into words and count
-        words = text.split()
-        return len([word for word in words if word.strip()])
+        return analyze_body(text).word_count
     
     def _current_timestamp(self) -> str:
         """Get current timestamp in ISO 8601 format."""
@@ -240,66 +230,38 @@ class ORMDUpdater:
         else:
             return data.get(field)
     
-    def _write_updated_file(self, file_path: Path, original_content: str, 
-                          updated_front_matter: Dict[str, Any]):
-        """Write the updated file, preserving everything except front-matter."""
-        # Split the content to preserve the structure
-        lines = original_content.splitlines(keepends=True)
-        
-        # Find the version tag
-        version_line = None
-        fm_start = None
-        fm_end = None
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if stripped.startswith('<!-- ormd:0.1 -->'):
-                version_line = i
-            elif version_line is not None and fm_start is None:
-                if stripped in ('---', '+++'):
-                    fm_start = i
-                    delimiter = stripped
-            elif fm_start is not None and fm_end is None:
-                if stripped == delimiter:
-                    fm_end = i
-                    break
-        
-        # Build the new content
-        new_lines = []
-        
-        # Add everything before front-matter
-        if version_line is not None:
-            new_lines.extend(lines[:version_line + 1])
-        
-        # Add the updated front-matter
-        if fm_start is not None:
-            # Preserve any whitespace/comments between version and front-matter
-            if version_line is not None:
-                new_lines.extend(lines[version_line + 1:fm_start])
+    def _build_updated_content(self, document: ParsedDocument,
+                               updated_front_matter: Dict[str, Any]) -> str:
+        """Rebuild the document text, preserving everything except front-matter."""
+        tokens = document.tokens
+        newline = '\n' if isinstance(document.content, str) else b'\n'
+        serialized_fm = serialize_front_matter(updated_front_matter)
+        
+        if tokens.front_matter_span is not None:
+            fm_start, fm_end = tokens.front_matter_span
+            # Keep the prefix up to the start of the opening delimiter line
+            line_start = document.content.rfind(newline, tokens.version_tag_end, fm_start) + 1
+            prefix_end = max(line_start, tokens.version_tag_end)
             
-            # Add the new front-matter block
-            serialized_fm = serialize_front_matter(updated_front_matter)
             # Use the same delimiter as the original
-            if fm_start < len(lines):
-                original_delimiter = lines[fm_start].strip()
-                if original_delimiter == '+++':
-                    serialized_fm = serialized_fm.replace('---', '+++')
-            
-            new_lines.append(serialized_fm)
+            if tokens.delimiter == '+++':
+                serialized_fm = serialized_fm.replace('---', '+++')
             
-            # Add everything after front-matter
-            if fm_end is not None and fm_end + 1 < len(lines):
-                new_lines.extend(lines[fm_end + 1:])
-        else:
-            # No front-matter found, add it after version tag
-            new_lines.append('\n')
-            new_lines.append(serialize_front_matter(updated_front_matter))
-            new_lines.append('\n')
-            # Add the rest of the content
-            if version_line is not None:
-                new_lines.extend(lines[version_line + 1:])
-            else:
-                new_lines.extend(lines)
-        
-        # Write the updated content
-        file_path.write_text(''.join(new_lines), encoding='utf-8') 
\ No newline at end of file
+            return (document.text(0, prefix_end) + serialized_fm
+                    + document.text(fm_end, len(document.content)))
+        
+        # No front-matter found, add it after the version tag line
+        tag_line_end = document.content.find(newline, tokens.version_tag_end)
+        split_at = len(document.content) if tag_line_end == -1 else tag_line_end + 1
+        return (document.text(0, split_at) + '\n' + serialized_fm + '\n'
+                + document.text(split_at, len(document.content)))
+    
+    def _write_updated_file(self, file_path: Path, new_content: str):
+        """Write the rebuilt document content back to ``file_path``.
+
+        Written with :func:`~ormd_cli.utils.atomic_open`, so readers (and an
+        interrupted run) only ever see the old or the new document, never a
+        partial one.
+        """
+        with atomic_open(file_path, newline='') as f:
+            f.write(new_content)
@@ -1,12 +1,44 @@
 import sys
 import locale
+import os
+import stat
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+
+@contextmanager
+def atomic_open(path: Path, newline: Optional[str] = None) -> Iterator[TextIO]:
+    """Open ``path`` for writing (UTF-8) through a temporary file next to it.
+
+    The temporary file replaces ``path`` when the block finishes, so readers
+    never see a partial file and a failure leaves the old one in place. An
+    existing file's permissions are kept.
+    """
+    path = Path(path)
+    temp_path = path.with_name(f'.{path.name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline=newline) as f:
+            yield f
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
 
 def get_view_template() -> str:
     """Reads and returns the content of the view_template.html file."""
-    template_path = Path(__file__).parent / "templates" / "view_template.html"
+    from .template_cache import get_template
     try:
-        return template_path.read_text(encoding="utf-8")
+        return get_template("view_template.html").source
     except FileNotFoundError:
         # Fallback or error handling if template is missing
         # This could return a minimal default HTML or raise an error
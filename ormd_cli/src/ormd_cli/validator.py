@@ -1,81 +1,117 @@
 # src/ormd_cli/validator.py
-import re
-import yaml
-import markdown
 from pathlib import Path
 from typing import List, Dict, Any, Set
-from .parser import parse_document
+from .analyzer import LINK_REF, analyze_body
+from .parser import open_document, ParsedDocument
 from .schema import validate_front_matter_schema
 
 class ORMDValidator:
     def __init__(self):
         self.errors = []
         self.warnings = []
+        self.checked_assets = []  # Relative asset paths whose existence was checked
     
     def validate_file(self, file_path: str) -> bool:
         """Main validation entry point with comprehensive Phase 1 checks"""
         try:
             file_path_obj = Path(file_path)
-            content = file_path_obj.read_text(encoding='utf-8')
-            
-            # Check version tag
-            if not self._check_version_tag(content):
-                return False
-                
-            # Parse document components using the shared parser
-            front_matter, body, metadata, parse_errors = parse_document(content)
-            self.errors.extend(parse_errors)
-            
-            # Phase 1: Required field enforcement with clear guidance
-            if not self._validate_required_fields_with_guidance(front_matter):
-                return False
-                
-            # Phase 1: YAML schema compliance with strict unknown key checking
-            if not self._validate_schema_strict(front_matter):
-                return False
-                
-            # Phase 1: Semantic link consistency checks
-            if not self._validate_semantic_link_consistency(front_matter, body):
-                return False
-                
-            # Phase 1: Asset existence checks
-            if not self._validate_asset_existence(front_matter, file_path_obj.parent):
-                # This check already appends to self.errors, so we just check its return
-                pass # Collect all errors before returning
-
-            # Add new checks for legacy meta blocks and multiple YAML blocks
-            if front_matter is not None: # Only perform these if initial parsing was somewhat successful
-                if not self._check_for_legacy_meta_blocks(body):
-                    pass # Collect all errors
-                if not self._check_for_multiple_yaml_blocks(body, front_matter is not None): # front_matter is not None implies it exists
-                    pass # Collect all errors
-                
-            return len(self.errors) == 0
+            # Memory-map the file: only the front-matter is decoded, and the
+            # body checks run directly against the mapped bytes.
+            with open_document(file_path_obj) as document:
+                return self.validate_document(document, file_path_obj.parent)
             
         except Exception as e:
             self.errors.append(f"Failed to read file: {e}")
             return False
     
-    def _check_version_tag(self, content: str) -> bool:
+    def validate_document(self, document: ParsedDocument, base_dir: Path) -> bool:
+        """Run the Phase 1 checks on an already parsed document.
+
+        ``base_dir`` is the directory that relative asset paths resolve against.
+        """
+        # Check version tag
+        if not self._check_version_tag(document):
+            return False
+            
+        front_matter = document.front_matter
+        self.errors.extend(document.errors)
+        
+        # Phase 1: Required field enforcement with clear guidance
+        if not self._validate_required_fields_with_guidance(front_matter):
+            return False
+            
+        # Phase 1: YAML schema compliance with strict unknown key checking
+        if not self._validate_schema_strict(front_matter):
+            return False
+            
+        # Phase 1: Semantic link consistency checks
+        if not self._validate_semantic_link_consistency(front_matter, document):
+            return False
+            
+        # Phase 1: Asset existence checks
+        if not self._validate_asset_existence(front_matter, base_dir):
+            # This check already appends to self.errors, so we just check its return
+            pass # Collect all errors before returning
+
+        # Add new checks for legacy meta blocks and multiple YAML blocks
+        if front_matter is not None: # Only perform these if initial parsing was somewhat successful
+            if not self._check_for_legacy_meta_blocks(document):
+                pass # Collect all errors
+            if not self._check_for_multiple_yaml_blocks(document, front_matter is not None): # front_matter is not None implies it exists
+                pass # Collect all errors
+            
+        return len(self.errors) == 0
+
+    def validate_region(self, document: ParsedDocument, base_dir: Path, start_line: int, end_line: int) -> bool:
+        """Check only what lines ``[start_line, end_line)`` (0-based) of the document affect.
+
+        A region reaching into the version tag or front-matter can change
+        anything, so the whole document is validated. In the body, the
+        ``[[id]]`` references on the touched lines must be defined and the
+        local assets they use must exist; these errors name their line.
+        """
+        first_body_line = document.text(0, document.body_span[0]).count('\n')
+        if start_line < first_body_line or document.front_matter is None:
+            return self.validate_document(document, base_dir)
+
+        self.errors.extend(document.errors)
+        defined_link_ids = set(document.link_index().by_id)
+        lines = document.body_lines(start_line - first_body_line, end_line - first_body_line)
+        for number, line in enumerate(lines, start_line + 1):
+            for ref in dict.fromkeys(LINK_REF.findall(line)):
+                if ref not in defined_link_ids:
+                    self.errors.append(f"Line {number}: Undefined link reference [[{ref}]] - "
+                                       "add definition to 'links' section")
+
+        for asset_path in analyze_body('\n'.join(lines)).asset_ids:
+            if asset_path.startswith(('http://', 'https://', '/')):
+                continue
+            self.checked_assets.append(asset_path)
+            if not (base_dir / asset_path).exists():
+                number = next((n for n, line in enumerate(lines, start_line + 1) if asset_path in line), start_line + 1)
+                self.errors.append(f"Line {number}: Asset not found: {asset_path} (looked in {base_dir / asset_path})")
+
+        return len(self.errors) == 0
+
+    def _check_version_tag(self, document: ParsedDocument) -> bool:
         """Check for <!-- ormd:0.1 --> at start with guidance"""
-        if not content.strip().startswith('<!-- ormd:0.1 -->'):
+        if not document.has_version_tag:
             self.errors.append("Missing or invalid version tag. Add '<!-- ormd:0.1 -->' at the top of your document.")
             return False
         return True
 
-    def _check_for_legacy_meta_blocks(self, body: str) -> bool:
+    def _check_for_legacy_meta_blocks(self, document: ParsedDocument) -> bool:
         """Checks for '+++meta' or '+++end-meta' blocks in the body."""
-        if re.search(r'^[ ]*\+\+\+(meta|end-meta)\b', body, re.MULTILINE):
+        if document.tokens.has_legacy_meta or document.tokens.has_legacy_end_meta:
             self.errors.append("Error: `+++meta` or `+++end-meta` blocks are no longer supported. All metadata must be in the YAML front-matter.")
             return False
         return True
 
-    def _check_for_multiple_yaml_blocks(self, body: str, front_matter_exists: bool) -> bool:
+    def _check_for_multiple_yaml_blocks(self, document: ParsedDocument, front_matter_exists: bool) -> bool:
         """Checks for multiple YAML front-matter blocks if initial front-matter was found."""
         if front_matter_exists:
-            # This regex looks for '---' or '+++' at the beginning of a line,
-            # possibly with leading spaces, followed by an optional newline.
-            if re.search(r'^\s*(?:---|\+\+\+)\s*$', body, re.MULTILINE):
+            # The tokenizer flags any bare '---' or '+++' line in the body.
+            if document.tokens.has_secondary_delimiter:
                 self.errors.append("Error: Multiple YAML front-matter blocks found. Only one is allowed at the beginning of the document.")
                 return False
         return True
@@ -151,19 +187,20 @@ class ORMDValidator:
         
         return is_valid
     
-    def _validate_semantic_link_consistency(self, front_matter: Dict[str, Any], body: str) -> bool:
+    def _validate_semantic_link_consistency(self, front_matter: Dict[str, Any], document: ParsedDocument) -> bool:
         """Phase 1: Validate semantic link consistency between front-matter and body"""
         if not front_matter:
             return False
         
-        # Extract all [[id]] references from body
-        body_link_refs = set(re.findall(r'\[\[([^\]]+)\]\]', body))
+        # [[id]] references in the body: the shared analysis if it has run,
+        # otherwise a scan of the raw buffer that decodes nothing
+        body_link_refs = set(document.link_ids())
         
         # Get all defined link IDs from front-matter
-        defined_link_ids = set()
-        for link in front_matter.get('links', []):
-            if isinstance(link, dict) and 'id' in link:
-                defined_link_ids.add(link['id'])
+        link_index = document.link_index()
+        defined_link_ids = set(link_index.by_id)
+        for duplicate_id in link_index.duplicates:
+            self.errors.append(f"Link id '{duplicate_id}' is defined more than once in 'links' - link ids must be unique")
         
         # Get link_ids if present (populated by update command)
         front_matter_link_ids = set(front_matter.get('link_ids', []))
@@ -185,7 +222,7 @@ class ORMDValidator:
             else:
                 self.warnings.append(f"Field 'link_ids' contains references not found in body. Run 'ormd update' to sync")
         
-        return len(undefined_refs) == 0
+        return len(undefined_refs) == 0 and not link_index.duplicates
     
     def _validate_asset_existence(self, front_matter: Dict[str, Any], base_dir: Path) -> bool:
         """Phase 1: Check that all assets in asset_ids actually exist on disk"""
@@ -203,6 +240,7 @@ class ORMDValidator:
                 continue
             
             # Check if asset file exists relative to document directory
+            self.checked_assets.append(asset_path)
             full_path = base_dir / asset_path
             if not full_path.exists():
                 missing_assets.append(asset_path)
@@ -0,0 +1,289 @@
+"""One long-lived server for a directory of ORMD documents: ``ormd workspace DIR``.
+
+At start-up every document is parsed once (in a process pool for large
+trees) into a :class:`WorkspaceIndex` entry: title, links, link_ids,
+asset_ids and permissions. Pages are rendered when first requested, laid
+out and cross-linked as ``ormd render --site`` does (``guide/intro.ormd`` at
+``/guide/intro.html``), and kept in an LRU :class:`PageCache`. Pages link the
+shared stylesheet and script from ``/_ormd/``, so moving between documents
+costs one cached render, not a new process. ``/`` lists the documents and
+``/index.json`` returns the index.
+
+A :class:`.preview.SourceWatcher` keeps everything current. A changed
+document is parsed again and its cached page dropped. When documents are
+added or removed, cached pages whose cross-document links now resolve
+differently are dropped too.
+"""
+
+import html
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .batch import run_parallel
+from .logger import logger
+from .preview import SourceWatcher, find_sources, listing_html, start_watching, POLL_INTERVAL
+from .server import Resource, bind_server, run_server
+from .site_builder import ASSET_DIR, PageLinks, SiteIndex, page_path
+from .utils import SYMBOLS
+
+DEFAULT_MAX_PAGES = 256
+# Fewer documents than this are indexed in-process: a pool takes longer to start
+_PARALLEL_MIN_DOCUMENTS = 200
+
+
+class IndexEntry(NamedTuple):
+    """What the workspace knows about one document without rendering it."""
+    source: str
+    page: str
+    title: str
+    links: List[Any]
+    link_ids: List[str]
+    asset_ids: List[str]
+    permissions: Dict[str, Any]
+
+    def as_json(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def index_document(path: str, root: str) -> Tuple[str, Optional[IndexEntry], Optional[str]]:
+    """Parse the document at ``path`` (under ``root``); returns ``(source, entry, error)``."""
+    from .packager import ORMDPackager
+    from .parser import open_document, parse_document_lazy
+
+    source = Path(path).relative_to(root).as_posix()
+    try:
+        packager = ORMDPackager()
+        if packager.is_package(path):
+            document = parse_document_lazy(packager.read_source(path)[0])
+        else:
+            document = open_document(path)
+        with document:
+            front_matter = document.front_matter or {}
+            analysis = document.analysis()
+            title = front_matter.get('title', 'ORMD Document')
+            permissions = front_matter.get('permissions')
+            entry = IndexEntry(source, page_path(source), title if isinstance(title, str) else str(title),
+                               document.link_index().links, analysis.link_ids, analysis.asset_ids,
+                               permissions if isinstance(permissions, dict) else {})
+    except Exception as e:
+        return source, None, str(e)
+    return source, entry, None
+
+
+class WorkspaceIndex:
+    """Every document under ``root``, by site-relative source path."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.entries: Dict[str, IndexEntry] = {}
+        self.failed: Dict[str, str] = {}
+        self.pages: Dict[str, str] = {}  # Page path to source
+        self.site = SiteIndex([])
+
+    def load(self, jobs: Optional[int] = None) -> None:
+        paths = [str(path) for path in find_sources(self.root)]
+        if len(paths) < _PARALLEL_MIN_DOCUMENTS:
+            jobs = 1
+        for source, entry, error in run_parallel(partial(index_document, root=str(self.root)), paths, jobs):
+            self._set(source, entry, error)
+        self._relink()
+
+    def update(self, changed: List[Path], removed: List[Path]) -> bool:
+        """Parse ``changed`` documents again and forget ``removed`` ones; whether the set of documents changed."""
+        before = set(self.pages.values())
+        for path in removed:
+            source = path.relative_to(self.root).as_posix()
+            self.entries.pop(source, None)
+            self.failed.pop(source, None)
+        for path in changed:
+            self._set(*index_document(str(path), str(self.root)))
+        if set(self.entries) | set(self.failed) == before:
+            return False
+        self._relink()
+        return True
+
+    def _set(self, source: str, entry: Optional[IndexEntry], error: Optional[str]) -> None:
+        if entry is None:
+            self.entries.pop(source, None)
+            self.failed[source] = error or 'Unknown error'
+        else:
+            self.failed.pop(source, None)
+            self.entries[source] = entry
+
+    def _relink(self) -> None:
+        sources = sorted(set(self.entries) | set(self.failed))
+        self.site = SiteIndex(sources)
+        self.pages = {page_path(source): source for source in sources}
+
+    def as_json(self) -> Dict[str, Any]:
+        return {
+            'documents': [entry.as_json() for _, entry in sorted(self.entries.items())],
+            'failed': dict(sorted(self.failed.items())),
+        }
+
+
+class CachedPage(NamedTuple):
+    resource: Resource
+    refs: Dict[str, Optional[str]]  # How the page's cross-document ids resolved
+
+
+class PageCache:
+    """Rendered pages by page path; the least recently used are dropped first."""
+
+    def __init__(self, max_pages: int = DEFAULT_MAX_PAGES):
+        self.max_pages = max_pages
+        self._pages: 'OrderedDict[str, CachedPage]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page: str) -> Optional[CachedPage]:
+        with self._lock:
+            cached = self._pages.get(page)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(page)
+            self.hits += 1
+            return cached
+
+    def put(self, page: str, cached: CachedPage) -> None:
+        with self._lock:
+            self._pages[page] = cached
+            self._pages.move_to_end(page)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def pop(self, page: str) -> None:
+        with self._lock:
+            self._pages.pop(page, None)
+
+    def items(self) -> List[Tuple[str, CachedPage]]:
+        with self._lock:
+            return list(self._pages.items())
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+class Workspace:
+    """Serves the documents under ``root``; see the module docstring.
+
+    :meth:`page` is the :class:`.server.ORMDServer` ``pages`` hook and
+    :meth:`update` the :class:`.preview.SourceWatcher` callback.
+    """
+
+    def __init__(self, root, max_pages: int = DEFAULT_MAX_PAGES):
+        self.root = Path(root)
+        self.index = WorkspaceIndex(root)
+        self.cache = PageCache(max_pages)
+        self._lock = threading.Lock()
+        # Bumped when a page is invalidated, so a render that was running
+        # at the time does not put its stale result in the cache
+        self._generations: Dict[str, int] = {}
+        self._listing: Optional[Resource] = None
+        self._index_json: Optional[Resource] = None
+
+    def load(self, jobs: Optional[int] = None) -> None:
+        with self._lock:
+            self.index.load(jobs)
+
+    def page(self, path: str) -> Optional[Resource]:
+        """The resource at URL ``path``, rendering (and caching) a document page if needed."""
+        if path in ('/', '/index.html'):
+            return self._listing_resource()
+        if path == '/index.json':
+            return self._index_resource()
+        page = path.lstrip('/')
+        cached = self.cache.get(page)
+        if cached is not None:
+            return cached.resource
+        with self._lock:
+            source = self.index.pages.get(page)
+            generation = self._generations.get(page, 0)
+            site = self.index.site
+        if source is None:
+            return None
+        try:
+            cached = self._render(source, page, site)
+        except Exception as e:
+            logger.error(f"{SYMBOLS['error']} Failed to render {source}: {str(e)}")
+            return Resource.html(f'<!DOCTYPE html>\n<html>\n<body>\n<h1>Failed to render {html.escape(source)}</h1>\n'
+                                 f'<pre>{html.escape(str(e))}</pre>\n</body>\n</html>\n')
+        with self._lock:
+            if self._generations.get(page, 0) == generation:
+                self.cache.put(page, cached)
+        return cached.resource
+
+    def _render(self, source: str, page: str, site: SiteIndex) -> CachedPage:
+        from .html_generator import get_render_pipeline
+        from .packager import ORMDPackager
+
+        raw_ormd, meta = ORMDPackager().read_source(str(self.root / source))
+        links = PageLinks(page, site)
+        pipeline = get_render_pipeline()
+        document = pipeline.prepare_linked(raw_ormd, links.target_url, links.document_url)
+        page_html = pipeline.site_html(document, links.relative(ASSET_DIR) + '/', meta)
+        return CachedPage(Resource.html(page_html), links.resolved)
+
+    def _invalidate(self, page: str) -> None:
+        self._generations[page] = self._generations.get(page, 0) + 1
+        self.cache.pop(page)
+
+    def update(self, changed: List[Path], removed: List[Path]) -> None:
+        """Bring the index and cache up to date with ``changed`` and ``removed`` sources."""
+        with self._lock:
+            for path in changed + removed:
+                self._invalidate(page_path(path.relative_to(self.root).as_posix()))
+            if self.index.update(changed, removed):
+                # Pages whose links to other documents now resolve differently
+                for page, cached in self.cache.items():
+                    links = PageLinks(page, self.index.site)
+                    if any(links.url_for(link_id) != url for link_id, url in cached.refs.items()):
+                        self._invalidate(page)
+            self._listing = None
+            self._index_json = None
+        for path in removed:
+            logger.info(f"{SYMBOLS['info']} Removed {path.relative_to(self.root).as_posix()}")
+        for path in changed:
+            logger.info(f"{SYMBOLS['info']} Reindexed {path.relative_to(self.root).as_posix()}")
+
+    def _listing_resource(self) -> Resource:
+        with self._lock:
+            if self._listing is None:
+                items = [('/' + page_path(source), self.index.entries[source].title
+                          if source in self.index.entries else source, source)
+                         for source in sorted(self.index.pages.values())]
+                self._listing = Resource.html(listing_html(self.root.resolve().name or str(self.root), items))
+            return self._listing
+
+    def _index_resource(self) -> Resource:
+        with self._lock:
+            if self._index_json is None:
+                self._index_json = Resource.json(self.index.as_json())
+            return self._index_json
+
+
+def serve_workspace(directory: str, port: int = 0, no_browser: bool = False, jobs: Optional[int] = None,
+                    max_pages: int = DEFAULT_MAX_PAGES, interval: float = POLL_INTERVAL) -> None:
+    """Serve every document under ``directory`` until Ctrl+C; see the module docstring."""
+    workspace = Workspace(directory, max_pages)
+    # Watch before indexing, so changes made meanwhile are not missed
+    watcher = SourceWatcher(directory, interval)
+    started = time.perf_counter()
+    workspace.load(jobs)
+    index = workspace.index
+    logger.info(f"{SYMBOLS['info']} Indexed {len(index.entries)} document(s) in {time.perf_counter() - started:.2f}s")
+    for source, error in sorted(index.failed.items()):
+        logger.warning(f"{SYMBOLS['warning']} Could not index {source}: {error}")
+    if not index.pages:
+        logger.warning(f"{SYMBOLS['warning']} No .ormd files found in {directory}")
+
+    httpd = bind_server(port, pages=workspace.page)
+    logger.info(f"{SYMBOLS['info']} Watching {directory} for changes ({watcher.backend})")
+    start_watching(workspace, watcher)
+    run_server(httpd, Path(directory).resolve().name, no_browser)
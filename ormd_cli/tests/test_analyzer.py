@@ -0,0 +1,185 @@
+"""Tests for the body analyzer."""
+
+import random
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from ormd_cli.analyzer import analyze_body
+from ormd_cli.parser import parse_document_lazy
+from ormd_cli.updater import ORMDUpdater
+
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "analyzer_corpus"
+PACKAGE_DIR = Path(__file__).parent.parent
+
+
+def _legacy_link_ids(body):
+    """The updater's original ``[[id]]`` extraction."""
+    return list(dict.fromkeys(re.findall(r'\[\[([^\]]+)\]\]', body)))
+
+
+def _legacy_asset_ids(body):
+    """The updater's original asset extraction."""
+    img_matches = re.findall(r'!\[[^\]]*\]\(([^)]+)\)', body)
+    html_img_matches = re.findall(r'<img[^>]+src=["\']([^"\']+)["\'][^>]*>', body, re.IGNORECASE)
+    asset_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.pdf', '.doc', '.docx',
+                        '.mp4', '.mp3', '.wav', '.zip', '.tar', '.gz'}
+    asset_links = [path for path in re.findall(r'\[[^\]]*\]\(([^)]+)\)', body)
+                   if any(path.lower().endswith(ext) for ext in asset_extensions)]
+    local_assets = []
+    for asset in img_matches + html_img_matches + asset_links:
+        if asset.startswith(('http://', 'https://', 'ftp://', '//')):
+            continue
+        if asset.startswith('/') and not asset.startswith('./'):
+            continue
+        if asset not in local_assets:
+            local_assets.append(asset)
+    return local_assets
+
+
+def _legacy_count_words(text):
+    """The updater's original step-by-step word count."""
+    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
+    text = re.sub(r'`[^`]+`', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    text = re.sub(r'!\[[^\]]*\]\([^)]+\)', '', text)
+    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'[*_`]', '', text)
+    return len([word for word in text.split() if word.strip()])
+
+
+def _corpus():
+    paths = sorted(CORPUS_DIR.glob("*.md"))
+    paths += sorted((PACKAGE_DIR / "examples").glob("*.ormd"))
+    paths.append(PACKAGE_DIR.parent / "README.md")
+    documents = []
+    for path in paths:
+        try:
+            documents.append(pytest.param(path.read_text(encoding='utf-8'), id=path.name))
+        except (OSError, UnicodeDecodeError):
+            continue
+    return documents
+
+
+EDGE_CASES = [
+    "",
+    "   \n\t",
+    "```",
+    "``````",
+    "`a` `",
+    "<>",
+    "<`>`>",
+    "[[]]",
+    "![](a.png)",
+    "[x](y) [[z]] ![w](v.gif)",
+    "<b>[</b>label](file.pdf)",
+    "[`a`](b.png)",
+    "# \n## x\n#\n\n#y",
+    "*** ___ ``` x ```",
+    "[a](b)(c) [d]](e.pdf)",
+    '<img.png`<img src="a.png">!\n# `</b>))http://x# ).pdf<b>',
+    "<IMG alt='a' SRC='b.png' src=\"c.gif\"> <img src=\"d>e.png\">",
+]
+
+# Inputs the legacy regexes, or a single combined one, take quadratic time on
+PATHOLOGICAL = [
+    "a < b " * 20000,
+    "<a `b` " * 5000,
+    "[[x " * 20000,
+    "![x [y " * 20000,
+    "<img " * 20000 + ">",
+]
+
+
+def _random_bodies(count, seed=0):
+    """Short bodies of markup fragments, which hit the edge cases far more often than prose."""
+    pieces = ["`", "```", "<", ">", "[", "]", "(", ")", "!", "#", "\n", " ", "*", "_", "a", "b.png",
+              '<img src="x.png">', 'src="', '"', "'", "[[", "]]", "http://x", ".pdf", "/"]
+    rng = random.Random(seed)
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 25))) for _ in range(count)]
+
+
+class TestAnalyzer:
+    """The analyzer must give exactly the results of the functions it replaced."""
+
+    @pytest.mark.parametrize("body", _corpus())
+    def test_matches_legacy_on_corpus(self, body):
+        """Test that every corpus document gets the legacy results."""
+        analysis = analyze_body(body)
+        assert analysis.word_count == _legacy_count_words(body)
+        assert analysis.link_ids == _legacy_link_ids(body)
+        assert analysis.asset_ids == _legacy_asset_ids(body)
+
+    @pytest.mark.parametrize("body", EDGE_CASES)
+    def test_matches_legacy_on_edge_cases(self, body):
+        """Test that small edge cases get the legacy results."""
+        analysis = analyze_body(body)
+        assert analysis.word_count == _legacy_count_words(body)
+        assert analysis.link_ids == _legacy_link_ids(body)
+        assert analysis.asset_ids == _legacy_asset_ids(body)
+
+    def test_matches_legacy_on_random_bodies(self):
+        """Test that random markup gets the legacy results."""
+        for body in _random_bodies(5000):
+            analysis = analyze_body(body)
+            assert (analysis.word_count, analysis.link_ids, analysis.asset_ids) == (
+                _legacy_count_words(body), _legacy_link_ids(body), _legacy_asset_ids(body)), repr(body)
+
+    @pytest.mark.parametrize("body", PATHOLOGICAL, ids=lambda body: repr(body[:8]))
+    def test_linear_time(self, body):
+        """Test that unclosed tags, code and brackets do not make the analysis quadratic."""
+        started = time.perf_counter()
+        analyze_body(body)
+        # About 5ms here; the quadratic versions took seconds to minutes
+        assert time.perf_counter() - started < 0.5
+
+    def test_extracts_references(self):
+        """Test link and asset extraction on the links corpus document."""
+        analysis = analyze_body((CORPUS_DIR / "links_and_assets.md").read_text(encoding='utf-8'))
+        assert analysis.link_ids == ["intro", "methods", "a b"]
+        assert analysis.asset_ids == [
+            "images/chart.png", "images/empty-alt.svg", "badges/build.svg", "badges/dl.png",
+            "images/diagram.SVG", "./photo.jpg", "docs/report.pdf", "data/bundle.tar.gz",
+            # The outer link of a badge is never seen: its text ends at the
+            # badge image's "]", so the image path is read as the link target
+            "empty/label.pdf",
+        ]
+
+    def test_code_ranges(self):
+        """Test that fenced code blocks are reported by offset."""
+        body = "Intro\n```\ncode\n```\nmiddle `inline`\n```py\nmore\n```\n"
+        analysis = analyze_body(body)
+        assert [body[start:end] for start, end in analysis.code_ranges] == [
+            "```\ncode\n```", "```py\nmore\n```",
+        ]
+        assert analysis.word_count == 2
+
+    def test_document_analysis_is_cached(self):
+        """Test that ParsedDocument computes its analysis once and shares it."""
+        content = "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nSee [[b]], [[a]] and [[b]].\n"
+        for buffer in (content, content.encode('utf-8')):
+            document = parse_document_lazy(buffer)
+            assert document.link_ids() == ["b", "a"]
+            analysis = document.analysis()
+            assert document.analysis() is analysis
+            assert document.link_ids() is analysis.link_ids
+            assert analysis.word_count == 5
+
+    def test_raw_scan_matches_analysis(self):
+        """Test that the validator's raw-buffer scan finds the analysis' link ids."""
+        content = "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\n[[a]b]] [[]] [[c]]] [[d\ne]] [[é]] `[[f]]`\n"
+        for buffer in (content, content.encode('utf-8')):
+            assert parse_document_lazy(buffer).link_ids() == analyze_body(parse_document_lazy(buffer).body).link_ids
+
+    def test_updater_helpers_use_analyzer(self):
+        """Test that the updater's helpers agree with the analyzer."""
+        body = (CORPUS_DIR / "edge_cases.md").read_text(encoding='utf-8')
+        updater = ORMDUpdater()
+        analysis = analyze_body(body)
+        assert updater._count_words(body) == analysis.word_count
+        assert updater._extract_link_ids(body) == analysis.link_ids
+        assert updater._extract_asset_ids(body) == analysis.asset_ids
@@ -0,0 +1,128 @@
+"""Unit tests for multi-document batch helpers."""
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from ormd_cli.batch import collect_ormd_files, update_files, validate_files
+
+
+VALID_DOC = '''<!-- ormd:0.1 -->
+---
+title: "Batch Document"
+authors: ["Test Author"]
+links: []
+---
+
+# Content
+'''
+
+INVALID_DOC = '''<!-- ormd:0.1 -->
+---
+title: "Broken"
+---
+
+Refers to [[missing]].
+'''
+
+
+class TestBatch:
+    """Unit tests for batch file collection and validation."""
+
+    def _make_tree(self, root: Path):
+        (root / "sub").mkdir()
+        (root / "b.ormd").write_text(VALID_DOC, encoding='utf-8')
+        (root / "a.ormd").write_text(INVALID_DOC, encoding='utf-8')
+        (root / "sub" / "c.ormd").write_text(VALID_DOC, encoding='utf-8')
+        (root / "notes.md").write_text("# not ormd", encoding='utf-8')
+
+    def test_collect_directories_and_globs(self):
+        """Test that directories recurse and globs expand to a sorted, de-duplicated list."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._make_tree(root)
+
+            from_dir = collect_ormd_files([tmp])
+            from_glob = collect_ormd_files([str(root / "*.ormd"), str(root / "b.ormd")])
+
+            assert from_dir == sorted(str(p) for p in [root / "a.ormd", root / "b.ormd", root / "sub" / "c.ormd"])
+            assert from_glob == [str(root / "a.ormd"), str(root / "b.ormd")]
+
+    def test_validate_files_parallel_matches_serial(self):
+        """Test that pooled validation returns the same ordered results as serial runs."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._make_tree(root)
+            files = collect_ormd_files([tmp])
+
+            serial = validate_files(files, jobs=1)
+            parallel = validate_files(files, jobs=2)
+
+            assert [(f, ok, v.errors) for f, ok, v in serial] == [(f, ok, v.errors) for f, ok, v in parallel]
+            assert [ok for _, ok, _ in parallel] == [False, True, True]
+
+    def test_validate_command_json_report(self):
+        """Test that validating a directory writes an aggregated JSON report."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._make_tree(root)
+
+            result = subprocess.run(
+                [sys.executable, '-m', 'ormd_cli.main', 'validate', tmp, '--jobs', '2', '--no-cache', '--json-report', '-'],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent.parent
+            )
+
+            report = json.loads(result.stdout)
+            assert result.returncode == 1
+            assert report['valid'] == 2
+            assert report['invalid'] == 1
+            assert [Path(entry['file']).name for entry in report['files']] == ["a.ormd", "b.ormd", "c.ormd"]
+
+    def test_update_files_parallel_writes_atomically(self):
+        """Test that pooled updates rewrite every stale file and leave no temp files behind."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._make_tree(root)
+            (root / "b.ormd").chmod(0o640)
+            files = collect_ormd_files([tmp])
+
+            results = update_files(files, jobs=2)
+
+            assert [(Path(f).name, error) for f, _, error in results] == [("a.ormd", None), ("b.ormd", None), ("c.ormd", None)]
+            assert all(result['updated'] for _, result, _ in results)
+            assert "word_count" in (root / "sub" / "c.ormd").read_text(encoding='utf-8')
+            assert (root / "b.ormd").stat().st_mode & 0o777 == 0o640
+            assert sorted(p.name for p in root.rglob("*") if p.is_file()) == ["a.ormd", "b.ormd", "c.ormd", "notes.md"]
+
+            # A second run finds nothing left to do
+            assert not any(result['updated'] for _, result, _ in update_files(files, jobs=2))
+
+    def test_update_command_dry_run_json_report(self):
+        """Test that a dry run over a directory reports changes as JSON without writing."""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self._make_tree(root)
+            before = (root / "b.ormd").read_text(encoding='utf-8')
+
+            result = subprocess.run(
+                [sys.executable, '-m', 'ormd_cli.main', 'update', tmp, str(root / "missing.ormd"),
+                 '--dry-run', '--jobs', '2', '--json-report', '-'],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent.parent
+            )
+
+            report = json.loads(result.stdout)
+            assert result.returncode == 1
+            assert report['dry_run'] is True
+            assert report['changed'] == 3
+            assert report['failed'] == 1
+            entries = {Path(entry['file']).name: entry for entry in report['files']}
+            assert set(entries['b.ormd']['changes']) >= {'metrics', 'link_ids', 'asset_ids'}
+            assert not entries['b.ormd']['updated']
+            assert "File not found" in entries['missing.ormd']['error']
+            assert (root / "b.ormd").read_text(encoding='utf-8') == before
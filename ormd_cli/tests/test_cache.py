@@ -0,0 +1,79 @@
+"""Unit tests for the persistent validation cache."""
+
+import tempfile
+from pathlib import Path
+
+from ormd_cli.batch import validate_files
+from ormd_cli.cache import ValidationCache, parse_size
+
+
+DOC_WITH_ASSET = '''<!-- ormd:0.1 -->
+---
+title: "Cached Document"
+authors: ["Test Author"]
+links: []
+asset_ids: ["chart.png"]
+---
+
+![Chart](chart.png)
+'''
+
+
+class TestValidationCache:
+    """Unit tests for ValidationCache."""
+
+    def test_unchanged_document_is_served_from_cache(self):
+        """Test that a second run reuses the stored result."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(DOC_WITH_ASSET, encoding='utf-8')
+            (Path(tmp) / "chart.png").write_bytes(b"png")
+
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                first = validate_files([str(doc)], jobs=1, cache=cache)
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                second = validate_files([str(doc)], jobs=1, cache=cache)
+                assert cache.hits == 1
+
+            assert first[0][1] and second[0][1]
+            assert first[0][2].warnings == second[0][2].warnings
+
+    def test_content_or_asset_changes_invalidate_entry(self):
+        """Test that editing the document or removing an asset forces revalidation."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(DOC_WITH_ASSET, encoding='utf-8')
+            asset = Path(tmp) / "chart.png"
+            asset.write_bytes(b"png")
+
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                validate_files([str(doc)], jobs=1, cache=cache)
+
+            asset.unlink()
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                result = validate_files([str(doc)], jobs=1, cache=cache)
+                assert cache.misses == 1
+            assert not result[0][1]
+
+            doc.write_text(DOC_WITH_ASSET.replace("Cached", "Edited"), encoding='utf-8')
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                assert cache.get(str(doc)) is None
+
+    def test_prune_evicts_to_size(self):
+        """Test that pruning to zero bytes empties the cache."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(DOC_WITH_ASSET, encoding='utf-8')
+
+            with ValidationCache(Path(tmp) / "cache") as cache:
+                validate_files([str(doc)], jobs=1, cache=cache)
+                removed, remaining = cache.prune(parse_size("0"))
+
+            assert removed == 1
+            assert remaining == 0
+
+    def test_parse_size_units(self):
+        """Test human-readable cache sizes."""
+        assert parse_size("500") == 500
+        assert parse_size("2K") == 2048
+        assert parse_size("64MB") == 64 * 1024 * 1024
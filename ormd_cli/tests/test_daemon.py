@@ -0,0 +1,166 @@
+"""Unit tests for the ORMD daemon request handling and client fallback."""
+
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from ormd_cli import daemon, template_cache
+from ormd_cli.template_cache import TemplateCache
+
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+CUSTOM_TEMPLATE = "<title>{title}</title>{main_html}<!-- {raw_ormd}{history}{links_json} -->"
+
+
+VALID_DOC = '''<!-- ormd:0.1 -->
+---
+title: "Daemon Document"
+authors: ["Test Author"]
+links: []
+---
+
+# Content
+'''
+
+
+class TestDaemon:
+    """Unit tests for ormd_cli.daemon."""
+
+    def test_handle_validate_request(self):
+        """Test that validate requests return per-file results."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(VALID_DOC, encoding='utf-8')
+
+            response = daemon.handle_request({'command': 'validate', 'paths': [str(doc)], 'no_cache': True})
+
+            assert response['ok']
+            assert response['results'][0]['file'] == str(doc)
+            assert response['results'][0]['valid']
+
+    def test_handle_render_respects_overwrite(self):
+        """Test that render requests refuse to replace existing output without overwrite."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(VALID_DOC, encoding='utf-8')
+            out = Path(tmp) / "doc.html"
+
+            first = daemon.handle_request({'command': 'render', 'input_file': str(doc), 'out': str(out)})
+            second = daemon.handle_request({'command': 'render', 'input_file': str(doc), 'out': str(out)})
+
+            assert first['ok'] and first['written']
+            assert second['ok'] and not second['written']
+            assert "Daemon Document" in out.read_text(encoding='utf-8')
+
+    def test_handle_errors_are_reported(self):
+        """Test that unknown commands and handler failures become error responses."""
+        assert not daemon.handle_request({'command': 'explode'})['ok']
+        response = daemon.handle_request({'command': 'update', 'path': '/nonexistent/doc.ormd'})
+        assert not response['ok']
+        assert 'File not found' in response['error']
+
+    def test_request_without_daemon_returns_none(self):
+        """Test that the client signals fallback when nothing is listening."""
+        with tempfile.TemporaryDirectory() as tmp:
+            assert daemon.request({'command': 'ping'}, Path(tmp) / "missing.sock") is None
+
+    def test_round_trip_over_socket(self):
+        """Test a ping through a daemon served from a background thread."""
+        with tempfile.TemporaryDirectory() as tmp:
+            sock = Path(tmp) / "d.sock"
+            thread = threading.Thread(target=daemon.serve, args=(sock,), daemon=True)
+            thread.start()
+            for _ in range(50):
+                if sock.exists():
+                    break
+                time.sleep(0.05)
+
+            response = daemon.request({'command': 'ping'}, sock)
+
+            assert response['ok']
+            assert 'pid' in response
+            assert stat.S_IMODE(sock.stat().st_mode) == 0o600
+
+    def test_shared_default_directory_refused(self, tmp_path, monkeypatch):
+        """Test that a default socket directory others can write to is neither served on nor connected to."""
+        monkeypatch.delenv(daemon.SOCKET_ENV, raising=False)
+        monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        directory = daemon.default_socket_path().parent
+        directory.mkdir(mode=0o700)
+        daemon._check_private(directory)
+
+        directory.chmod(0o777)
+        with pytest.raises(OSError, match="others cannot write to"):
+            daemon.serve()
+        assert daemon.request({'command': 'ping'}) is None
+        assert not (directory / "daemon.sock").exists()
+
+    def test_client_settings_applied_per_request(self, tmp_path, monkeypatch):
+        """Test that each request renders with its own client's template dirs."""
+        monkeypatch.setattr(daemon, "_gate", daemon._SettingsGate())
+        monkeypatch.setattr(template_cache, "_cache", TemplateCache())
+        for name in daemon.SETTINGS_ENV:
+            monkeypatch.delenv(name, raising=False)
+        (tmp_path / "templates").mkdir()
+        (tmp_path / "templates" / "view_template.html").write_text(CUSTOM_TEMPLATE, encoding='utf-8')
+        doc = tmp_path / "doc.ormd"
+        doc.write_text(VALID_DOC, encoding='utf-8')
+
+        custom = daemon.handle_request({
+            'command': 'render', 'input_file': str(doc), 'out': str(tmp_path / "custom.html"),
+            'settings': {'cwd': str(tmp_path), 'template_dirs': ["templates"], 'env': {}},
+        })
+        builtin = daemon.handle_request({
+            'command': 'render', 'input_file': str(doc), 'out': str(tmp_path / "builtin.html"),
+            'settings': {'cwd': str(tmp_path), 'template_dirs': [], 'env': {}},
+        })
+
+        assert custom['ok'] and builtin['ok']
+        assert (tmp_path / "custom.html").read_text(encoding='utf-8').startswith("<title>Daemon Document</title>")
+        assert not (tmp_path / "builtin.html").read_text(encoding='utf-8').startswith("<title>")
+
+    def test_daemon_render_matches_direct(self, tmp_path):
+        """Test that `ormd --daemon` renders what the command renders in-process, from the client's directory."""
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get('PYTHONPATH')])))
+        for name in daemon.SETTINGS_ENV:
+            env.pop(name, None)
+        sock = tmp_path / "d.sock"
+        env[daemon.SOCKET_ENV] = str(sock)
+        work = tmp_path / "work"
+        (work / "templates").mkdir(parents=True)
+        (work / "templates" / "view_template.html").write_text(CUSTOM_TEMPLATE, encoding='utf-8')
+        (work / "doc.ormd").write_text(VALID_DOC + "\n```\nplain = 1\n```\n", encoding='utf-8')
+
+        # Started elsewhere, so relative paths only work if the client's directory is used
+        server = subprocess.Popen([sys.executable, '-m', 'ormd_cli.main', 'daemon'], cwd=str(tmp_path), env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                if daemon.request({'command': 'ping'}, sock) is not None:
+                    break
+                time.sleep(0.05)
+            else:
+                raise AssertionError("daemon did not start")
+
+            options = ['--template-dir', 'templates', '--no-guess-lang']
+            for flags, out in ((['--daemon'], 'daemon.html'), ([], 'direct.html')):
+                result = subprocess.run([sys.executable, '-m', 'ormd_cli.main', *flags, *options,
+                                         'render', 'doc.ormd', '-o', out],
+                                        cwd=str(work), env=env, capture_output=True, text=True)
+                assert result.returncode == 0, result.stderr
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+        html = (work / "daemon.html").read_text(encoding='utf-8')
+        assert html.startswith("<title>Daemon Document</title>")
+        assert html == (work / "direct.html").read_text(encoding='utf-8')
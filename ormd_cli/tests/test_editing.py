@@ -0,0 +1,126 @@
+"""Tests for saving `ormd edit` changes through the local server."""
+
+import pytest
+
+from ormd_cli.editing import EditConflict, LineEdit, SourceFile, apply_line_edits, diff_lines, source_version
+from ormd_cli.parser import parse_document_lazy
+from ormd_cli.validator import ORMDValidator
+
+
+DOC = """<!-- ormd:0.1 -->
+---
+title: Test Document
+authors: [Test Author]
+links:
+- id: known
+  rel: supports
+  to: '#intro'
+---
+
+# Intro
+
+See [[known]].
+"""
+
+
+class TestLineEdits:
+    """Unit tests for line-range edits."""
+
+    def test_apply(self):
+        """Test that edits apply to the lines they were made against, in any order."""
+        lines = ["a", "b", "c", "d"]
+        edits = [LineEdit(3, 4, ["D1", "D2"]), LineEdit(0, 1, []), LineEdit(2, 2, ["new"])]
+        assert apply_line_edits(lines, edits) == (["b", "new", "c", "D1", "D2"], [(0, 0), (1, 2), (3, 5)])
+
+    def test_invalid(self):
+        """Test that overlapping, out of range and malformed edits are refused."""
+        with pytest.raises(ValueError):
+            apply_line_edits(["a", "b"], [LineEdit(0, 2, []), LineEdit(1, 1, ["x"])])
+        with pytest.raises(ValueError):
+            apply_line_edits(["a"], [LineEdit(0, 2, [])])
+        for data in ({"start": 2, "end": 1, "lines": []}, {"start": 0, "end": 1}, {"start": 0, "end": 1, "lines": [1]}):
+            with pytest.raises(ValueError):
+                LineEdit.from_json(data)
+
+    def test_diff(self):
+        """Test that the diff covers the lines between the first and last change."""
+        assert diff_lines(["a", "b", "c"], ["a", "b", "c"]) is None
+        assert diff_lines(["a", "b", "c"], ["a", "x", "y", "c"]) == LineEdit(1, 2, ["x", "y"])
+        assert diff_lines(["a", "b"], ["a"]) == LineEdit(1, 2, [])
+        old, new = ["a", "b", "c", "d"], ["z", "b", "c", "e"]
+        assert apply_line_edits(old, [diff_lines(old, new)])[0] == new
+
+
+class TestSourceFile:
+    """Tests for saving edits to a file."""
+
+    def test_patch_refreshes_and_validates(self, tmp_path):
+        """Test that a patch is saved with refreshed fields, and only the touched lines are checked."""
+        path = tmp_path / "doc.ormd"
+        path.write_text(DOC, encoding="utf-8")
+        source = SourceFile(path)
+        text, version = source.read()
+        lines = text.split("\n")
+
+        result = source.patch(version, [LineEdit(len(lines) - 1, len(lines) - 1, ["More [[missing]] words."])])
+        saved = path.read_text(encoding="utf-8")
+        assert result["version"] == source_version(saved) == source.read()[1]
+        assert "More [[missing]] words." in saved
+        assert set(result["updated"]) == {"dates", "metrics", "link_ids", "asset_ids"}
+        assert apply_line_edits(lines[:-1] + ["More [[missing]] words.", ""],
+                                [LineEdit.from_json(edit) for edit in result["edits"]])[0] == saved.split("\n")
+        validation = result["validation"]
+        line = saved.split("\n").index("More [[missing]] words.") + 1
+        assert validation["errors"] == [f"Line {line}: Undefined link reference [[missing]] - "
+                                        "add definition to 'links' section"]
+        assert validation["lines"] == [line - 1, line]
+
+    def test_conflict(self, tmp_path):
+        """Test that a patch against an outdated version is refused and changes nothing."""
+        path = tmp_path / "doc.ormd"
+        path.write_text(DOC, encoding="utf-8")
+        source = SourceFile(path, refresh_metadata=False)
+        _, version = source.read()
+        path.write_text(DOC + "\nChanged elsewhere.\n", encoding="utf-8")
+        with pytest.raises(EditConflict) as conflict:
+            source.patch(version, [LineEdit(0, 0, ["x"])])
+        assert conflict.value.version == source_version(DOC + "\nChanged elsewhere.\n")
+        assert path.read_text(encoding="utf-8") == DOC + "\nChanged elsewhere.\n"
+
+    def test_keeps_crlf(self, tmp_path):
+        """Test that lines are edited without their line endings and CRLF files stay CRLF."""
+        path = tmp_path / "doc.ormd"
+        path.write_bytes(DOC.replace("\n", "\r\n").encode("utf-8"))
+        source = SourceFile(path, refresh_metadata=False)
+        text, version = source.read()
+        assert text == DOC
+        source.patch(version, [LineEdit(10, 11, ["# Introduction"])])
+        assert path.read_bytes() == DOC.replace("# Intro\n", "# Introduction\n").replace("\n", "\r\n").encode("utf-8")
+
+    def test_replace(self, tmp_path):
+        """Test that a whole-text save validates the lines that differ."""
+        path = tmp_path / "doc.ormd"
+        path.write_text(DOC, encoding="utf-8")
+        source = SourceFile(path, refresh_metadata=False)
+        result = source.replace(DOC.replace("# Intro", "# Intro\n\n![x](gone.png)"), source.read()[1])
+        assert result["validation"]["lines"] == [12, 14]
+        assert result["validation"]["errors"][0].startswith("Line 13: Asset not found: gone.png")
+
+
+class TestValidateRegion:
+    """Tests for validating part of a document."""
+
+    def test_front_matter_validates_everything(self, tmp_path):
+        """Test that a region in the front-matter runs the full validation."""
+        document = parse_document_lazy(DOC + "\n[[missing]]\n")
+        validator = ORMDValidator()
+        assert not validator.validate_region(document, tmp_path, 2, 3)
+        assert any("[[missing]]" in error for error in validator.errors)
+
+    def test_body_region(self, tmp_path):
+        """Test that a body region only reports problems on its own lines."""
+        document = parse_document_lazy(DOC + "\n[[missing]]\n")
+        validator = ORMDValidator()
+        assert validator.validate_region(document, tmp_path, 10, 13)
+        assert not validator.validate_region(document, tmp_path, 13, 15)
+        assert validator.errors == ["Line 15: Undefined link reference [[missing]] - add definition to 'links' section"]
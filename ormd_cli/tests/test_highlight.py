@@ -0,0 +1,106 @@
+"""Tests for cached code highlighting."""
+
+import markdown
+from markdown.extensions import codehilite, fenced_code
+from markdown.extensions.codehilite import CodeHilite
+
+from ormd_cli import highlight
+from ormd_cli.highlight import GUESS_LANG_ENV, CachedCodeHilite, HighlightCache
+from ormd_cli.html_generator import MarkdownRenderer
+
+
+CODE_DOC = '''# Snippets
+
+```
+def handler(request):
+    return {"ok": True}
+```
+
+```json
+{"id": 1}
+```
+
+    indented = "block"
+'''
+
+
+class TestHighlightCache:
+    """Unit tests for the highlight cache tiers."""
+
+    def test_lru(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = HighlightCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        assert cache.get("a") == "A"
+        cache.put("c", "C")
+        assert cache.get("b") is None
+        assert (cache.get("a"), cache.get("c")) == ("A", "C")
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    def test_disk_tier(self, tmp_path):
+        """Test that entries written by one cache are found by another on the same directory."""
+        HighlightCache(cache_dir=tmp_path).put("ab12", "<pre>x</pre>")
+        cache = HighlightCache(cache_dir=tmp_path)
+        assert cache.get("ab12") == "<pre>x</pre>"
+        assert cache.get("cd34") is None
+
+
+class TestCachedCodeHilite:
+    """Tests for highlighting through the cache."""
+
+    def test_same_html_as_codehilite(self, monkeypatch):
+        """Test that cached highlighting gives exactly the uncached HTML, and is reused."""
+        cache = HighlightCache()
+        monkeypatch.setattr(highlight, "_cache", cache)
+        for lang in (None, "python", "nosuchlang"):
+            expected = CodeHilite("x = 1\n", lang=lang).hilite()
+            assert CachedCodeHilite("x = 1\n", lang=lang).hilite() == expected
+            assert CachedCodeHilite("x = 1\n", lang=lang).hilite() == expected
+        assert (cache.hits, cache.misses) == (3, 3)
+
+    def test_options_are_part_of_the_key(self, monkeypatch):
+        """Test that the same code with other options is highlighted separately."""
+        monkeypatch.setattr(highlight, "_cache", HighlightCache())
+        plain = CachedCodeHilite("x = 1", lang="python").hilite()
+        numbered = CachedCodeHilite("x = 1", lang="python", linenos="table").hilite()
+        assert plain != numbered
+        assert numbered == CodeHilite("x = 1", lang="python", linenos="table").hilite()
+
+    def test_renderer_uses_cache(self, monkeypatch):
+        """Test that rendered documents match stock Markdown and hit the cache on re-render."""
+        cache = HighlightCache()
+        monkeypatch.setattr(highlight, "_cache", cache)
+        renderer = MarkdownRenderer()
+        first = renderer.convert(CODE_DOC)
+        misses = cache.misses
+        assert renderer.convert(CODE_DOC) == first
+        assert cache.misses == misses and cache.hits >= 3
+        assert 'class="codehilite"' in first
+
+    def test_markdown_package_untouched(self, monkeypatch):
+        """Test that only the renderer's own Markdown instances highlight through the cache."""
+        cache = HighlightCache()
+        monkeypatch.setattr(highlight, "_cache", cache)
+        renderer = MarkdownRenderer()
+        cached = renderer.convert(CODE_DOC)
+        assert codehilite.CodeHilite is CodeHilite and fenced_code.CodeHilite is CodeHilite
+        misses = cache.misses
+        stock = markdown.markdown(CODE_DOC, extensions=renderer.extensions,
+                                  extension_configs=renderer.extension_configs)
+        assert stock == cached
+        assert (cache.hits, cache.misses) == (0, misses)
+
+    def test_guess_lang_switch(self, monkeypatch):
+        """Test that $ORMD_GUESS_LANG=0 renders unlabelled blocks as plain text."""
+        monkeypatch.setattr(highlight, "_cache", HighlightCache())
+        guessed = MarkdownRenderer().convert(CODE_DOC)
+        monkeypatch.setenv(GUESS_LANG_ENV, "0")
+        renderer = MarkdownRenderer()
+        assert renderer.extension_configs['codehilite']['guess_lang'] is False
+        plain = renderer.convert(CODE_DOC)
+        assert plain != guessed
+        assert '>return</span>' in guessed
+        assert '>return</span>' not in plain
+        assert plain == markdown.markdown(CODE_DOC, extensions=renderer.extensions,
+                                          extension_configs=renderer.extension_configs)
@@ -0,0 +1,156 @@
+"""Unit tests for HTML generation helpers."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import markdown
+
+from ormd_cli.html_generator import (
+    MARKDOWN_EXTENSION_CONFIGS,
+    MARKDOWN_EXTENSIONS,
+    RAW_SOURCE_OMITTED,
+    MarkdownRenderer,
+    RenderPipeline,
+    get_markdown_renderer,
+    resolve_links,
+)
+from ormd_cli.links import LinkIndex
+
+
+FOOTNOTE_DOC = '''# Results
+
+The effect was large[^1].
+
+## Results
+
+```python
+print("hello")
+```
+
+[^1]: Measured twice.
+'''
+
+PLAIN_DOC = '''# Summary
+
+No footnotes here.
+'''
+
+
+LINKED_DOC = '''<!-- ormd:0.1 -->
+---
+title: "Linked"
+authors: ["Test Author"]
+links:
+  - id: intro
+    rel: supports
+    to: "#introduction"
+  - id: evil
+    rel: related
+    to: "</script><script>alert(1)</script>"
+permissions:
+  editable: false
+---
+
+# Introduction
+
+See [[intro]] and [[missing]]. The text `// renderGraph(oops);` stays as written.
+'''
+
+
+def _fresh(text):
+    return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+
+
+class TestMarkdownRenderer:
+    """Unit tests for the reusable Markdown renderer."""
+
+    def test_matches_one_off_conversion(self):
+        """Test that reusing the converter gives the same HTML as a fresh one each time."""
+        renderer = MarkdownRenderer()
+        for text in (FOOTNOTE_DOC, PLAIN_DOC, FOOTNOTE_DOC):
+            assert renderer.convert(text) == _fresh(text)
+
+    def test_state_does_not_leak_between_documents(self):
+        """Test that footnotes and heading ids from one document do not reach the next."""
+        renderer = MarkdownRenderer()
+        renderer.convert(FOOTNOTE_DOC)
+        html = renderer.convert(PLAIN_DOC)
+        assert 'class="footnote"' not in html
+        assert 'id="summary"' in html
+
+    def test_one_converter_per_thread(self):
+        """Test that threads convert concurrently with their own converter."""
+        renderer = MarkdownRenderer()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(renderer.convert, [FOOTNOTE_DOC, PLAIN_DOC] * 20))
+        assert results == [_fresh(FOOTNOTE_DOC), _fresh(PLAIN_DOC)] * 20
+
+    def test_configurable_extensions(self):
+        """Test that a renderer can use its own extensions."""
+        renderer = MarkdownRenderer(extensions=['toc'], extension_configs={})
+        assert renderer.convert(PLAIN_DOC) == markdown.markdown(PLAIN_DOC, extensions=['toc'])
+
+    def test_shared_renderer(self):
+        """Test that the module-level renderer is created once."""
+        assert get_markdown_renderer() is get_markdown_renderer()
+
+
+class TestRenderPipeline:
+    """Unit tests for the staged render pipeline."""
+
+    def test_link_index(self):
+        """Test that the link index keeps the first definition of an id and reports duplicates."""
+        first = {'id': 'a', 'rel': 'cites', 'to': '#one'}
+        index = LinkIndex([first, {'id': 'b', 'to': '#b'}, {'id': 'a', 'to': '#two'}, 'not a link', {'rel': 'x'}])
+        assert index.get('a') is first
+        assert 'b' in index and 'c' not in index
+        assert index.duplicates == ['a']
+        assert [link['id'] for link in index.graph_data()] == ['a', 'b']
+        assert LinkIndex.from_front_matter(None).links == []
+
+    def test_resolve_links(self):
+        """Test that defined references become links and the first definition wins."""
+        links = [{'id': 'a', 'rel': 'cites', 'to': '#one'}, {'id': 'a', 'to': '#two'}, 'not a link']
+        assert resolve_links("[[a]] [[b]]", LinkIndex(links)) == (
+            '<a href="#one" class="ormd-link ormd-link-cites">a</a> '
+            '<span class="ormd-link ormd-link-undefined">b</span>'
+        )
+
+    def test_prepared_document_is_cached_and_shared(self):
+        """Test that render, view and edit of one document share a single prepared result."""
+        pipeline = RenderPipeline(cache_size=1)
+        document = pipeline.prepare(LINKED_DOC)
+        assert pipeline.prepare(LINKED_DOC) is document
+        assert document.title == "Linked"
+        assert document.permissions == {'editable': False}
+        assert 'ormd-link-supports' in document.main_html
+
+        for html in (pipeline.render_html(document), pipeline.view_html(document),
+                     pipeline.edit_html(document, "docs/linked doc.ormd")):
+            assert document.main_html in html
+
+        pipeline.prepare(PLAIN_DOC)
+        assert pipeline.prepare(LINKED_DOC) is not document  # Evicted
+
+    def test_graph_data_fills_template_slot(self):
+        """Test that link data is placed in the graph slot and cannot close the script early."""
+        pipeline = RenderPipeline()
+        html = pipeline.view_html(pipeline.prepare(LINKED_DOC))
+        assert html.count('renderGraph([{') == 1
+        assert '// renderGraph(oops);' in html
+        assert '</script><script>alert(1)' not in html
+
+    def test_raw_source_modes(self):
+        """Test that the source can be inlined, fetched from a separate file or left out."""
+        pipeline = RenderPipeline()
+        document = pipeline.prepare(LINKED_DOC)
+        inline_pane = '<pre id="raw-content">&lt;!-- ormd:0.1 --&gt;\n---\ntitle: "Linked"'
+        inline = pipeline.render_html(document)
+        assert inline_pane in inline
+
+        external = pipeline.render_html(document, raw_source='external', source_url='doc "1".ormd.txt')
+        assert '<pre id="raw-content" data-src="doc &quot;1&quot;.ormd.txt"></pre>' in external
+        assert 'ormd:0.1 --&gt;' not in external
+
+        omitted = pipeline.render_html(document, raw_source='none')
+        assert f'<pre id="raw-content">{RAW_SOURCE_OMITTED}</pre>' in omitted
+        assert 'ormd:0.1 --&gt;' not in omitted
@@ -0,0 +1,138 @@
+"""Tests for packing .ormd packages."""
+
+import os
+import zipfile
+
+import pytest
+
+from ormd_cli import packager
+from ormd_cli.packager import ORMDPackager
+
+
+CONTENT = """<!-- ormd:0.1 -->
+---
+title: Gallery
+authors: [Ann]
+links: []
+asset_ids: [data/table.csv]
+---
+# Gallery
+
+![Photo](img/photo.png)
+"""
+
+
+@pytest.fixture
+def document(tmp_path):
+    (tmp_path / "img").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "ops").mkdir()
+    (tmp_path / "content.ormd").write_text(CONTENT, encoding="utf-8")
+    (tmp_path / "meta.json").write_text('{"title": "Gallery"}', encoding="utf-8")
+    (tmp_path / "img" / "photo.png").write_bytes(b"png" * 50000)
+    (tmp_path / "data" / "table.csv").write_text("a,b\n" * 50000, encoding="utf-8")
+    (tmp_path / "ops" / "0001.bin").write_bytes(b"\x00\x01")
+    (tmp_path / "render.css").write_text("body { margin: 0; }\n", encoding="utf-8")
+    return tmp_path
+
+
+def _pack(document, **kwargs):
+    output = document / "out" / "gallery.ormd"
+    output.parent.mkdir(exist_ok=True)
+    assert ORMDPackager().pack(str(document / "content.ormd"), str(document / "meta.json"), str(output), **kwargs)
+    return output
+
+
+class TestPack:
+    """Tests for ORMDPackager.pack."""
+
+    def test_members(self, document):
+        """Test that optional files and assets are packed at their relative paths."""
+        output = _pack(document)
+        with zipfile.ZipFile(output) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ["content.ormd", "meta.json", "render.css", "ops/0001.bin",
+                                     "data/table.csv", "img/photo.png"]
+            assert zf.read("data/table.csv") == (document / "data" / "table.csv").read_bytes()
+            assert zf.read("img/photo.png") == (document / "img" / "photo.png").read_bytes()
+
+    def test_compression(self, document):
+        """Test that compressed formats are stored and other members deflated."""
+        with zipfile.ZipFile(_pack(document)) as zf:
+            assert zf.getinfo("img/photo.png").compress_type == zipfile.ZIP_STORED
+            table = zf.getinfo("data/table.csv")
+            assert table.compress_type == zipfile.ZIP_DEFLATED
+            assert table.compress_size < table.file_size // 10
+
+    def test_content_deflated(self, document):
+        """Test that the text of content.ormd is deflated, not stored."""
+        (document / "content.ormd").write_text(CONTENT + "Some prose.\n" * 20000, encoding="utf-8")
+        with zipfile.ZipFile(_pack(document)) as zf:
+            content = zf.getinfo("content.ormd")
+            assert content.compress_type == zipfile.ZIP_DEFLATED
+            assert content.compress_size < content.file_size // 10
+
+    def test_level_zero_stores_everything(self, document):
+        """Test that compression level 0 stores every member."""
+        with zipfile.ZipFile(_pack(document, compress_level=0, jobs=1)) as zf:
+            assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+
+    def test_incompressible_member_stored(self, document):
+        """Test that a member deflate cannot shrink is stored."""
+        (document / "data" / "noise.bin").write_bytes(os.urandom(100000))
+        output = _pack(document, assets=["data/noise.bin"])
+        with zipfile.ZipFile(output) as zf:
+            assert zf.getinfo("data/noise.bin").compress_type == zipfile.ZIP_STORED
+            assert "img/photo.png" not in zf.namelist()
+
+    def test_round_trip(self, document, tmp_path_factory):
+        """Test that an unpacked package has the original files."""
+        out_dir = tmp_path_factory.mktemp("unpacked")
+        assert ORMDPackager().unpack(str(_pack(document)), str(out_dir))
+        assert (out_dir / "content.ormd").read_text(encoding="utf-8") == CONTENT
+        assert (out_dir / "img" / "photo.png").read_bytes() == (document / "img" / "photo.png").read_bytes()
+        assert ORMDPackager().read_source(str(document / "out" / "gallery.ormd"))[1] == {"title": "Gallery"}
+
+    def test_missing_asset_skipped(self, document):
+        """Test that an asset that does not exist is left out rather than failing the pack."""
+        (document / "data" / "table.csv").unlink()
+        with zipfile.ZipFile(_pack(document)) as zf:
+            assert "data/table.csv" not in zf.namelist()
+            assert "img/photo.png" in zf.namelist()
+
+    def test_failed_pack_leaves_no_output(self, document):
+        """Test that a failing pack leaves neither the package nor its temporary file."""
+        (document / "meta.json").unlink()
+        output = document / "gallery.ormd"
+        assert not ORMDPackager().pack(str(document / "content.ormd"), str(document / "meta.json"), str(output))
+        assert not output.exists()
+        assert not list(document.glob(".gallery.ormd.*"))
+
+    def test_zip64(self, document, monkeypatch):
+        """Test the Zip64 sizes, offsets and end records, with the limit lowered so small files reach it."""
+        monkeypatch.setattr(packager, "_ZIP64_LIMIT", 400)
+        output = _pack(document)
+        data = output.read_bytes()
+        assert b"PK\x06\x06" in data and b"PK\x06\x07" in data  # Zip64 end record and locator
+        with zipfile.ZipFile(output) as zf:
+            assert zf.testzip() is None
+            assert max(info.header_offset for info in zf.infolist()) >= 400
+            assert zf.getinfo("img/photo.png").compress_size >= 400
+            table = zf.getinfo("data/table.csv")
+            assert table.file_size >= 400 > table.compress_size
+            assert zf.read("img/photo.png") == (document / "img" / "photo.png").read_bytes()
+            assert zf.read("data/table.csv") == (document / "data" / "table.csv").read_bytes()
+            assert zf.read("content.ormd").decode("utf-8") == CONTENT
+
+    def test_asset_outside_directory_skipped(self, document):
+        """Test that assets outside the content file's directory are not packed."""
+        (document.parent / "shared.css").write_text("p {}", encoding="utf-8")
+        output = _pack(document, assets=["../shared.css", "https://example.com/a.png"])
+        with zipfile.ZipFile(output) as zf:
+            assert not any("shared" in name or "example" in name for name in zf.namelist())
+
+    def test_invalid_level(self, document):
+        """Test that compression levels outside 0-9 are refused."""
+        output = document / "gallery.ormd"
+        assert not ORMDPackager().pack(str(document / "content.ormd"), str(document / "meta.json"), str(output),
+                                       compress_level=10)
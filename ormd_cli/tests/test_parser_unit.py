@@ -4,10 +4,38 @@ These tests focus on parser behavior with minimal sample files and edge cases.
 """
 
 import pytest
+import random
+import sys
 import tempfile
 import os
 from pathlib import Path
-from ormd_cli.parser import parse_document, serialize_front_matter
+from ormd_cli.parser import (_BYTES_SYNTAX, open_document, parse_document, parse_document_lazy,
+                             serialize_front_matter, tokenize_document)
+
+
+# Documents whose structure depends on non-ASCII whitespace or word characters
+UNICODE_BOUNDARY_DOCS = [
+    "<!-- ormd:0.1 -->\n\u00a0---\ntitle: NBSP\n---\n\nBody\n",
+    "<!-- ormd:0.1 -->\n\u2003\n---\ntitle: EM SPACE\n---\n\nBody\n",
+    "\u3000<!-- ormd:0.1 -->\n---\ntitle: Ideographic\n---\nBody\n",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\u00a0\n\nBody\n",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nBody\n+++metaé\n+++end-metaß\n",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nBody\n+++meta—\n",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nBody\n\u2028---\u00a0\n",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nBody ends in NBSP\u00a0\u00a0\n\u2029",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nBody\x1c\x1f\u0085",
+    "<!-- ormd:0.1 -->\n---\ntitle: T\n---\n\nEnds in a letter é",
+]
+
+
+def _parse_both(tmp_path, content):
+    path = tmp_path / "doc.ormd"
+    path.write_bytes(content.encode('utf-8'))
+    text = parse_document_lazy(content)
+    with open_document(path) as mapped:
+        assert not isinstance(mapped.content, str)
+        return (text.as_tuple(), text.tokens[1], text.tokens[4:7]), \
+            (mapped.as_tuple(), mapped.tokens[1], mapped.tokens[4:7])
 
 
 class TestParserUnit:
@@ -393,4 +421,131 @@ not front-matter
         assert front_matter['title'] == "Delimiter Collision Document"
         assert "---" in body
         assert "+++" in body
-        assert "not front-matter" in body 
\ No newline at end of file
+        assert "not front-matter" in body 
+
+    def test_tokenizer_spans_index_original_content(self):
+        """Test that tokenizer spans slice the front-matter and body from the input."""
+        content = """<!-- ormd:0.1 -->
+---
+title: "Spans"
+authors: ["Test Author"]
+links: []
+---
+
+# Body
+
++++meta
+"""
+
+        tokens = tokenize_document(content)
+
+        assert tokens.has_version_tag
+        assert tokens.delimiter == '---'
+        yaml_text = content[tokens.yaml_span[0]:tokens.yaml_span[1]]
+        assert yaml_text.startswith('title: "Spans"')
+        assert yaml_text.endswith('links: []')
+        assert content[tokens.body_span[0]:tokens.body_span[1]] == "# Body\n\n+++meta"
+        assert tokens.has_legacy_meta
+        assert not tokens.has_legacy_end_meta
+        assert not tokens.has_secondary_delimiter
+
+    def test_version_tag_in_body_is_preserved(self):
+        """Test that only the leading version tag is consumed."""
+        content = """<!-- ormd:0.1 -->
+---
+title: "Quoting"
+authors: ["Test Author"]
+links: []
+---
+
+Example:
+
+<!-- ormd:0.1 -->
+"""
+
+        front_matter, body, metadata, errors = parse_document(content)
+
+        assert not errors
+        assert body.endswith("<!-- ormd:0.1 -->")
+
+    def test_lazy_parsed_document_matches_tuple_contract(self):
+        """Test that the lazy view exposes the same data as parse_document."""
+        content = """<!-- ormd:0.1 -->
++++
+title: "Lazy"
+authors: ["Test Author"]
+links:
+  - id: "a"
+    rel: "supports"
+    to: "#a"
++++
+
+# Heading
+
+See [[a]] and [[b]], then [[a]] again.
+Last line.
+"""
+
+        document = parse_document_lazy(content)
+
+        assert document.as_tuple() == parse_document(content)
+        assert document.front_matter_text.startswith('title: "Lazy"')
+        assert document.link_refs() == ["a", "b", "a"]
+        assert document.body_lines(0, 1) == ["# Heading"]
+        assert document.body_lines(3) == ["Last line."]
+        assert not hasattr(document, '__dict__')
+
+    def test_open_document_maps_file_lazily(self):
+        """Test that open_document parses from a memory map and decodes slices on demand."""
+        content = """<!-- ormd:0.1 -->
+---
+title: "Mapped Ünïcode"
+authors: ["Test Author"]
+links: []
+---
+
+# Body with [[réf]]
+"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "mapped.ormd"
+            path.write_bytes(content.encode('utf-8'))
+
+            with open_document(path) as document:
+                assert not isinstance(document.content, str)
+                assert document.as_tuple() == parse_document(content)
+                assert document.link_refs() == ["réf"]
+
+    def test_open_document_normalizes_crlf(self):
+        """Test that CRLF files parse the same way as with Path.read_text."""
+        content = "<!-- ormd:0.1 -->\r\n---\r\ntitle: CRLF\r\nauthors: [a]\r\nlinks: []\r\n---\r\n\r\nBody\r\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "crlf.ormd"
+            path.write_bytes(content.encode('utf-8'))
+
+            with open_document(path) as document:
+                assert document.as_tuple() == parse_document(path.read_text(encoding='utf-8'))
+                assert document.front_matter['title'] == "CRLF"
+
+    def test_byte_whitespace_matches_str_isspace(self):
+        """Test that the byte patterns count exactly the characters str.isspace does as whitespace."""
+        for code in range(sys.maxunicode + 1):
+            if 0xD800 <= code <= 0xDFFF:
+                continue
+            char = chr(code)
+            assert bool(_BYTES_SYNTAX.whitespace.fullmatch(char.encode('utf-8'))) == char.isspace(), hex(code)
+
+    @pytest.mark.parametrize("content", UNICODE_BOUNDARY_DOCS)
+    def test_open_document_matches_text_on_unicode_boundaries(self, tmp_path, content):
+        """Test that a memory-mapped file and its decoded text split the same way around non-ASCII characters."""
+        text, mapped = _parse_both(tmp_path, content)
+        assert mapped == text
+
+    def test_open_document_matches_text_on_random_documents(self, tmp_path):
+        """Test open_document against parse_document_lazy on random documents mixing tricky characters."""
+        pieces = ["<!-- ormd:0.1 -->", "---", "+++", "+++meta", "+++end-meta", "title: T", "\n", " ", "\t",
+                  "\u00a0", "\u2003", "\u3000", "\u0085", "\x1c", "é", "ß", "—", "x", "[[a]]"]
+        rng = random.Random(3)
+        for _ in range(400):
+            content = "<!-- ormd:0.1 -->\n" + "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+            text, mapped = _parse_both(tmp_path, content)
+            assert mapped == text, repr(content)
@@ -0,0 +1,187 @@
+"""Tests for the live preview behind `ormd serve`."""
+
+import json
+import os
+
+from ormd_cli.preview import PreviewSite, SourceWatcher, find_sources, section_keys
+from ormd_cli.server import EventHub, ORMDServer
+
+
+INTRO = """<!-- ormd:0.1 -->
+---
+title: Intro
+---
+# Intro
+
+See [[guide/setup]].
+
+## Part A
+
+Text a.
+
+## Part B
+
+Text b.
+"""
+
+SETUP = """<!-- ormd:0.1 -->
+---
+title: Setup
+---
+# Setup
+
+Hello.
+"""
+
+
+def _touch(path, text):
+    path.write_text(text, encoding="utf-8")
+    # Make the change visible to (mtime, size) snapshots on coarse clocks
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _drain(events):
+    messages = []
+    while not events.empty():
+        messages.append(events.get_nowait().decode("utf-8"))
+    return messages
+
+
+class TestSourceWatcher:
+    """Tests for finding changed sources."""
+
+    def test_polling(self, tmp_path):
+        """Test that edits, new files and removals are reported once each."""
+        (tmp_path / "guide").mkdir()
+        intro, setup = tmp_path / "intro.ormd", tmp_path / "guide" / "setup.ormd"
+        intro.write_text(INTRO, encoding="utf-8")
+        setup.write_text(SETUP, encoding="utf-8")
+        watcher = SourceWatcher(tmp_path, interval=0, use_inotify=False)
+        assert watcher.backend == "polling"
+        assert watcher.wait() == ([], [])
+
+        _touch(intro, INTRO + "\nMore.\n")
+        (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+        new = tmp_path / "guide" / "new.ormd"
+        new.write_text(SETUP, encoding="utf-8")
+        setup.unlink()
+        assert watcher.wait() == ([new, intro], [setup])
+        assert watcher.wait() == ([], [])
+
+    def test_single_file(self, tmp_path):
+        """Test that a watched file is its only source."""
+        intro = tmp_path / "intro.ormd"
+        intro.write_text(INTRO, encoding="utf-8")
+        (tmp_path / "other.ormd").write_text(SETUP, encoding="utf-8")
+        assert find_sources(intro) == [intro]
+        watcher = SourceWatcher(intro, interval=0)
+        _touch(intro, INTRO + "\nMore.\n")
+        assert watcher.wait() == ([intro], [])
+        watcher.close()
+
+
+class TestPreviewSite:
+    """Tests for rendering pages and announcing updates."""
+
+    def _site(self, root):
+        server = ORMDServer(("127.0.0.1", 0), events=EventHub())
+        self.servers.append(server)
+        site = PreviewSite(root, server)
+        site.build(find_sources(root))
+        return site
+
+    def setup_method(self):
+        self.servers = []
+
+    def teardown_method(self):
+        for server in self.servers:
+            server.server_close()
+
+    def test_section_keys(self):
+        """Test that repeated sections get distinct keys."""
+        keys, sections = section_keys(["<p>a</p>", "<p>b</p>", "<p>a</p>"])
+        assert len(set(keys)) == 3 and keys[2] == keys[0] + "-1"
+        assert [sections[key] for key in keys] == ["<p>a</p>", "<p>b</p>", "<p>a</p>"]
+
+    def test_pages(self, tmp_path):
+        """Test that a directory is served like a site, with cross-document links and a page list."""
+        (tmp_path / "guide").mkdir()
+        (tmp_path / "intro.ormd").write_text(INTRO, encoding="utf-8")
+        (tmp_path / "guide" / "setup.ormd").write_text(SETUP, encoding="utf-8")
+        site = self._site(tmp_path)
+        resources = site.server.resources
+        assert sorted(resources) == ["/guide/setup.html", "/guide/setup.ormd.txt", "/index.html", "/intro.html",
+                                     "/intro.ormd.txt"]
+        page = resources["/intro.html"].body.decode("utf-8")
+        assert 'href="guide/setup.html"' in page
+        assert page.count('class="ormd-section"') == 3
+        assert 'data-page="/intro.html" data-version="1"' in page
+        assert '<a href="/intro.html">Intro</a>' in resources["/index.html"].body.decode("utf-8")
+
+    def test_update_sends_changed_sections(self, tmp_path):
+        """Test that an edit re-renders only that document and sends only its new sections."""
+        (tmp_path / "guide").mkdir()
+        intro, setup = tmp_path / "intro.ormd", tmp_path / "guide" / "setup.ormd"
+        intro.write_text(INTRO, encoding="utf-8")
+        setup.write_text(SETUP, encoding="utf-8")
+        site = self._site(tmp_path)
+        hub = site.server.events
+        intro_events, setup_events = hub.subscribe("/intro.html"), hub.subscribe("/guide/setup.html")
+        _drain(intro_events), _drain(setup_events)
+        keys = site.pages[intro].keys
+
+        intro.write_text(INTRO.replace("Text b.", "Text b changed."), encoding="utf-8")
+        site.update([intro], [])
+        [message] = _drain(intro_events)
+        assert message.startswith("event: update\n")
+        assert '"version": "2", "previous": "1"' in message
+        new_keys = site.pages[intro].keys
+        assert new_keys[:2] == keys[:2] and new_keys[2] != keys[2]
+        update = json.loads(message.split("data: ", 1)[1])
+        assert list(update["html"]) == [new_keys[2]] and "Text b changed." in update["html"][new_keys[2]]
+        # The source is fetched on demand rather than sent with every update
+        assert "raw" not in update and update["source"] == "/intro.ormd.txt"
+        assert site.server.resources["/intro.ormd.txt"].body.decode("utf-8") == intro.read_text(encoding="utf-8")
+        assert _drain(setup_events) == []
+        assert "Text b changed." in site.server.resources["/intro.html"].body.decode("utf-8")
+
+    def test_removal_relinks(self, tmp_path):
+        """Test that removing a document drops its page and re-renders pages that linked to it."""
+        (tmp_path / "guide").mkdir()
+        intro, setup = tmp_path / "intro.ormd", tmp_path / "guide" / "setup.ormd"
+        intro.write_text(INTRO, encoding="utf-8")
+        setup.write_text(SETUP, encoding="utf-8")
+        site = self._site(tmp_path)
+        hub = site.server.events
+        intro_events, setup_events = hub.subscribe("/intro.html"), hub.subscribe("/guide/setup.html")
+        _drain(intro_events), _drain(setup_events)
+
+        setup.unlink()
+        site.update([], [setup])
+        assert "/guide/setup.html" not in site.server.resources
+        assert "/guide/setup.ormd.txt" not in site.server.resources
+        assert _drain(setup_events)[0].startswith("event: removed\n")
+        [message] = _drain(intro_events)
+        assert "ormd-link-undefined" in message
+        assert "guide/setup.ormd" not in site.server.resources["/index.html"].body.decode("utf-8")
+
+    def test_failed_render_keeps_page(self, tmp_path, monkeypatch):
+        """Test that a failing render keeps the last good page and tells open pages why."""
+        from ormd_cli.packager import ORMDPackager
+
+        doc = tmp_path / "doc.ormd"
+        doc.write_text(INTRO, encoding="utf-8")
+        site = self._site(doc)
+        assert list(site.server.resources) == ["/index.html", "/index.ormd.txt"]
+        events = site.server.events.subscribe("/index.html")
+        _drain(events)
+        good = site.server.resources["/index.html"]
+
+        def fail(self, path):
+            raise ValueError("broken")
+        monkeypatch.setattr(ORMDPackager, "read_source", fail)
+        site.update([doc], [])
+        [message] = _drain(events)
+        assert message.startswith("event: failed\n") and "broken" in message
+        assert site.server.resources["/index.html"] is good
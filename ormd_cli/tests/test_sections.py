@@ -0,0 +1,150 @@
+"""Tests for section-at-a-time rendering (`ormd render`)."""
+
+import io
+import os
+
+from ormd_cli.html_generator import MarkdownRenderer, RenderPipeline, lazy_main_html, write_render_file
+from ormd_cli.sections import can_split, iter_sections, section_starts
+
+
+FRONT_MATTER = '''<!-- ormd:0.1 -->
+---
+title: "Sections"
+authors: ["Test Author"]
+links:
+  - id: intro
+    rel: supports
+    to: "#api"
+---
+
+'''
+
+BODY = '''# API
+
+See [[intro]] and [[missing]].
+
+## Parameters
+
+```python
+# not a heading
+
+# nor this
+```
+
+## Returns
+
+# Other
+
+## Parameters
+
+## Parameters
+
+# Parameters_1
+
+A [[split
+# inside]] reference.
+
+# Last
+'''
+
+
+class TestSections:
+    """Tests for splitting a body into independently rendered sections."""
+
+    def test_split_points(self):
+        """Test that bodies split only before headings outside fences and references."""
+        sections = list(iter_sections(BODY))
+        assert ''.join(sections) == BODY
+        assert [s.splitlines()[0] for s in sections] == [
+            '# API', '## Parameters', '## Returns', '# Other',
+            '## Parameters', '## Parameters', '# Parameters_1', '# Last',
+        ]
+
+    def test_cross_section_features_prevent_splitting(self):
+        """Test that bodies using footnotes, reference definitions or explicit ids stay whole."""
+        for extra in ('x[^1]\n\n[^1]: note\n', '[x][r]\n\n[r]: https://example.com\n',
+                      '# Named {#named}\n', '<div>\n\n# inside\n\n</div>\n'):
+            body = BODY + '\n' + extra
+            assert not can_split(body)
+            assert section_starts(body) == [0]
+
+    def test_convert_sections_matches_convert(self):
+        """Test that repeated headings get the same ids as in a whole-document render."""
+        renderer = MarkdownRenderer()
+        expected = renderer.convert(BODY)
+        assert ''.join(renderer.convert_sections(iter_sections(BODY))) == expected
+        assert 'id="parameters_2"' in expected and 'href="#parameters_3"' in expected
+
+    def test_many_repeated_headings(self):
+        """Test that renumbering stays exact for headings repeated across many sections."""
+        body = ''.join(f'# Step\n\n## Step_{i % 3}\n\ntext\n\n' for i in range(60))
+        renderer = MarkdownRenderer()
+        assert ''.join(renderer.convert_sections(iter_sections(body))) == renderer.convert(body)
+
+
+class TestStreamingRender:
+    """Tests for writing `ormd render` output as it is produced."""
+
+    def test_same_html_as_render(self):
+        """Test that the streamed page equals the buffered one."""
+        pipeline = RenderPipeline()
+        raw = FRONT_MATTER + BODY
+        out = io.StringIO()
+        pipeline.write_render_html(raw, out, {'created': '2024-01-01'})
+        assert out.getvalue() == pipeline.render_html(pipeline.prepare(raw), {'created': '2024-01-01'})
+
+    def test_write_render_file(self, tmp_path):
+        """Test that the page replaces the output file and keeps its permissions."""
+        src = tmp_path / 'doc.ormd'
+        src.write_text(FRONT_MATTER + BODY, encoding='utf-8')
+        out = tmp_path / 'doc.html'
+        out.write_text('old', encoding='utf-8')
+        os.chmod(out, 0o644)
+        write_render_file(str(src), out)
+        assert '<h1 id="last">' in out.read_text(encoding='utf-8')
+        assert os.stat(out).st_mode & 0o777 == 0o644
+        assert not list(tmp_path.glob('.*.tmp'))
+
+    def test_external_raw_source(self, tmp_path):
+        """Test that --raw-source external writes the source beside the page, which links to it."""
+        src = tmp_path / 'doc.ormd'
+        src.write_text(FRONT_MATTER + BODY, encoding='utf-8')
+        write_render_file(str(src), tmp_path / 'doc.html', raw_source='external')
+        page = (tmp_path / 'doc.html').read_text(encoding='utf-8')
+        assert '<pre id="raw-content" data-src="doc.ormd.txt"></pre>' in page
+        assert (tmp_path / 'doc.ormd.txt').read_text(encoding='utf-8') == FRONT_MATTER + BODY
+
+
+class TestChunkedView:
+    """Tests for the `ormd open` page that loads a large body chunk by chunk."""
+
+    def test_chunks_join_to_body(self):
+        """Test that chunks split at headings and together are the whole body's HTML."""
+        pipeline = RenderPipeline()
+        raw = FRONT_MATTER + BODY
+        chunked = pipeline.prepare_chunked(raw, chunk_size=200)
+        assert len(chunked.chunks) > 2
+        assert ''.join(chunked.chunks) == chunked.document.main_html == pipeline.prepare(raw).main_html
+        assert all(chunk.startswith('<h') for chunk in chunked.chunks[1:])
+        ids = [heading.id for headings in chunked.headings for heading in headings]
+        assert ids[:4] == ['api', 'parameters', 'returns', 'other'] and 'parameters_2' in ids
+
+    def test_lazy_page(self):
+        """Test that the page holds the first chunk, a table of contents and placeholders for the rest."""
+        pipeline = RenderPipeline()
+        chunked = pipeline.prepare_chunked(FRONT_MATTER + BODY, chunk_size=200)
+        main_html = lazy_main_html(chunked, lambda n: f'chunks/{n}.html')
+        assert main_html.startswith('<nav class="ormd-toc"><ul><li class="ormd-toc-h1"><a href="#api">API</a></li>')
+        assert chunked.chunks[0] in main_html and chunked.chunks[-1] not in main_html
+        last = len(chunked.chunks) - 1
+        assert f'data-src="chunks/{last}.html" data-ids="last"></div>' in main_html
+        page = pipeline.lazy_view_html(chunked, lambda n: f'chunks/{n}.html')
+        assert main_html in page
+
+    def test_small_document_is_one_chunk(self):
+        """Test that a document under the chunk size gets the usual page."""
+        pipeline = RenderPipeline()
+        raw = FRONT_MATTER + BODY
+        chunked = pipeline.prepare_chunked(raw)
+        assert len(chunked.chunks) == 1
+        assert pipeline.lazy_view_html(chunked, str) == pipeline.view_html(pipeline.prepare(raw))
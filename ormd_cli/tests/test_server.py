@@ -0,0 +1,274 @@
+"""Tests for the local server behind `ormd open` and `ormd edit`."""
+
+import gzip
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ormd_cli.editing import SourceFile
+from ormd_cli.html_generator import edit_preview
+from ormd_cli.server import (EVENTS_PATH, PREVIEW_PATH, SOURCE_PATH, EventHub, ORMDServer, Resource, _asset_response,
+                             bind_server)
+from ormd_cli.template_cache import BUILTIN_TEMPLATE_DIR
+
+
+PAGE = "<html><body>" + "<p>Hello</p>" * 200 + "</body></html>"
+
+
+@pytest.fixture
+def server():
+    httpd = ORMDServer(("127.0.0.1", 0), {
+        "/index.html": Resource.html(PAGE),
+        "/chunks/1.html": Resource.html("<p>chunk</p>"),
+    }, EventHub())
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _refused_then_closed(server, method, path, headers="", host=None):
+    """Send a refused request whose body is itself a request; whether only the refusal came back."""
+    address = "%s:%d" % server.server_address
+    smuggled = f"GET /index.html HTTP/1.1\r\nHost: {address}\r\n\r\n".encode("ascii")
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(f"{method} {path} HTTP/1.1\r\nHost: {host or address}\r\n{headers}"
+                     f"Content-Length: {len(smuggled)}\r\n\r\n".encode("ascii") + smuggled)
+        received = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received += chunk
+    return received.startswith(b"HTTP/1.1 4") and received.count(b"HTTP/1.1 ") == 1
+
+
+def _get(server, path, headers=None, connection=None):
+    conn = connection or http.client.HTTPConnection(*server.server_address, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+class TestAssets:
+    """Tests for page assets served from the package."""
+
+    def test_vendored_script(self):
+        """Test that a vendored library is served as JavaScript."""
+        body, content_type = _asset_response("vendor/js-yaml-4.1.0.min.js")
+        assert content_type == "text/javascript; charset=utf-8"
+        assert body == (BUILTIN_TEMPLATE_DIR / "vendor" / "js-yaml-4.1.0.min.js").read_bytes()
+
+    def test_only_listed_assets(self):
+        """Test that names outside the asset list are not served."""
+        assert _asset_response("view_template.html") is None
+        assert _asset_response("vendor/../../server.py") is None
+        assert _asset_response("vendor/js-yaml-LICENSE") is None
+
+
+class TestORMDServer:
+    """Tests for serving pages from memory."""
+
+    def test_page_and_files(self, server):
+        """Test that the page is served at / and further files at their paths, nothing else."""
+        response, body = _get(server, "/")
+        assert response.status == 200 and body.decode("utf-8") == PAGE
+        assert response.getheader("Content-Type") == "text/html; charset=utf-8"
+        assert _get(server, "/chunks/1.html?x=1")[1] == b"<p>chunk</p>"
+        assert _get(server, "/../server.py")[0].status == 404
+
+    def test_etag(self, server):
+        """Test that a request with the current ETag gets 304 Not Modified."""
+        response, _ = _get(server, "/index.html")
+        etag = response.getheader("ETag")
+        response, body = _get(server, "/index.html", {"If-None-Match": etag})
+        assert response.status == 304 and body == b""
+        assert _get(server, "/index.html", {"If-None-Match": '"other"'})[0].status == 200
+
+    def test_gzip(self, server):
+        """Test that large bodies are gzipped for clients that accept it."""
+        response, body = _get(server, "/", {"Accept-Encoding": "gzip, deflate"})
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert gzip.decompress(body).decode("utf-8") == PAGE
+        response, body = _get(server, "/chunks/1.html", {"Accept-Encoding": "gzip"})
+        assert response.getheader("Content-Encoding") is None  # Too small to be worth it
+        assert _get(server, "/", {"Accept-Encoding": "gzip;q=0"})[0].getheader("Content-Encoding") is None
+
+    def test_assets_are_cached_for_good(self, server):
+        """Test that vendored scripts are served with immutable caching."""
+        response, body = _get(server, "/_ormd/vendor/js-yaml-4.1.0.min.js")
+        assert response.status == 200 and body.startswith(b"/*! js-yaml 4.1.0")
+        assert "immutable" in response.getheader("Cache-Control")
+
+    def test_keep_alive_and_concurrency(self, server):
+        """Test that one connection serves several requests and connections are served in parallel."""
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        for _ in range(3):
+            assert _get(server, "/chunks/1.html", connection=conn)[0].status == 200
+        # A connection left idle must not block the others
+        with ThreadPoolExecutor(8) as pool:
+            statuses = list(pool.map(lambda _: _get(server, "/")[0].status, range(16)))
+        assert statuses == [200] * 16
+        conn.close()
+
+
+class TestEvents:
+    """Tests for Server-Sent Events."""
+
+    def test_stream(self, server):
+        """Test that a page receives the last event of its topic and then new ones, and no others."""
+        server.events.publish("/index.html", "update", {"version": "1"})
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        conn.request("GET", EVENTS_PATH + "?topic=/index.html")
+        response = conn.getresponse()
+        assert response.getheader("Content-Type") == "text/event-stream; charset=utf-8"
+        assert response.readline() == b"retry: 1000\n"
+        response.readline()
+        assert response.readline() == b"event: update\n"
+        assert response.readline() == b'data: {"version": "1"}\n'
+        response.readline()
+
+        server.events.publish("/other.html", "update", {"version": "5"})
+        server.events.publish("/index.html", "removed", {"version": "1"})
+        assert response.readline() == b"event: removed\n"
+        conn.close()
+
+
+class TestSource:
+    """Tests for saving the edited document."""
+
+    @pytest.fixture
+    def edit_server(self, tmp_path):
+        path = tmp_path / "doc.ormd"
+        path.write_text("<!-- ormd:0.1 -->\n---\ntitle: T\nauthors: [A]\nlinks: []\n---\n\n# T\n", encoding="utf-8")
+        httpd = ORMDServer(("127.0.0.1", 0), source=SourceFile(path, refresh_metadata=False))
+        thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        yield httpd
+        httpd.shutdown()
+        httpd.server_close()
+
+    def _patch(self, server, data, headers=None):
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        conn.request("PATCH", SOURCE_PATH, json.dumps(data), {"Content-Type": "application/json", **(headers or {})})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def test_patch(self, edit_server):
+        """Test that the source is served with its version, and a patch against it is saved."""
+        response, body = _get(edit_server, SOURCE_PATH)
+        version = response.getheader("ETag")
+        lines = body.decode("utf-8").split("\n")
+        response, body = self._patch(edit_server, {"base": version, "edits": [
+            {"start": len(lines) - 1, "end": len(lines) - 1, "lines": ["Added."]}]})
+        result = json.loads(body)
+        assert response.status == 200 and result["validation"]["valid"]
+        assert edit_server.source.path.read_text(encoding="utf-8").endswith("# T\nAdded.\n")
+        assert _get(edit_server, SOURCE_PATH)[0].getheader("ETag") == result["version"]
+
+        response, body = self._patch(edit_server, {"base": version, "edits": []})
+        assert response.status == 409 and json.loads(body)["version"] == result["version"]
+
+    def test_refused(self, edit_server):
+        """Test that malformed and cross-site requests are refused."""
+        assert self._patch(edit_server, {"edits": "x"})[0].status == 400
+        assert self._patch(edit_server, {"base": None, "edits": []}, {"Origin": "http://example.com"})[0].status == 403
+
+    def test_refusal_closes_connection(self, edit_server, server):
+        """Test that a request refused before its body is read does not leave the body to be read next."""
+        assert _refused_then_closed(server, "PUT", SOURCE_PATH)
+        assert _refused_then_closed(edit_server, "PATCH", SOURCE_PATH, "Origin: http://example.com\r\n")
+        assert _refused_then_closed(edit_server, "POST", PREVIEW_PATH)
+        assert _refused_then_closed(edit_server, "PUT", SOURCE_PATH, host="attacker.example")
+
+    def test_version_required(self, edit_server):
+        """Test that saves that do not name the version they are based on are refused."""
+        original = edit_server.source.path.read_text(encoding="utf-8")
+        assert self._patch(edit_server, {"edits": []})[0].status == 428
+        conn = http.client.HTTPConnection(*edit_server.server_address, timeout=5)
+        conn.request("PUT", SOURCE_PATH, "Overwritten.\n")
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 428
+        assert edit_server.source.path.read_text(encoding="utf-8") == original
+
+        version = _get(edit_server, SOURCE_PATH)[0].getheader("ETag")
+        conn.request("PUT", SOURCE_PATH, original + "More.\n", {"If-Match": version})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+
+    def test_foreign_host_refused(self, edit_server):
+        """Test that requests addressed to another host name (DNS rebinding) are refused."""
+        assert _get(edit_server, SOURCE_PATH, {"Host": "attacker.example:80"})[0].status == 403
+        version = _get(edit_server, SOURCE_PATH)[0].getheader("ETag")
+        assert self._patch(edit_server, {"base": version, "edits": []}, {"Host": "attacker.example"})[0].status == 403
+        port = edit_server.server_address[1]
+        assert _get(edit_server, SOURCE_PATH, {"Host": f"localhost:{port}"})[0].status == 200
+
+    def test_bound_to_loopback(self, tmp_path):
+        """Test that a server that can save the file listens on 127.0.0.1 only."""
+        path = tmp_path / "doc.ormd"
+        path.write_text("# T\n", encoding="utf-8")
+        httpd = bind_server(0, source=SourceFile(path))
+        try:
+            assert httpd.server_address[0] == "127.0.0.1"
+        finally:
+            httpd.server_close()
+        httpd = bind_server(0)
+        try:
+            assert httpd.server_address[0] == "0.0.0.0"
+        finally:
+            httpd.server_close()
+
+
+class TestPreview:
+    """Tests for rendering the editor's preview."""
+
+    DOCUMENT = ("<!-- ormd:0.1 -->\n---\ntitle: T\nauthors: [A]\nlinks:\n  - id: spec\n    rel: supports\n"
+                "    to: \"spec.ormd\"\n---\n\n# Heading\n\n- one\n- two\n\nSee [[spec]] and [a link](b.html).\n\n"
+                "```python\nx = 1\n```\n")
+
+    @pytest.fixture
+    def edit_server(self):
+        httpd = ORMDServer(("127.0.0.1", 0), preview=edit_preview)
+        thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        yield httpd
+        httpd.shutdown()
+        httpd.server_close()
+
+    def _post(self, server, text, headers=None):
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        conn.request("POST", PREVIEW_PATH, text.encode("utf-8"), headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def test_rendered_like_the_page(self, edit_server):
+        """Test that the preview is the body HTML `ormd render` produces."""
+        response, body = self._post(edit_server, self.DOCUMENT)
+        assert response.status == 200
+        html = json.loads(body)["html"]
+        assert html == edit_preview(self.DOCUMENT)["html"]
+        assert '<h1 id="heading">Heading' in html
+        assert "<li>one</li>" in html and '<a href="b.html">a link</a>' in html
+        assert 'class="ormd-link ormd-link-supports"' in html and "<pre" in html
+
+    def test_refused(self, edit_server, server):
+        """Test that cross-site and foreign-host requests are refused, and other servers do not render."""
+        assert self._post(edit_server, self.DOCUMENT, {"Origin": "http://example.com"})[0].status == 403
+        assert self._post(edit_server, self.DOCUMENT, {"Host": "attacker.example"})[0].status == 403
+        assert self._post(server, self.DOCUMENT)[0].status == 404
+
+    def test_bound_to_loopback(self):
+        """Test that a server that renders previews listens on 127.0.0.1 only."""
+        httpd = bind_server(0, preview=edit_preview)
+        try:
+            assert httpd.server_address[0] == "127.0.0.1"
+        finally:
+            httpd.server_close()
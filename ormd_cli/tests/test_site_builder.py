@@ -0,0 +1,183 @@
+"""Tests for static site rendering (`ormd render --site`)."""
+
+import ast
+import json
+import os
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from ormd_cli import site_builder
+from ormd_cli.main import cli
+from ormd_cli.site_builder import _RENDER_MODULES, MANIFEST_NAME, PageLinks, SiteIndex, build_site
+
+
+HOME = '''<!-- ormd:0.1 -->
+---
+title: "Home"
+authors: ["Test Author"]
+links:
+  - id: setup
+    rel: supports
+    to: "guide/intro.ormd#setup"
+  - id: external
+    rel: related
+    to: "https://example.com/doc.ormd"
+---
+
+# Home
+
+See [[setup]], [[external]], [[intro]] and [[missing]].
+'''
+
+INTRO = '''<!-- ormd:0.1 -->
+---
+title: "Intro"
+authors: ["Test Author"]
+links: []
+---
+
+# Setup
+
+Back to [[index]].
+'''
+
+
+def _make_site(tmp_path):
+    src = tmp_path / "src"
+    (src / "guide").mkdir(parents=True)
+    (src / "index.ormd").write_text(HOME, encoding='utf-8')
+    (src / "guide" / "intro.ormd").write_text(INTRO, encoding='utf-8')
+    return src, tmp_path / "out"
+
+
+def _bump_mtime(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestSiteLinks:
+    """Unit tests for cross-document link resolution."""
+
+    def test_targets(self):
+        """Test that .ormd targets and document ids become URLs relative to the page."""
+        index = SiteIndex(["index.ormd", "guide/intro.ormd", "a/notes.ormd", "b/notes.ormd"])
+        links = PageLinks("guide/intro.html", index)
+        assert links.target_url("other.ormd#part") == "other.html#part"
+        assert links.target_url("/index.ormd") == "../index.html"
+        assert links.target_url("#local") == "#local"
+        assert links.target_url("https://example.com/x.ormd") == "https://example.com/x.ormd"
+        assert links.document_url("index") == "../index.html"
+        assert links.document_url("guide/intro#setup") == "intro.html#setup"
+        assert links.document_url("a/notes") == "../a/notes.html"
+        assert links.document_url("notes") is None  # Ambiguous file name
+        assert links.resolved == {"index": "../index.html", "guide/intro#setup": "intro.html#setup",
+                                  "a/notes": "../a/notes.html", "notes": None}
+
+
+class TestBuildSite:
+    """Tests for building and incrementally rebuilding a site."""
+
+    def test_build(self, tmp_path):
+        """Test that every document is rendered with shared assets and resolved links."""
+        src, out = _make_site(tmp_path)
+        build = build_site(str(src), str(out))
+        assert sorted(build.rendered) == ["guide/intro.ormd", "index.ormd"]
+        assert not build.failed
+        assert (out / "_ormd" / "ormd.css").exists() and (out / "_ormd" / "ormd.js").exists()
+
+        home = (out / "index.html").read_text(encoding='utf-8')
+        assert '<link rel="stylesheet" href="_ormd/ormd.css">' in home
+        assert '<style>' not in home
+        assert 'href="guide/intro.html#setup"' in home
+        assert 'href="https://example.com/doc.ormd"' in home
+        assert 'href="guide/intro.html" class="ormd-link ormd-link-document"' in home
+        assert 'ormd-link-undefined">missing<' in home
+
+        intro = (out / "guide" / "intro.html").read_text(encoding='utf-8')
+        assert '<script src="../_ormd/ormd.js"></script>' in intro
+        assert 'href="../index.html" class="ormd-link ormd-link-document"' in intro
+
+    def test_incremental(self, tmp_path):
+        """Test that only changed pages, and pages whose links changed, are rendered again."""
+        src, out = _make_site(tmp_path)
+        build_site(str(src), str(out))
+
+        build = build_site(str(src), str(out))
+        assert build.rendered == [] and len(build.up_to_date) == 2
+
+        _bump_mtime(src / "index.ormd")  # Touched, content unchanged
+        assert build_site(str(src), str(out)).rendered == []
+
+        (src / "guide" / "intro.ormd").write_text(INTRO + "\nMore.\n", encoding='utf-8')
+        assert build_site(str(src), str(out)).rendered == ["guide/intro.ormd"]
+
+        # Removing a document removes its page and relinks pages that pointed at it
+        (src / "guide" / "intro.ormd").unlink()
+        build = build_site(str(src), str(out))
+        assert build.removed == ["guide/intro.ormd"]
+        assert build.rendered == ["index.ormd"]
+        assert not (out / "guide" / "intro.html").exists()
+        assert 'ormd-link-undefined">intro<' in (out / "index.html").read_text(encoding='utf-8')
+
+        (out / "index.html").unlink()
+        assert build_site(str(src), str(out)).rendered == ["index.ormd"]
+        assert build_site(str(src), str(out), force=True).rendered == ["index.ormd"]
+
+    def test_external_raw_source(self, tmp_path):
+        """Test that --raw-source external writes each source next to its page and cleans up after."""
+        src, out = _make_site(tmp_path)
+        build_site(str(src), str(out), raw_source='external')
+        intro = (out / "guide" / "intro.html").read_text(encoding='utf-8')
+        assert '<pre id="raw-content" data-src="intro.ormd.txt"></pre>' in intro
+        assert (out / "guide" / "intro.ormd.txt").read_text(encoding='utf-8') == INTRO
+        assert build_site(str(src), str(out), raw_source='external').rendered == []
+
+        (src / "guide" / "intro.ormd").unlink()
+        build_site(str(src), str(out), raw_source='external')
+        assert not (out / "guide" / "intro.ormd.txt").exists()
+
+        # Another mode renders every page again and drops the source files
+        assert build_site(str(src), str(out)).rendered == ["index.ormd"]
+        assert not (out / "index.ormd.txt").exists()
+
+    def test_manifest_from_other_version_is_ignored(self, tmp_path):
+        """Test that a manifest written by a different renderer forces a full build."""
+        src, out = _make_site(tmp_path)
+        build_site(str(src), str(out))
+        manifest = json.loads((out / MANIFEST_NAME).read_text(encoding='utf-8'))
+        manifest['fingerprint'] = 'old'
+        (out / MANIFEST_NAME).write_text(json.dumps(manifest), encoding='utf-8')
+        assert len(build_site(str(src), str(out)).rendered) == 2
+
+    def test_render_site_command(self, tmp_path):
+        """Test `ormd render --site` end to end, including worker processes."""
+        src, out = _make_site(tmp_path)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["render", "--site", str(src), "-o", str(out), "--jobs", "2"])
+        assert result.exit_code == 0, result.output
+        assert (out / "guide" / "intro.html").exists()
+
+        result = runner.invoke(cli, ["render", "--site", str(src)])
+        assert result.exit_code != 0
+        assert "output directory" in result.output
+
+    def test_render_extra_argument_refused(self, tmp_path):
+        """Test that `ormd render DOC OUT` is an error rather than a site build into OUT."""
+        (tmp_path / "doc.ormd").write_text(INTRO, encoding='utf-8')
+        result = CliRunner().invoke(cli, ["render", str(tmp_path / "doc.ormd"), str(tmp_path / "doc.html")])
+        assert result.exit_code != 0
+        assert not (tmp_path / "doc.html").exists()
+
+    def test_fingerprint_covers_render_imports(self):
+        """Test that every package module a rendering module imports is part of the site fingerprint."""
+        package_dir = Path(site_builder.__file__).parent
+        # Modules that do not change what a page looks like
+        unrelated = {'utils.py', 'logger.py', 'batch.py', 'cache.py'}
+        for name in _RENDER_MODULES:
+            tree = ast.parse((package_dir / name).read_text(encoding='utf-8'))
+            for node in ast.walk(tree):
+                if isinstance(node, ast.ImportFrom) and node.level == 1:
+                    imported = [node.module] if node.module else [alias.name for alias in node.names]
+                    for module in imported:
+                        assert f"{module}.py" in _RENDER_MODULES + tuple(unrelated), (name, module)
@@ -0,0 +1,84 @@
+"""Tests for lazy command imports and ``ormd --startup-profile``."""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from ormd_cli.startup import format_report, parse_importtime_line
+
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+VALID_DOC = '''<!-- ormd:0.1 -->
+---
+title: "Startup Document"
+authors: ["Test Author"]
+links: []
+---
+
+# Content
+'''
+
+
+def _run(args, **kwargs):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get('PYTHONPATH')])))
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, **kwargs)
+
+
+class TestStartup:
+    """Start-up cost tests for the ORMD CLI."""
+
+    def test_parse_importtime_line(self):
+        """Test parsing of -X importtime output lines."""
+        timing = parse_importtime_line("import time:       594 |      23551 |     pdfminer.pdfpage\n")
+        assert timing.module == "pdfminer.pdfpage"
+        assert timing.self_us == 594
+        assert timing.cumulative_us == 23551
+        assert timing.depth == 2
+        assert parse_importtime_line("✅ doc.ormd is valid ORMD 0.1\n") is None
+
+    def test_format_report_orders_by_cumulative_time(self):
+        """Test that the report lists the slowest imports first."""
+        timings = [parse_importtime_line(line) for line in (
+            "import time:       100 |        100 |   fast\n",
+            "import time:      2000 |       5000 | slow\n",
+        )]
+        report = format_report(timings, ['validate', 'doc.ormd'])
+        assert "ormd validate doc.ormd" in report
+        assert report.index("slow") < report.index("fast")
+
+    def test_validate_does_not_import_heavy_dependencies(self):
+        """Test that validate never loads the PDF stack, markdown or the HTTP server."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(VALID_DOC, encoding='utf-8')
+            script = (
+                "import json, sys\n"
+                "from ormd_cli.main import cli\n"
+                "try:\n"
+                "    cli(['validate', sys.argv[1], '--no-cache'])\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "heavy = ('pdfminer', 'markdown', 'http.server')\n"
+                "print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in heavy or m in heavy)))\n"
+            )
+            result = _run(['-c', script, str(doc)])
+
+        assert result.returncode == 0, result.stderr
+        assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+    def test_startup_profile_reports_imports(self):
+        """Test that --startup-profile runs the command and reports import times."""
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = Path(tmp) / "doc.ormd"
+            doc.write_text(VALID_DOC, encoding='utf-8')
+            result = _run(['-m', 'ormd_cli.main', '--startup-profile', 'validate', str(doc), '--no-cache'])
+
+        assert result.returncode == 0, result.stderr
+        assert "is valid ORMD 0.1" in result.stderr
+        assert "Startup import profile" in result.stderr
+        assert "ormd_cli.main" in result.stderr
+        assert "import time:" not in result.stderr
@@ -0,0 +1,130 @@
+"""Tests for the compiled template cache."""
+
+import os
+import re
+
+import pytest
+from click.testing import CliRunner
+
+from ormd_cli import template_cache
+from ormd_cli.main import cli
+from ormd_cli.template_cache import (
+    BUILTIN_TEMPLATE_DIR,
+    TEMPLATE_PATH_ENV,
+    CompiledTemplate,
+    TemplateCache,
+    VENDOR_ASSETS,
+)
+
+
+VIEW_VALUES = dict(title="T", raw_ormd="raw {x}", raw_attrs="", main_html="<p>{body}</p>", history="h", links_json="[]",
+                   styles="<style></style>", scripts="<script></script>")
+EDIT_VALUES = dict(title="T", raw_ormd_escaped="raw", main_html="<p>m</p>", history="h",
+                   file_name="doc.ormd", file_path_safe="docs/doc.ormd", save_url="/_ormd/source",
+                   preview_url="/_ormd/preview")
+
+
+class TestCompiledTemplate:
+    """Unit tests for pre-split templates."""
+
+    @pytest.mark.parametrize("name, values", [
+        ("view_template.html", VIEW_VALUES),
+        ("edit_template.html", EDIT_VALUES),
+    ])
+    def test_fill_matches_format(self, name, values):
+        """Test that filling a built-in template gives the same result as str.format."""
+        source = (BUILTIN_TEMPLATE_DIR / name).read_text(encoding='utf-8')
+        assert CompiledTemplate(source).fill(**values) == source.format(**values)
+
+    def test_slots(self):
+        """Test slot discovery, repeated slots and literal braces."""
+        template = CompiledTemplate("{{x}} {a}-{b}-{a}")
+        assert template.slot_names == ["a", "b", "a"]
+        assert template.fill(a=1, b="two") == "{x} 1-two-1"
+
+    @pytest.mark.parametrize("source", ["{a.b}", "{0}", "{a!r}", "{a:>4}", "{}"])
+    def test_unsupported_slot(self, source):
+        """Test that only plain named slots are accepted."""
+        with pytest.raises(ValueError):
+            CompiledTemplate(source)
+
+    def test_missing_value(self):
+        """Test that a slot without a value is an error, as with str.format."""
+        with pytest.raises(KeyError):
+            CompiledTemplate("{a}").fill()
+
+
+class TestTemplateCache:
+    """Unit tests for template lookup and reloading."""
+
+    def test_builtin_is_cached(self):
+        """Test that an unchanged template is compiled once."""
+        cache = TemplateCache()
+        template = cache.get("view_template.html")
+        assert template.path == BUILTIN_TEMPLATE_DIR / "view_template.html"
+        assert cache.get("view_template.html") is template
+
+    def test_reloads_edited_template(self, tmp_path):
+        """Test that a changed file is recompiled on the next lookup."""
+        path = tmp_path / "page.html"
+        path.write_text("<p>{a}</p>", encoding='utf-8')
+        cache = TemplateCache([tmp_path])
+        assert cache.get("page.html").fill(a=1) == "<p>1</p>"
+
+        path.write_text("<div>{a}</div>", encoding='utf-8')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert cache.get("page.html").fill(a=1) == "<div>1</div>"
+
+    def test_search_order(self, tmp_path, monkeypatch):
+        """Test that $ORMD_TEMPLATE_PATH comes before added directories, which come before the built-ins."""
+        env_dir, user_dir = tmp_path / "env", tmp_path / "user"
+        env_dir.mkdir()
+        user_dir.mkdir()
+        (user_dir / "view_template.html").write_text("user {title}", encoding='utf-8')
+        cache = TemplateCache([user_dir])
+        assert cache.get("view_template.html").source == "user {title}"
+        assert cache.get("edit_template.html").path == BUILTIN_TEMPLATE_DIR / "edit_template.html"
+
+        (env_dir / "view_template.html").write_text("env {title}", encoding='utf-8')
+        monkeypatch.setenv(TEMPLATE_PATH_ENV, str(env_dir))
+        assert cache.get("view_template.html").source == "env {title}"
+
+    def test_not_found(self, tmp_path):
+        """Test that a template missing from every directory raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            TemplateCache([tmp_path]).get("missing.html")
+
+    def test_template_dir_option(self, tmp_path, monkeypatch):
+        """Test that `ormd --template-dir` renders with the user's template."""
+        monkeypatch.setattr(template_cache, "_cache", TemplateCache())
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        (templates / "view_template.html").write_text(
+            "<title>{title}</title>{main_html}<!-- {raw_ormd}{history}{links_json} -->", encoding='utf-8')
+        doc = tmp_path / "doc.ormd"
+        doc.write_text('<!-- ormd:0.1 -->\n---\ntitle: "Custom"\nauthors: ["A"]\n---\n\n# Hello\n',
+                       encoding='utf-8')
+        out = tmp_path / "doc.html"
+
+        result = CliRunner().invoke(cli, ["--template-dir", str(templates), "render", str(doc), "--out", str(out)])
+        assert result.exit_code == 0, result.output
+        html = out.read_text(encoding='utf-8')
+        assert html.startswith("<title>Custom</title>")
+        assert 'id="hello"' in html
+
+    def test_pages_do_not_use_the_network(self):
+        """Test that no builtin template or asset loads anything from another host."""
+        for path in BUILTIN_TEMPLATE_DIR.iterdir():
+            if path.suffix in ('.html', '.css', '.js'):
+                assert not re.search(r'(src|href)="(https?:)?//', path.read_text(encoding='utf-8')), path.name
+
+    def test_vendored_scripts_are_shipped(self):
+        """Test that every vendored script a builtin template loads is listed and shipped."""
+        referenced = set()
+        for path in BUILTIN_TEMPLATE_DIR.iterdir():
+            if path.suffix in ('.html', '.js'):
+                referenced.update(re.findall(r'/_ormd/(vendor/[^"\']+)', path.read_text(encoding='utf-8')))
+        assert referenced <= set(VENDOR_ASSETS)
+        for name in VENDOR_ASSETS:
+            assert (BUILTIN_TEMPLATE_DIR / name).is_file(), name
@@ -549,4 +549,79 @@ Final paragraph with five exact words.
             assert word_count < 50  # But not excessive
             
         finally:
-            os.unlink(temp_path) 
\ No newline at end of file
+            os.unlink(temp_path) 
+    def test_update_skips_unchanged_body(self):
+        """Test that an unchanged body leaves the file and its mtime untouched."""
+        content = '''<!-- ormd:0.1 -->
+---
+title: "Digest Test"
+authors: ["Test Author"]
+links: []
+---
+
+# Content
+
+Some content that will not change.
+'''
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ormd', delete=False) as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            updater = ORMDUpdater()
+            result1 = updater.update_file(temp_path)
+            assert result1['updated']
+            assert result1['changes']['metrics']['new']['body_digest']
+            
+            mtime = os.stat(temp_path).st_mtime_ns
+            updated_content = Path(temp_path).read_text()
+            
+            result2 = updater.update_file(temp_path)
+            assert not result2['updated']
+            assert os.stat(temp_path).st_mtime_ns == mtime
+            assert Path(temp_path).read_text() == updated_content
+            
+            # force_update always recomputes
+            result3 = updater.update_file(temp_path, dry_run=True, force_update=True)
+            assert 'dates' in result3['changes']
+            
+        finally:
+            os.unlink(temp_path)
+
+    def test_update_detects_changed_body(self):
+        """Test that editing the body after an update refreshes metrics and dates."""
+        content = '''<!-- ormd:0.1 -->
+---
+title: "Digest Test"
+authors: ["Test Author"]
+links: []
+---
+
+# Content
+
+Short body.
+'''
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ormd', delete=False) as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            updater = ORMDUpdater()
+            first = updater.update_file(temp_path)
+            old_metrics = first['changes']['metrics']['new']
+            
+            text = Path(temp_path).read_text()
+            Path(temp_path).write_text(text.replace("Short body.", "A somewhat longer body with [[ref]]."))
+            
+            result = updater.update_file(temp_path)
+            assert result['updated']
+            new_metrics = result['changes']['metrics']['new']
+            assert new_metrics['word_count'] > old_metrics['word_count']
+            assert new_metrics['body_digest'] != old_metrics['body_digest']
+            assert result['changes']['link_ids']['new'] == ['ref']
+            assert result['changes']['dates']['new']['modified'] != first['changes']['dates']['new']['modified']
+            
+        finally:
+            os.unlink(temp_path)
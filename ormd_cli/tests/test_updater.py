@@ -97,6 +97,27 @@ Simple content for testing.
         finally:
             os.unlink(temp_path)
 
+    def test_update_text(self):
+        """Test that text in memory gets the same refresh as a file, and none once it is current."""
+        content = '''<!-- ormd:0.1 -->
+---
+title: "Test Document"
+authors: ["Test Author"]
+links: []
+---
+
+# Test Document
+
+Simple content with [[a-link]].
+'''
+        updater = ORMDUpdater()
+        updated, changes = updater.update_text(content)
+        assert set(changes) == {'dates', 'metrics', 'link_ids', 'asset_ids'}
+        front_matter, body, _, _ = parse_document(updated)
+        assert front_matter['link_ids'] == ['a-link']
+        assert body == parse_document(content)[1]
+        assert updater.update_text(updated) == (None, {})
+
     def test_locked_fields(self):
         """Test that locked fields are not updated."""
         content = '''<!-- ormd:0.1 -->
@@ -200,6 +200,40 @@ This references [[used-link]] but not the other one.
         finally:
             os.unlink(temp_path)
 
+    def test_semantic_link_consistency_duplicate_ids(self):
+        """Test errors for link ids defined more than once."""
+        content = '''<!-- ormd:0.1 -->
+---
+title: "Test Document"
+authors: ["Test Author"]
+links:
+  - id: "shared"
+    rel: "supports"
+    to: "#first"
+  - id: "shared"
+    rel: "refutes"
+    to: "#second"
+---
+
+# Test Document
+
+This references [[shared]].
+'''
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.ormd', delete=False) as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            validator = ORMDValidator()
+            result = validator.validate_file(temp_path)
+            
+            assert not result
+            assert any("'shared' is defined more than once" in error for error in validator.errors)
+            
+        finally:
+            os.unlink(temp_path)
+
     def test_link_ids_consistency_outdated(self):
         """Test detection of outdated link_ids field."""
         content = '''<!-- ormd:0.1 -->
@@ -0,0 +1,149 @@
+"""Tests for the long-lived server behind `ormd workspace`."""
+
+import json
+import zipfile
+
+from ormd_cli.server import bind_server
+from ormd_cli.workspace import CachedPage, PageCache, Workspace, index_document
+
+
+INTRO = """<!-- ormd:0.1 -->
+---
+title: Intro
+authors: [Ann]
+links:
+  - id: home
+    rel: supports
+    to: "#intro"
+permissions:
+  editable: false
+---
+# Intro
+
+See [[guide/setup]] and [[home]].
+"""
+
+SETUP = """<!-- ormd:0.1 -->
+---
+title: Setup
+---
+# Setup
+
+![Diagram](img/diagram.png)
+"""
+
+
+def _workspace(tmp_path, max_pages=256):
+    (tmp_path / "guide").mkdir()
+    (tmp_path / "intro.ormd").write_text(INTRO, encoding="utf-8")
+    (tmp_path / "guide" / "setup.ormd").write_text(SETUP, encoding="utf-8")
+    workspace = Workspace(tmp_path, max_pages)
+    workspace.load()
+    return workspace
+
+
+class TestIndex:
+    """Tests for the in-memory document index."""
+
+    def test_index_document(self, tmp_path):
+        """Test that an entry holds the title, links, ids and permissions."""
+        (tmp_path / "intro.ormd").write_text(INTRO, encoding="utf-8")
+        source, entry, error = index_document(str(tmp_path / "intro.ormd"), str(tmp_path))
+        assert (source, error) == ("intro.ormd", None)
+        assert entry.page == "intro.html"
+        assert entry.title == "Intro"
+        assert [link["id"] for link in entry.links] == ["home"]
+        assert entry.link_ids == ["guide/setup", "home"]
+        assert entry.permissions == {"editable": False}
+
+    def test_load(self, tmp_path):
+        """Test that every document is indexed and served as JSON."""
+        workspace = _workspace(tmp_path)
+        assert sorted(workspace.index.entries) == ["guide/setup.ormd", "intro.ormd"]
+        assert workspace.index.entries["guide/setup.ormd"].asset_ids == ["img/diagram.png"]
+        data = json.loads(workspace.page("/index.json").body)
+        assert [doc["source"] for doc in data["documents"]] == ["guide/setup.ormd", "intro.ormd"]
+        listing = workspace.page("/").body.decode("utf-8")
+        assert 'href="/guide/setup.html"' in listing and "Intro" in listing
+
+    def test_unreadable_document(self, tmp_path):
+        """Test that a document that fails to parse is listed as failed, not dropped."""
+        workspace = _workspace(tmp_path)
+        broken = tmp_path / "broken.ormd"
+        with zipfile.ZipFile(broken, "w") as zf:
+            zf.writestr("content.ormd", b"\xff\xfe not utf-8")
+        workspace.update([broken], [])
+        assert "broken.ormd" in workspace.index.failed
+        assert "broken.html" in workspace.index.pages
+
+
+class TestPages:
+    """Tests for rendering pages on demand."""
+
+    def test_rendered_once(self, tmp_path):
+        """Test that a page is rendered on first request and then served from the cache."""
+        workspace = _workspace(tmp_path)
+        assert len(workspace.cache) == 0
+        page = workspace.page("/intro.html")
+        assert b'href="guide/setup.html"' in page.body
+        assert b'href="_ormd/ormd.css"' in page.body
+        assert workspace.page("/intro.html") is page
+        assert (workspace.cache.hits, workspace.cache.misses) == (1, 1)
+        assert workspace.page("/missing.html") is None
+
+    def test_change_invalidates(self, tmp_path):
+        """Test that a changed document is indexed and rendered again."""
+        workspace = _workspace(tmp_path)
+        setup_page = workspace.page("/guide/setup.html")
+        intro = tmp_path / "intro.ormd"
+        intro.write_text(INTRO.replace("title: Intro", "title: Welcome"), encoding="utf-8")
+        workspace.page("/intro.html")
+        workspace.update([intro], [])
+        assert workspace.index.entries["intro.ormd"].title == "Welcome"
+        assert b"Welcome" in workspace.page("/intro.html").body
+        assert b"Welcome" in workspace.page("/").body
+        # Pages of other documents are kept
+        assert workspace.page("/guide/setup.html") is setup_page
+
+    def test_removal_relinks(self, tmp_path):
+        """Test that pages linking to a removed document are dropped from the cache."""
+        workspace = _workspace(tmp_path)
+        assert b'href="guide/setup.html"' in workspace.page("/intro.html").body
+        setup = tmp_path / "guide" / "setup.ormd"
+        setup.unlink()
+        workspace.update([], [setup])
+        assert "guide/setup.ormd" not in workspace.index.entries
+        assert workspace.page("/guide/setup.html") is None
+        assert b'href="guide/setup.html"' not in workspace.page("/intro.html").body
+
+    def test_served(self, tmp_path):
+        """Test that the server falls back to the workspace for pages it does not hold."""
+        import urllib.request
+        import threading
+
+        workspace = _workspace(tmp_path)
+        httpd = bind_server(0, pages=workspace.page)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            base = f"http://127.0.0.1:{httpd.server_address[1]}"
+            with urllib.request.urlopen(base + "/guide/setup.html") as response:
+                assert b"Setup" in response.read()
+            with urllib.request.urlopen(base + "/index.json") as response:
+                assert len(json.loads(response.read())["documents"]) == 2
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+class TestPageCache:
+    """Tests for the LRU page cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the page used longest ago is dropped when the cache is full."""
+        cache = PageCache(max_pages=2)
+        for page in ("a.html", "b.html"):
+            cache.put(page, CachedPage(None, {}))
+        cache.get("a.html")
+        cache.put("c.html", CachedPage(None, {}))
+        assert [page for page, _ in cache.items()] == ["a.html", "c.html"]
+        assert cache.get("b.html") is None